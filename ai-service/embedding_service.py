@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+EMBEDDING_INGEST_WORKERS = int(os.getenv("EMBEDDING_INGEST_WORKERS", "1"))
+
+class EmbeddingService:
+    """Cached, micro-batched access to the sentence embedding model.
+
+    Lookups go through an in-process LRU keyed by a hash of the text, then an
+    optional Redis tier. Remaining texts from concurrent callers are collected
+    for a few milliseconds and encoded in a single batched call on a worker
+    thread, so the event loop never blocks on the model. Bulk ingestion
+    encodes on its own worker threads so it never queues ahead of queries.
+    """
+    def __init__(self,
+                 model,
+                 model_name: str = "all-MiniLM-L6-v2",
+                 redis_client=None,
+                 cache_size: int = EMBEDDING_CACHE_SIZE,
+                 cache_ttl: int = EMBEDDING_CACHE_TTL,
+                 batch_window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch_size: int = EMBEDDING_MAX_BATCH,
+                 workers: int = EMBEDDING_WORKERS,
+                 ingest_workers: int = EMBEDDING_INGEST_WORKERS):
+        self.model = model
+        self.model_name = model_name
+        self.redis_client = redis_client
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+        self._ingest_executor = ThreadPoolExecutor(max_workers=ingest_workers, thread_name_prefix="embedding-ingest")
+        self._tasks: Set[asyncio.Task] = set()
+        self._queue: List[Tuple[str, str]] = []
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"embedding:{self.model_name}:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a single text."""
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed several texts, returning a (len(texts), dim) float32 matrix."""
+        keys = [self._key(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+
+        for key in keys:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                vectors[key] = vector
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing and self.redis_client is not None:
+            vectors.update(await self._load_from_redis(list(missing)))
+            missing = {key: text for key, text in missing.items() if key not in vectors}
+
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            # Shield shared futures so one cancelled caller does not fail the others
+            futures = [asyncio.shield(self._enqueue(key, text)) for key, text in missing.items()]
+            for key, vector in zip(missing, await asyncio.gather(*futures)):
+                vectors[key] = vector
+
+        return np.stack([vectors[key] for key in keys])
+
+    async def encode_uncached(self, texts: Sequence[str]) -> np.ndarray:
+        """Encode texts in one call on an ingestion worker thread, bypassing the cache.
+
+        For bulk ingestion, whose texts are already batched and rarely repeat.
+        """
+        return await self._encode(texts, self._ingest_executor)
+
+    async def _encode(self, texts: Sequence[str], executor: ThreadPoolExecutor) -> np.ndarray:
+        texts = list(texts)
+        loop = asyncio.get_running_loop()
+        matrix = await loop.run_in_executor(
+            executor,
+            lambda: self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+        )
+        return np.asarray(matrix, dtype=np.float32)
+
+    def _enqueue(self, key: str, text: str) -> asyncio.Future:
+        # Identical texts already waiting share one encode
+        future = self._in_flight.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._in_flight[key] = future
+        self._queue.append((key, text))
+
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        if batch:
+            # Hold a reference until the batch finishes so it is not garbage collected
+            task = asyncio.ensure_future(self._encode_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Embedding batch failed: {str(task.exception())}")
+
+    async def _encode_batch(self, batch: List[Tuple[str, str]]):
+        try:
+            matrix = await self._encode([text for _, text in batch], self._executor)
+        except Exception as e:
+            for key, _ in batch:
+                future = self._in_flight.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (key, _), vector in zip(batch, matrix):
+            vector.setflags(write=False)
+            self._remember(key, vector)
+            future = self._in_flight.pop(key)
+            if not future.done():
+                future.set_result(vector)
+
+        if self.redis_client is not None:
+            await self._store_in_redis({key: vector for (key, _), vector in zip(batch, matrix)})
+
+    async def _load_from_redis(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        try:
+            values = await self.redis_client.mget(keys)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            return {}
+        found = {}
+        for key, value in zip(keys, values):
+            if value is not None:
+                vector = np.frombuffer(value, dtype=np.float32)
+                self._remember(key, vector)
+                found[key] = vector
+        return found
+
+    async def _store_in_redis(self, vectors: Dict[str, np.ndarray]):
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, vector in vectors.items():
+                    pipe.set(key, vector.tobytes(), ex=self.cache_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache)}
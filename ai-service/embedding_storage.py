@@ -0,0 +1,58 @@
+from typing import List, Optional, Sequence, Tuple
+import os
+import numpy as np
+
+# Storage format for new embeddings: "float32" or "int8" (4x smaller, per-vector scale)
+EMBEDDING_FORMAT = os.getenv("EMBEDDING_FORMAT", "float32")
+EMBEDDING_FORMATS = ("float32", "int8")
+
+def pack_embeddings(vectors, fmt: str = EMBEDDING_FORMAT) -> List[Tuple[bytes, Optional[float]]]:
+    """Pack embedding rows into (bytes, scale) pairs for the binary column.
+
+    int8 uses symmetric per-vector quantization; the scale maps the int8 values
+    back to the original range. float32 rows have no scale.
+    """
+    if fmt not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown embedding format: {fmt}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors.reshape(len(vectors), -1)
+    if fmt == "float32":
+        return [(row.tobytes(), None) for row in vectors]
+
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return [(row.tobytes(), float(scale)) for row, scale in zip(quantized, scales)]
+
+def unpack_embeddings(blobs: Sequence[bytes],
+                      formats: Sequence[str],
+                      scales: Sequence[Optional[float]]) -> np.ndarray:
+    """Decode packed embeddings into a (len(blobs), dim) float32 matrix.
+
+    Rows of one format are joined and read with a single np.frombuffer, so
+    decoding costs one copy of the raw bytes rather than parsing every value.
+    """
+    if len(blobs) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    formats = np.asarray(formats)
+
+    if (formats == "float32").all():
+        return np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(blobs), -1)
+
+    unknown = set(formats.tolist()) - set(EMBEDDING_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown embedding format: {', '.join(sorted(unknown))}")
+
+    matrix = None
+    for fmt in EMBEDDING_FORMATS:
+        positions = np.flatnonzero(formats == fmt)
+        if len(positions) == 0:
+            continue
+        dtype = np.float32 if fmt == "float32" else np.int8
+        rows = np.frombuffer(b"".join(blobs[i] for i in positions), dtype=dtype).reshape(len(positions), -1)
+        if fmt == "int8":
+            rows = rows.astype(np.float32) * np.asarray([scales[i] for i in positions], dtype=np.float32)[:, None]
+        if matrix is None:
+            matrix = np.empty((len(blobs), rows.shape[1]), dtype=np.float32)
+        matrix[positions] = rows
+    return matrix
@@ -0,0 +1,61 @@
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import json
+import os
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_SPOOL_SIZE = int(os.getenv("INGEST_SPOOL_SIZE", str(16 * 1024 * 1024)))
+
+def chunk_text(text: str,
+               chunk_size: int = INGEST_CHUNK_SIZE,
+               overlap: int = INGEST_CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping chunks of at most chunk_size characters.
+
+    Chunks end at the last whitespace inside the window when there is one, so
+    words are not cut in half.
+    """
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+
+    overlap = min(overlap, chunk_size // 2)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            split = text.rfind(" ", start + overlap + 1, end)
+            if split != -1:
+                end = split
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+async def iter_ndjson(body: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line_number, parsed object or ValueError) for each non-empty line of an NDJSON stream."""
+    buffer = b""
+    line_number = 0
+    async for data in body:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, _parse_line(line)
+    if buffer.strip():
+        yield line_number + 1, _parse_line(buffer)
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+def progress_line(event: Dict[str, Any]) -> str:
+    """Encode one progress event for the NDJSON response stream."""
+    return json.dumps(event, default=str) + "\n"
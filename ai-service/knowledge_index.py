@@ -0,0 +1,159 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import numpy as np
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity is a plain dot product."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class EmbeddingIndex:
+    """In-memory embedding index for one knowledge base.
+
+    Embeddings are kept pre-normalized in one contiguous float32 matrix, so a
+    query is a single matrix-vector product followed by an argpartition top-k.
+    Rows can be added, replaced and removed incrementally.
+    """
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self.ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.empty((0, dim or 0), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _reserve(self, size: int):
+        # Grow capacity geometrically so repeated ingestion stays amortized O(1)
+        if size <= self._matrix.shape[0]:
+            return
+        capacity = max(size, 2 * self._matrix.shape[0], 64)
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self.ids)] = self._matrix[:len(self.ids)]
+        self._matrix = matrix
+
+    def add(self, ids: Sequence[str], vectors) -> None:
+        """Insert or replace embeddings by document id."""
+        if len(ids) == 0:
+            return
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        if self.dim is None or len(self.ids) == 0:
+            self.dim = vectors.shape[1]
+            self._matrix = np.empty((0, self.dim), dtype=np.float32)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+        self._reserve(len(self.ids) + len(ids))
+        for doc_id, vector in zip(ids, vectors):
+            position = self._positions.get(doc_id)
+            if position is None:
+                position = len(self.ids)
+                self._positions[doc_id] = position
+                self.ids.append(doc_id)
+            self._matrix[position] = vector
+
+    def remove(self, ids: Sequence[str]) -> None:
+        """Remove embeddings by document id."""
+        for doc_id in ids:
+            position = self._positions.pop(doc_id, None)
+            if position is None:
+                continue
+            # Move the last row into the hole to keep the matrix contiguous
+            last = len(self.ids) - 1
+            if position != last:
+                last_id = self.ids[last]
+                self._matrix[position] = self._matrix[last]
+                self.ids[position] = last_id
+                self._positions[last_id] = position
+            self.ids.pop()
+
+    def search(self, query_vector, top_k: int) -> List[Tuple[str, float]]:
+        """Return up to top_k (id, cosine similarity) pairs, best first."""
+        count = len(self.ids)
+        if count == 0 or top_k <= 0:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(-1))
+        scores = self._matrix[:count] @ query
+
+        k = min(top_k, count)
+        if k < count:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+# Loads (ids, vectors) for a knowledge base from storage
+IndexLoader = Callable[[str], Tuple[List[str], object]]
+
+class KnowledgeIndexRegistry:
+    """Lazily built embedding indexes, one per knowledge base name.
+
+    Indexes are per process: add() and remove() only update this worker's
+    indexes, so with several workers a document ingested through one of them
+    is found by the others only once they rebuild the index, after
+    invalidate() or a restart.
+    """
+    def __init__(self):
+        self._indexes: Dict[str, EmbeddingIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Changes made while an index is loading, replayed onto it once loaded,
+        # since the loader may have read storage before they were written
+        self._pending: Dict[str, List[Tuple[str, Sequence[str], object]]] = {}
+        # Bumped by invalidate() so loads that started before it are not kept
+        self._generation = 0
+
+    @staticmethod
+    def _build(name: str, loader: IndexLoader) -> EmbeddingIndex:
+        ids, vectors = loader(name)
+        index = EmbeddingIndex()
+        index.add(ids, vectors)
+        return index
+
+    async def get(self, name: str, loader: IndexLoader) -> EmbeddingIndex:
+        """Get the index for a knowledge base, loading it on a worker thread on first use."""
+        index = self._indexes.get(name)
+        if index is not None:
+            return index
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            index = self._indexes.get(name)
+            if index is None:
+                generation = self._generation
+                self._pending[name] = []
+                try:
+                    index = await asyncio.to_thread(self._build, name, loader)
+                finally:
+                    pending = self._pending.pop(name)
+                for change, ids, vectors in pending:
+                    if change == "add":
+                        index.add(ids, vectors)
+                    else:
+                        index.remove(ids)
+                if generation == self._generation:
+                    self._indexes[name] = index
+        return index
+
+    def add(self, name: str, ids: Sequence[str], vectors) -> None:
+        """Apply newly ingested embeddings to a loaded or loading index."""
+        if name in self._pending:
+            self._pending[name].append(("add", ids, vectors))
+        index = self._indexes.get(name)
+        if index is not None:
+            index.add(ids, vectors)
+
+    def remove(self, name: str, ids: Sequence[str]) -> None:
+        """Drop deleted documents from a loaded or loading index."""
+        if name in self._pending:
+            self._pending[name].append(("remove", ids, None))
+        index = self._indexes.get(name)
+        if index is not None:
+            index.remove(ids)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Forget one index (or all) so it is rebuilt from storage on next use."""
+        self._generation += 1
+        if name is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(name, None)
@@ -0,0 +1,138 @@
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Any OpenAI-compatible endpoint works, e.g. a local stub server in tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    """Raised when a completion request fails after all retries."""
+
+class LLMClient:
+    """Async client for OpenAI-compatible chat completions.
+
+    Requests share one pooled HTTP connection pool and are limited to
+    max_concurrency at a time. Rate limits, server errors and connection
+    failures are retried with jittered exponential backoff. Identical requests
+    made while one is already in flight wait for that request instead of
+    sending their own.
+    """
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 base_url: str = OPENAI_BASE_URL,
+                 max_connections: int = LLM_MAX_CONNECTIONS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 timeout: float = LLM_TIMEOUT,
+                 backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_max: float = LLM_BACKOFF_MAX):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    async def close(self):
+        """Close the shared HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def chat(self,
+                   messages: List[Dict[str, str]],
+                   model: str,
+                   temperature: float = 0.7,
+                   **params) -> str:
+        """Run a chat completion and return the content of the first choice."""
+        payload = {"model": model, "messages": messages, "temperature": temperature, **params}
+        response = await self.create_chat_completion(payload)
+        return response["choices"][0]["message"]["content"]
+
+    async def create_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST /chat/completions, sharing the result with identical in-flight requests."""
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._request(payload))
+            self._in_flight[key] = future
+            # Hold a reference until done even if every caller is cancelled
+            self._tasks.add(future)
+            future.add_done_callback(lambda task: self._request_done(key, task))
+        # Shield so one cancelled caller does not cancel the request for the others
+        return await asyncio.shield(future)
+
+    def _request_done(self, key: str, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        self._tasks.discard(task)
+        # Retrieve the exception so it is not lost when no caller is left to await it
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"LLM request finished with error: {str(task.exception())}")
+
+    async def _request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        client = self.get_client()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    response = await client.post("/chat/completions", json=payload)
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise LLMError(f"LLM request failed with status {response.status_code}: {response.text}")
+                error = LLMError(f"LLM request failed with status {response.status_code}")
+                retry_after = response.headers.get("retry-after")
+            except httpx.TransportError as e:
+                error = LLMError(f"LLM request failed: {str(e)}")
+
+            if attempt >= self.max_retries:
+                raise error
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+            attempt += 1
+            logger.warning(f"Retrying LLM request (attempt {attempt}/{self.max_retries}): {str(error)}")
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        # Full jitter spreads retries from concurrent callers apart
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        return delay
@@ -1,20 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
-import openai
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import os
 import asyncio
 import json
+import logging
+import time
 from datetime import datetime
 import uuid
-from sqlalchemy import create_engine, Column, String, DateTime, Text, JSON
+from tempfile import SpooledTemporaryFile
+from sqlalchemy import create_engine, inspect, Column, String, DateTime, Text, JSON, Float, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql import bindparam, null, select
 import redis
+import redis.asyncio
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+from knowledge_index import EmbeddingIndex, KnowledgeIndexRegistry
+from embedding_service import EmbeddingService
+from embedding_storage import EMBEDDING_FORMAT, pack_embeddings, unpack_embeddings
+from llm_client import LLMClient
+from semantic_cache import SemanticCache
+from template_retrieval import TEMPLATE_MIN_SIMILARITY, TEMPLATE_TOP_K, pack_templates, template_text
+from ingestion import INGEST_BATCH_SIZE, INGEST_SPOOL_SIZE, chunk_text, iter_ndjson, progress_line
+
+logger = logging.getLogger(__name__)
+
 # Initialize FastAPI
 app = FastAPI(title="AI Service", version="1.0.0")
 
@@ -30,11 +45,21 @@ Base = declarative_base()
 # Redis setup
 redis_client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
 
-# OpenAI setup
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# LLM client shared by all requests on this worker
+llm_client = LLMClient(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Embedding model
+# Embedding model, used through the cached and batched embedding service
+EMBEDDING_REDIS_CACHE = os.getenv("EMBEDDING_REDIS_CACHE", "false").lower() == "true"
 embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+embedding_service = EmbeddingService(
+    embedding_model,
+    model_name='all-MiniLM-L6-v2',
+    redis_client=redis.asyncio.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379")) if EMBEDDING_REDIS_CACHE else None
+)
+
+# Semantic caches of LLM responses for repeated natural-language requests
+intent_cache = SemanticCache(embedding_service)
+workflow_cache = SemanticCache(embedding_service)
 
 # Database models
 class WorkflowTemplate(Base):
@@ -44,6 +69,10 @@ class WorkflowTemplate(Base):
     name = Column(String)
     description = Column(Text)
     template = Column(JSON)
+    # Packed embedding of the name and description, used to rank templates
+    embedding_vector = Column(LargeBinary)
+    embedding_format = Column(String(16))
+    embedding_scale = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -53,13 +82,163 @@ class KnowledgeBase(Base):
     id = Column(String, primary_key=True)
     name = Column(String)
     content = Column(Text)
+    # Packed embedding (see embedding_storage); the JSON column only holds
+    # legacy rows until migrate_legacy_embeddings has converted them
     embedding = Column(JSON)
-    metadata = Column(JSON)
+    embedding_vector = Column(LargeBinary)
+    embedding_format = Column(String(16))
+    embedding_scale = Column(Float)
+    # "metadata" is reserved on declarative models, so map the column under another name
+    doc_metadata = Column("metadata", JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+# Add the binary embedding columns to tables created before them
+EMBEDDING_MIGRATION_BATCH_SIZE = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", "1000"))
+
+def add_missing_embedding_columns(table):
+    """Add binary embedding columns missing from an existing table."""
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for name in ("embedding_vector", "embedding_format", "embedding_scale"):
+            if name not in existing:
+                column_type = table.c[name].type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+
+add_missing_embedding_columns(KnowledgeBase.__table__)
+add_missing_embedding_columns(WorkflowTemplate.__table__)
+
+def migrate_legacy_embeddings(batch_size: int = EMBEDDING_MIGRATION_BATCH_SIZE) -> int:
+    """Convert JSON embeddings to the packed format in batches; returns rows migrated."""
+    table = KnowledgeBase.__table__
+    migrated = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.embedding).where(
+                    table.c.embedding_vector.is_(None), table.c.embedding.isnot(None)
+                ).limit(batch_size)
+            ).all()
+            if not rows:
+                return migrated
+            packed = pack_embeddings([row.embedding for row in rows])
+            conn.execute(
+                table.update().where(table.c.id == bindparam("row_id")).values(
+                    embedding_vector=bindparam("vector"),
+                    embedding_format=bindparam("format"),
+                    embedding_scale=bindparam("scale"),
+                    embedding=null()
+                ),
+                [{"row_id": row.id, "vector": vector, "format": EMBEDDING_FORMAT, "scale": scale}
+                 for row, (vector, scale) in zip(rows, packed)]
+            )
+        migrated += len(rows)
+
+# In-memory embedding indexes per knowledge base, built on first search
+knowledge_indexes = KnowledgeIndexRegistry()
+
+def load_knowledge_embeddings(name: str):
+    """Load ids and embeddings of a knowledge base for its in-memory index."""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            KnowledgeBase.id,
+            KnowledgeBase.embedding_vector,
+            KnowledgeBase.embedding_format,
+            KnowledgeBase.embedding_scale
+        ).filter(
+            KnowledgeBase.name == name,
+            KnowledgeBase.embedding_vector.isnot(None)
+        ).all()
+        # Rows not migrated yet still carry JSON embeddings
+        legacy = db.query(KnowledgeBase.id, KnowledgeBase.embedding).filter(
+            KnowledgeBase.name == name,
+            KnowledgeBase.embedding_vector.is_(None),
+            KnowledgeBase.embedding.isnot(None)
+        ).all()
+    finally:
+        db.close()
+    ids = [row.id for row in rows]
+    vectors = unpack_embeddings(
+        [row.embedding_vector for row in rows],
+        [row.embedding_format for row in rows],
+        [row.embedding_scale for row in rows]
+    )
+    if legacy:
+        legacy_vectors = np.asarray([row.embedding for row in legacy], dtype=np.float32)
+        ids += [row.id for row in legacy]
+        vectors = np.concatenate([vectors, legacy_vectors]) if len(vectors) else legacy_vectors
+    return ids, vectors
+
+# Embedding index of workflow templates, built on first use
+template_index: Optional[EmbeddingIndex] = None
+template_index_lock = asyncio.Lock()
+
+def load_template_embeddings():
+    """Load ids, stored embeddings and index text of all workflow templates."""
+    table = WorkflowTemplate.__table__
+    with engine.connect() as conn:
+        return conn.execute(select(
+            table.c.id, table.c.name, table.c.description,
+            table.c.embedding_vector, table.c.embedding_format, table.c.embedding_scale
+        )).all()
+
+def save_template_embeddings(ids: List[str], vectors: np.ndarray):
+    """Store packed embeddings for templates that had none."""
+    table = WorkflowTemplate.__table__
+    with engine.begin() as conn:
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(
+                embedding_vector=bindparam("vector"),
+                embedding_format=bindparam("format"),
+                embedding_scale=bindparam("scale")
+            ),
+            [{"row_id": row_id, "vector": vector, "format": EMBEDDING_FORMAT, "scale": scale}
+             for row_id, (vector, scale) in zip(ids, pack_embeddings(vectors))]
+        )
+
+async def get_template_index() -> EmbeddingIndex:
+    """Get the template index, embedding templates stored without a vector on first load."""
+    global template_index
+    async with template_index_lock:
+        if template_index is None:
+            rows = await asyncio.to_thread(load_template_embeddings)
+            stored = [row for row in rows if row.embedding_vector is not None]
+            missing = [row for row in rows if row.embedding_vector is None]
+
+            index = EmbeddingIndex()
+            index.add([row.id for row in stored], unpack_embeddings(
+                [row.embedding_vector for row in stored],
+                [row.embedding_format for row in stored],
+                [row.embedding_scale for row in stored]
+            ))
+            if missing:
+                vectors = await embedding_service.encode_uncached(
+                    [template_text(row.name, row.description) for row in missing]
+                )
+                await asyncio.to_thread(save_template_embeddings, [row.id for row in missing], vectors)
+                index.add([row.id for row in missing], vectors)
+            template_index = index
+    return template_index
+
+async def find_similar_templates(db: Session, description: str) -> List[Dict[str, Any]]:
+    """Return the stored templates most similar to a description, best first."""
+    index = await get_template_index()
+    hits = [
+        (template_id, similarity)
+        for template_id, similarity in index.search(await embedding_service.embed(description), TEMPLATE_TOP_K)
+        if similarity >= TEMPLATE_MIN_SIMILARITY
+    ]
+    if not hits:
+        return []
+    templates = db.query(WorkflowTemplate.id, WorkflowTemplate.template).filter(
+        WorkflowTemplate.id.in_([template_id for template_id, _ in hits])
+    ).all()
+    templates_by_id = {row.id: row.template for row in templates}
+    return [templates_by_id[template_id] for template_id, _ in hits if template_id in templates_by_id]
+
 # Pydantic models
 class NaturalLanguageRequest(BaseModel):
     text: str
@@ -94,9 +273,34 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     # In production, verify JWT token
     return credentials.credentials
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm_client.close()
+
+@app.on_event("startup")
+async def startup_event():
+    # Convert legacy JSON embeddings without delaying startup
+    if os.getenv("EMBEDDING_MIGRATE_ON_STARTUP", "true").lower() == "true":
+        asyncio.create_task(run_embedding_migration())
+
+async def run_embedding_migration():
+    try:
+        migrated = await asyncio.to_thread(migrate_legacy_embeddings)
+        if migrated:
+            # Rebuild indexes lazily so they reflect the stored (possibly quantized) vectors
+            knowledge_indexes.invalidate()
+            logger.info(f"Migrated {migrated} knowledge base embeddings to {EMBEDDING_FORMAT}")
+    except Exception as e:
+        logger.error(f"Embedding migration failed: {str(e)}")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "ai-service"}
+    return {
+        "status": "healthy",
+        "service": "ai-service",
+        "embedding_cache": embedding_service.stats(),
+        "semantic_cache": {"intent": intent_cache.stats(), "workflow": workflow_cache.stats()}
+    }
 
 @app.post("/v1/parse-intent")
 async def parse_intent(
@@ -106,6 +310,12 @@ async def parse_intent(
 ):
     """Parse natural language to extract workflow intent."""
     
+    # Near-identical requests get the intent parsed for an earlier one
+    cache_namespace = SemanticCache.namespace(request.context)
+    cached = await intent_cache.get(request.text, cache_namespace)
+    if cached is not None:
+        return cached
+    
     prompt = f"""
     Analyze this natural language request and extract the workflow intent:
     
@@ -132,7 +342,7 @@ async def parse_intent(
     """
     
     try:
-        response = openai.ChatCompletion.create(
+        content = await llm_client.chat(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a workflow intent parser. Extract structured information from natural language requests."},
@@ -141,8 +351,10 @@ async def parse_intent(
             temperature=0.3
         )
         
-        result = json.loads(response.choices[0].message.content)
-        return {"intent": result, "parsed_at": datetime.utcnow().isoformat()}
+        result = json.loads(content)
+        response = {"intent": result, "parsed_at": datetime.utcnow().isoformat()}
+        await intent_cache.set(request.text, response, cache_namespace)
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Intent parsing failed: {str(e)}")
@@ -155,16 +367,22 @@ async def generate_workflow(
 ):
     """Generate a complete workflow from natural language description."""
     
-    # Get similar workflows for context
-    similar_workflows = db.query(WorkflowTemplate).limit(5).all()
-    similar_templates = [w.template for w in similar_workflows]
+    # Near-identical descriptions get the workflow generated for an earlier one
+    cache_namespace = SemanticCache.namespace(request.existing_workflows, request.preferences)
+    cached = await workflow_cache.get(request.description, cache_namespace)
+    if cached is not None:
+        return cached
+    
+    # Get the most relevant stored workflows for context
+    similar_templates = await find_similar_templates(db, request.description)
     
     prompt = f"""
     Generate a complete workflow based on this description:
     
     Description: "{request.description}"
     
-    Similar existing workflows: {json.dumps(similar_templates, indent=2)}
+    Similar existing workflows (one summary per line):
+    {pack_templates(similar_templates)}
     
     User preferences: {json.dumps(request.preferences, indent=2)}
     
@@ -185,7 +403,7 @@ async def generate_workflow(
     """
     
     try:
-        response = openai.ChatCompletion.create(
+        content = await llm_client.chat(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a workflow architect. Create production-ready workflows based on natural language descriptions."},
@@ -194,19 +412,28 @@ async def generate_workflow(
             temperature=0.2
         )
         
-        workflow = json.loads(response.choices[0].message.content)
+        workflow = json.loads(content)
         
-        # Save template for future use
+        # Save template for future use, indexed by its name and description
+        vector = await embedding_service.embed(template_text(workflow["name"], workflow["description"]))
+        (packed_vector, scale), = pack_embeddings([vector])
         template = WorkflowTemplate(
             id=str(uuid.uuid4()),
             name=workflow["name"],
             description=workflow["description"],
-            template=workflow
+            template=workflow,
+            embedding_vector=packed_vector,
+            embedding_format=EMBEDDING_FORMAT,
+            embedding_scale=scale
         )
         db.add(template)
         db.commit()
+        if template_index is not None:
+            template_index.add([template.id], vector)
         
-        return {"workflow": workflow, "template_id": template.id}
+        response = {"workflow": workflow, "template_id": template.id}
+        await workflow_cache.set(request.description, response, cache_namespace)
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workflow generation failed: {str(e)}")
@@ -239,7 +466,7 @@ async def suggest_optimization(
     """
     
     try:
-        response = openai.ChatCompletion.create(
+        content = await llm_client.chat(
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a workflow optimization expert. Provide actionable suggestions to improve workflow performance, reliability, and cost-effectiveness."},
@@ -248,7 +475,7 @@ async def suggest_optimization(
             temperature=0.3
         )
         
-        suggestions = json.loads(response.choices[0].message.content)
+        suggestions = json.loads(content)
         return {"suggestions": suggestions}
         
     except Exception as e:
@@ -264,30 +491,176 @@ async def search_knowledge(
     
     try:
         # Generate embedding for query
-        query_embedding = embedding_model.encode(request.query).tolist()
+        query_embedding = await embedding_service.embed(request.query)
         
-        # Search in database
-        results = db.query(KnowledgeBase).filter(
-            KnowledgeBase.name == request.knowledge_base
-        ).all()
+        # Rank against the knowledge base's in-memory index
+        index = await knowledge_indexes.get(request.knowledge_base, load_knowledge_embeddings)
+        hits = index.search(query_embedding, request.top_k)
+        if not hits:
+            return {"results": []}
         
-        # Calculate similarities
-        scored_results = []
-        for doc in results:
-            doc_embedding = np.array(doc.embedding)
-            similarity = np.dot(query_embedding, doc_embedding) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(doc_embedding)
-            )
-            scored_results.append({
-                "id": doc.id,
-                "content": doc.content,
-                "metadata": doc.metadata,
-                "similarity": float(similarity)
-            })
+        # Fetch only the top k documents
+        docs = db.query(KnowledgeBase).filter(
+            KnowledgeBase.id.in_([doc_id for doc_id, _ in hits])
+        ).all()
+        docs_by_id = {doc.id: doc for doc in docs}
         
-        # Sort by similarity and return top k
-        scored_results.sort(key=lambda x: x["similarity"], reverse=True)
-        return {"results": scored_results[:request.top_k]}
+        return {"results": [
+            {
+                "id": doc_id,
+                "content": docs_by_id[doc_id].content,
+                "metadata": docs_by_id[doc_id].doc_metadata,
+                "similarity": similarity
+            }
+            for doc_id, similarity in hits if doc_id in docs_by_id
+        ]}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+def insert_knowledge_rows(rows: List[Dict[str, Any]]):
+    """Insert knowledge base rows in one multi-row statement."""
+    with engine.begin() as conn:
+        conn.execute(KnowledgeBase.__table__.insert(), rows)
+
+async def _read_file(file, size: int = 1 << 16) -> AsyncIterator[bytes]:
+    while True:
+        data = await file.read(size)
+        if not data:
+            break
+        yield data
+
+async def _spool_body(request: Request) -> SpooledTemporaryFile:
+    """Copy the request body to a temporary file, kept in memory while small."""
+    body = SpooledTemporaryFile(max_size=INGEST_SPOOL_SIZE)
+    async for data in request.stream():
+        body.write(data)
+    body.seek(0)
+    return body
+
+async def _ndjson_documents(body: UploadFile) -> AsyncIterator[Tuple[int, Any]]:
+    try:
+        async for line_number, document in iter_ndjson(_read_file(body)):
+            yield line_number, document
+    finally:
+        await body.close()
+
+async def _multipart_documents(form, knowledge_base: Optional[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield documents from uploaded files.
+
+    .ndjson/.jsonl files are read line by line; any other file is one document
+    of the given knowledge base.
+    """
+    position = 0
+    try:
+        for _, value in form.multi_items():
+            if isinstance(value, str):
+                continue
+            filename = value.filename or ""
+            if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in (value.content_type or ""):
+                async for _, document in iter_ndjson(_read_file(value)):
+                    position += 1
+                    yield position, document
+            else:
+                position += 1
+                content = (await value.read()).decode("utf-8", errors="replace")
+                yield position, {"content": content, "name": knowledge_base, "metadata": {"filename": filename}}
+    finally:
+        await form.close()
+
+async def ingest_documents(documents: AsyncIterator[Tuple[int, Any]], knowledge_base: Optional[str]) -> AsyncIterator[str]:
+    """Chunk, embed and store documents, yielding NDJSON progress events.
+
+    Chunks are embedded in batches of INGEST_BATCH_SIZE, and each batch is
+    inserted on a worker thread while the next one is being embedded. The
+    chunks count only includes batches whose insert has committed.
+    """
+    started = time.monotonic()
+    progress = {"documents": 0, "chunks": 0, "errors": 0}
+    batch: List[Dict[str, Any]] = []
+    pending_write: Optional[asyncio.Task] = None
+
+    async def store(rows: List[Dict[str, Any]], vectors: np.ndarray) -> int:
+        await asyncio.to_thread(insert_knowledge_rows, rows)
+        by_name: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            by_name.setdefault(row["name"], []).append(i)
+        for name, positions in by_name.items():
+            knowledge_indexes.add(name, [rows[i]["id"] for i in positions], vectors[positions])
+        return len(rows)
+
+    async def commit():
+        nonlocal pending_write
+        if pending_write is not None:
+            task, pending_write = pending_write, None
+            progress["chunks"] += await task
+
+    async def flush():
+        nonlocal batch, pending_write
+        rows, batch = batch, []
+        vectors = await embedding_service.encode_uncached([row["content"] for row in rows])
+        for row, (vector, scale) in zip(rows, pack_embeddings(vectors)):
+            row["embedding_vector"] = vector
+            row["embedding_format"] = EMBEDDING_FORMAT
+            row["embedding_scale"] = scale
+        # Keep at most one insert in flight behind the embedding of the next batch
+        await commit()
+        pending_write = asyncio.create_task(store(rows, vectors))
+
+    try:
+        async for position, document in documents:
+            if isinstance(document, dict) and not document.get("name"):
+                document = {**document, "name": knowledge_base}
+            try:
+                if isinstance(document, Exception):
+                    raise document
+                document = DocumentIngestionRequest(**document)
+            except Exception as e:
+                progress["errors"] += 1
+                yield progress_line({"error": f"Invalid document: {str(e)}", "position": position})
+                continue
+
+            document_id = str(uuid.uuid4())
+            chunks = chunk_text(document.content)
+            for i, chunk in enumerate(chunks):
+                batch.append({
+                    "id": str(uuid.uuid4()),
+                    "name": document.name,
+                    "content": chunk,
+                    "metadata": {**(document.metadata or {}), "document_id": document_id, "chunk": i, "chunks": len(chunks)},
+                    "created_at": datetime.utcnow()
+                })
+            progress["documents"] += 1
+
+            if len(batch) >= INGEST_BATCH_SIZE:
+                await flush()
+                yield progress_line(progress)
+
+        if batch:
+            await flush()
+            yield progress_line(progress)
+        await commit()
+        yield progress_line({**progress, "status": "completed", "elapsed": round(time.monotonic() - started, 3)})
+
+    except Exception as e:
+        if pending_write is not None:
+            pending_write.cancel()
+        yield progress_line({**progress, "status": "failed", "error": str(e)})
+
+@app.post("/v1/knowledge/ingest")
+async def ingest_knowledge(
+    request: Request,
+    knowledge_base: Optional[str] = None,
+    token: str = Depends(verify_token)
+):
+    """Bulk-ingest documents from an NDJSON body or multipart upload, streaming progress as NDJSON.
+
+    Each NDJSON line is a DocumentIngestionRequest; its name defaults to the
+    knowledge_base query parameter. The upload is received in full (spooled to
+    disk when large) before processing starts.
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        documents = _multipart_documents(await request.form(), knowledge_base)
+    else:
+        documents = _ndjson_documents(UploadFile(await _spool_body(request)))
+    return StreamingResponse(ingest_documents(documents, knowledge_base), media_type="application/x-ndjson")
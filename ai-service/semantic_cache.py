@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from knowledge_index import EmbeddingIndex
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+class SemanticCache:
+    """Response cache keyed by the meaning of a request rather than its exact text.
+
+    Requests are embedded and matched against earlier ones with the in-memory
+    EmbeddingIndex; a cached response is returned when the closest earlier
+    request is at least `threshold` cosine-similar. Entries are kept per
+    namespace (a hash of the other request fields that affect the response),
+    expire after `ttl` seconds and are evicted least recently used beyond
+    `max_entries`.
+    """
+    def __init__(self,
+                 embedding_service,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_SIZE,
+                 ttl: float = SEMANTIC_CACHE_TTL):
+        self.embedding_service = embedding_service
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._indexes: Dict[str, EmbeddingIndex] = {}
+        # entry id -> (namespace, response, expires_at)
+        self._entries: "OrderedDict[str, Tuple[str, Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def namespace(*parts: Any) -> str:
+        """Namespace for requests whose other fields are equal to `parts`."""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    async def get(self, text: str, namespace: str = "") -> Optional[Any]:
+        """Return the cached response for a similar enough request, if any."""
+        index = self._indexes.get(namespace)
+        if index is None or len(index) == 0:
+            self.misses += 1
+            return None
+
+        query = await self.embedding_service.embed(text)
+        now = time.monotonic()
+        while len(index):
+            (entry_id, similarity), = index.search(query, 1)
+            if similarity < self.threshold:
+                break
+            _, response, expires_at = self._entries[entry_id]
+            if expires_at <= now:
+                self._evict(entry_id)
+                continue
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return response
+
+        self.misses += 1
+        return None
+
+    async def set(self, text: str, response: Any, namespace: str = "") -> None:
+        """Cache a response for a request."""
+        vector = await self.embedding_service.embed(text)
+        entry_id = str(uuid.uuid4())
+        index = self._indexes.setdefault(namespace, EmbeddingIndex())
+        index.add([entry_id], vector)
+        self._entries[entry_id] = (namespace, response, time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, entry_id: str) -> None:
+        namespace, _, _ = self._entries.pop(entry_id)
+        index = self._indexes[namespace]
+        index.remove([entry_id])
+        if len(index) == 0:
+            del self._indexes[namespace]
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,43 @@
+from typing import Any, Dict, List
+import json
+import os
+
+TEMPLATE_TOP_K = int(os.getenv("TEMPLATE_TOP_K", "3"))
+TEMPLATE_MIN_SIMILARITY = float(os.getenv("TEMPLATE_MIN_SIMILARITY", "0.3"))
+# Character budget for all templates injected into one prompt
+TEMPLATE_PROMPT_BUDGET = int(os.getenv("TEMPLATE_PROMPT_BUDGET", "3000"))
+TEMPLATE_DESCRIPTION_LIMIT = 300
+
+def template_text(name: str, description: str) -> str:
+    """Text a template is indexed by."""
+    return f"{name or ''}: {description or ''}"
+
+def summarize_template(template: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a workflow template to the parts that guide generation."""
+    description = template.get("description") or ""
+    if len(description) > TEMPLATE_DESCRIPTION_LIMIT:
+        description = description[:TEMPLATE_DESCRIPTION_LIMIT].rsplit(" ", 1)[0] + "..."
+    nodes = template.get("nodes") or []
+    summary = {
+        "name": template.get("name"),
+        "description": description,
+        "trigger": template.get("trigger"),
+        "nodes": [
+            node.get("type") or node.get("name") if isinstance(node, dict) else node
+            for node in nodes
+        ],
+        "integrations": template.get("integrations")
+    }
+    return {key: value for key, value in summary.items() if value}
+
+def pack_templates(templates: List[Dict[str, Any]], budget: int = TEMPLATE_PROMPT_BUDGET) -> str:
+    """Render template summaries, most relevant first, as compact JSON lines within budget."""
+    lines = []
+    used = 0
+    for template in templates:
+        line = json.dumps(summarize_template(template), separators=(",", ":"), default=str)
+        if used + len(line) > budget:
+            continue
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines) if lines else "None"
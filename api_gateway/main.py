@@ -1,12 +1,21 @@
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+import asyncio
 import httpx
 import os
+import time
 from datetime import datetime
 import json
+import logging
+
+from response_cache import CachedResponse, ResponseCache, make_etag
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI
 app = FastAPI(title="API Gateway", version="1.0.0")
@@ -32,6 +41,85 @@ SERVICE_URLS = {
     "ai-service": os.getenv("AI_SERVICE_URL", "http://localhost:8004"),
 }
 
+# Upstream connection pools
+GATEWAY_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+GATEWAY_MAX_KEEPALIVE = int(os.getenv("GATEWAY_MAX_KEEPALIVE", "20"))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+GATEWAY_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT", "60"))
+# HTTP/2 needs the h2 package and an upstream that speaks it
+GATEWAY_HTTP2 = os.getenv("GATEWAY_HTTP2", "false").lower() == "true"
+
+# Headers that apply to a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade", "host"
+}
+
+# One pooled client per upstream service, created on first use
+upstream_clients: Dict[str, httpx.AsyncClient] = {}
+
+def get_upstream_client(service_name: str) -> httpx.AsyncClient:
+    """Get the shared keep-alive client for an upstream service."""
+    client = upstream_clients.get(service_name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=SERVICE_URLS[service_name],
+            http2=GATEWAY_HTTP2,
+            timeout=GATEWAY_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=GATEWAY_MAX_CONNECTIONS,
+                max_keepalive_connections=GATEWAY_MAX_KEEPALIVE,
+                keepalive_expiry=GATEWAY_KEEPALIVE_EXPIRY
+            )
+        )
+        upstream_clients[service_name] = client
+    return client
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if service_health_prober is not None:
+        service_health_prober.cancel()
+    for client in upstream_clients.values():
+        await client.aclose()
+    upstream_clients.clear()
+
+# GET response cache: TTL in seconds per gateway path prefix (longest prefix
+# wins, 0 disables), overridable with a JSON object in GATEWAY_CACHE_TTLS
+DEFAULT_CACHE_TTLS = {
+    "/v1/workflows/": 1,
+    "/v1/integrations/": 10,
+    "/v1/mcp/registry": 30,
+    "/v1/mcp/": 5
+}
+GATEWAY_CACHE_TTLS = {**DEFAULT_CACHE_TTLS, **json.loads(os.getenv("GATEWAY_CACHE_TTLS", "{}"))}
+GATEWAY_CACHE_SIZE = int(os.getenv("GATEWAY_CACHE_SIZE", "1000"))
+GATEWAY_CACHE_MAX_BODY = int(os.getenv("GATEWAY_CACHE_MAX_BODY", str(1024 * 1024)))
+# Set to share cached responses between gateway replicas through Redis
+GATEWAY_CACHE_REDIS_URL = os.getenv("GATEWAY_CACHE_REDIS_URL")
+
+def create_cache_redis_client():
+    if not GATEWAY_CACHE_REDIS_URL:
+        return None
+    import redis.asyncio
+    return redis.asyncio.Redis.from_url(GATEWAY_CACHE_REDIS_URL)
+
+response_cache = ResponseCache(
+    GATEWAY_CACHE_TTLS,
+    max_entries=GATEWAY_CACHE_SIZE,
+    max_body_size=GATEWAY_CACHE_MAX_BODY,
+    redis_client=create_cache_redis_client()
+)
+
+# Service health, probed in the background and served from memory
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "15"))
+
+service_health: Dict[str, Dict[str, Any]] = {}
+service_health_checked = float("-inf")
+service_health_refresh: Optional[asyncio.Task] = None
+service_health_prober: Optional[asyncio.Task] = None
+
 # Authentication
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     # In production, verify JWT token
@@ -40,149 +128,244 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "service": "api-gateway"}
+    return {"status": "healthy", "service": "api-gateway", "response_cache": response_cache.stats()}
+
+async def probe_service(service_name: str) -> Dict[str, Any]:
+    """Check one service's /health endpoint."""
+    try:
+        response = await get_upstream_client(service_name).get("/health", timeout=HEALTH_CHECK_TIMEOUT)
+        status = {
+            "status": "healthy" if response.status_code == 200 else "unhealthy",
+            "response_time": response.elapsed.total_seconds()
+        }
+    except Exception as e:
+        status = {
+            "status": "unreachable",
+            "error": str(e)
+        }
+    status["checked_at"] = datetime.utcnow().isoformat()
+    return status
+
+async def _refresh_service_health():
+    global service_health_checked
+    results = await asyncio.gather(*(probe_service(name) for name in SERVICE_URLS))
+    service_health.update(zip(SERVICE_URLS, results))
+    service_health_checked = time.monotonic()
+
+def refresh_service_health() -> asyncio.Task:
+    """Probe all services concurrently; concurrent callers share one refresh."""
+    global service_health_refresh
+    if service_health_refresh is None or service_health_refresh.done():
+        service_health_refresh = asyncio.create_task(_refresh_service_health())
+    return service_health_refresh
+
+async def _probe_services_periodically():
+    while True:
+        try:
+            await refresh_service_health()
+        except Exception as e:
+            logger.error(f"Service health refresh failed: {str(e)}")
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+@app.on_event("startup")
+async def startup_event():
+    global service_health_prober
+    service_health_prober = asyncio.create_task(_probe_services_periodically())
 
 @app.get("/v1/services/health")
 async def check_all_services():
     """Check health of all services."""
+    # Answer from the background probes; refresh inline only when they are stale
+    if time.monotonic() - service_health_checked > HEALTH_CACHE_TTL:
+        await asyncio.shield(refresh_service_health())
     
-    health_status = {}
+    return {"services": dict(service_health)}
+
+# Proxy endpoints
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+class UncacheableResponse(Exception):
+    """An upstream response to stream back rather than cache."""
+    def __init__(self, response: httpx.Response):
+        super().__init__("response is not cacheable")
+        self.response = response
+
+    def claim(self) -> Optional[httpx.Response]:
+        """The open response for the first caller, None for callers that shared the miss."""
+        response, self.response = self.response, None
+        return response
+
+async def _fetch_cacheable(request: Request, service_name: str, path: str, ttl: float) -> CachedResponse:
+    """GET an upstream response in full so it can be cached."""
+    client = get_upstream_client(service_name)
+    headers = [(k, v) for k, v in request.headers.items()
+               if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in ("if-none-match", "if-modified-since")]
+    try:
+        response = await client.send(
+            client.build_request("GET", httpx.URL(path, query=request.url.query.encode("utf-8")), headers=headers),
+            stream=True
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"{service_name} unavailable: {str(e)}")
+    content_length = response.headers.get("content-length", "")
+    if not content_length.isdigit() or int(content_length) > response_cache.max_body_size:
+        # Too large to cache, or of unknown size: stream it instead of buffering
+        raise UncacheableResponse(response)
+    try:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+
+    response_headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in HOP_BY_HOP_HEADERS]
+    etag = response.headers.get("etag")
+    if etag is None:
+        etag = make_etag(body)
+        response_headers.append(("etag", etag))
+    cache_control = response.headers.get("cache-control", "").lower()
+    return CachedResponse(
+        status_code=response.status_code,
+        headers=response_headers,
+        body=body,
+        etag=etag,
+        expires_at=time.time() + ttl,
+        cacheable=(
+            response.status_code == 200
+            and "no-store" not in cache_control
+            and "private" not in cache_control
+            and "set-cookie" not in response.headers
+        )
+    )
+
+async def cached_proxy_request(request: Request, service_name: str, path: str, ttl: float) -> Response:
+    """Serve a GET from the response cache, fetching it upstream on a miss."""
+    key = response_cache.key(service_name, path, request.url.query, request.headers)
+    try:
+        entry, hit = await response_cache.fetch(key, lambda: _fetch_cacheable(request, service_name, path, ttl))
+    except UncacheableResponse as e:
+        response = e.claim()
+        if response is None:
+            return await forward_request(request, service_name, path)
+        return stream_response(response)
+
+    if entry.status_code == 200 and _not_modified(request, entry.etag):
+        return Response(status_code=304, headers={"etag": entry.etag, "x-cache": "HIT" if hit else "MISS"})
+
+    cached = Response(content=entry.body, status_code=entry.status_code)
+    cached.raw_headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in entry.headers]
+    cached.raw_headers.append((b"x-cache", b"HIT" if hit else b"MISS"))
+    return cached
+
+def stream_response(response: httpx.Response) -> StreamingResponse:
+    """Stream an upstream response back unchanged, closing it when done."""
+    proxied = StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        background=BackgroundTask(response.aclose)
+    )
+    # Copy headers as raw pairs so repeated ones such as set-cookie survive; raw
+    # bytes keep the upstream content-encoding and content-length valid
+    proxied.raw_headers = [
+        (k.encode("latin-1"), v.encode("latin-1"))
+        for k, v in response.headers.multi_items() if k.lower() not in HOP_BY_HOP_HEADERS
+    ]
+    return proxied
+
+async def proxy_request(request: Request, service_name: str, path: str) -> Response:
+    """Stream a request to an upstream service and its response back unchanged."""
+    if request.method == "GET":
+        ttl = response_cache.ttl_for(request.url.path)
+        if ttl is not None and "no-cache" not in request.headers.get("cache-control", "").lower():
+            return await cached_proxy_request(request, service_name, path, ttl)
+    return await forward_request(request, service_name, path)
+
+async def forward_request(request: Request, service_name: str, path: str) -> Response:
+    """Send a request upstream without going through the response cache."""
+    client = get_upstream_client(service_name)
+    
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS]
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    upstream_request = client.build_request(
+        method=request.method,
+        url=httpx.URL(path, query=request.url.query.encode("utf-8")),
+        headers=headers,
+        content=request.stream() if has_body else None
+    )
     
-    async with httpx.AsyncClient() as client:
-        for service_name, service_url in SERVICE_URLS.items():
-            try:
-                response = await client.get(f"{service_url}/health", timeout=5.0)
-                health_status[service_name] = {
-                    "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "response_time": response.elapsed.total_seconds()
-                }
-            except Exception as e:
-                health_status[service_name] = {
-                    "status": "unreachable",
-                    "error": str(e)
-                }
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"{service_name} unavailable: {str(e)}")
     
-    return {"services": health_status}
+    # Writes can change what the service's cached GETs would return
+    if request.method != "GET" and response.status_code < 400:
+        response_cache.invalidate(service_name)
+    
+    return stream_response(response)
 
-# Proxy endpoints
 @app.api_route("/v1/workflows/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy_workflows(request: Request, path: str):
     """Proxy workflow requests to workflow engine."""
-    
-    async with httpx.AsyncClient() as client:
-        url = f"{SERVICE_URLS['workflow-engine']}/v1/workflows/{path}"
-        
-        # Forward request
-        response = await client.request(
-            method=request.method,
-            url=url,
-            headers={k: v for k, v in request.headers.items() if k.lower() != "host"},
-            params=request.query_params,
-            json=await request.json() if request.method in ["POST", "PUT"] else None
-        )
-        
-        return response.json()
+    return await proxy_request(request, "workflow-engine", f"/v1/workflows/{path}")
 
 @app.api_route("/v1/integrations/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy_integrations(request: Request, path: str):
     """Proxy integration requests to integration service."""
-    
-    async with httpx.AsyncClient() as client:
-        url = f"{SERVICE_URLS['integration-service']}/v1/integrations/{path}"
-        
-        response = await client.request(
-            method=request.method,
-            url=url,
-            headers={k: v for k, v in request.headers.items() if k.lower() != "host"},
-            params=request.query_params,
-            json=await request.json() if request.method in ["POST", "PUT"] else None
-        )
-        
-        return response.json()
+    return await proxy_request(request, "integration-service", f"/v1/integrations/{path}")
 
 @app.api_route("/v1/mcp/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy_mcp(request: Request, path: str):
     """Proxy MCP requests to MCP service."""
-    
-    async with httpx.AsyncClient() as client:
-        url = f"{SERVICE_URLS['mcp-service']}/v1/mcp/{path}"
-        
-        response = await client.request(
-            method=request.method,
-            url=url,
-            headers={k: v for k, v in request.headers.items() if k.lower() != "host"},
-            params=request.query_params,
-            json=await request.json() if request.method in ["POST", "PUT"] else None
-        )
-        
-        return response.json()
+    return await proxy_request(request, "mcp-service", f"/v1/mcp/{path}")
 
 @app.api_route("/v1/ai/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
 async def proxy_ai(request: Request, path: str):
     """Proxy AI requests to AI service."""
-    
-    async with httpx.AsyncClient() as client:
-        url = f"{SERVICE_URLS['ai-service']}/v1/ai/{path}"
-        
-        response = await client.request(
-            method=request.method,
-            url=url,
-            headers={k: v for k, v in request.headers.items() if k.lower() != "host"},
-            params=request.query_params,
-            json=await request.json() if request.method in ["POST", "PUT"] else None
-        )
-        
-        return response.json()
+    return await proxy_request(request, "ai-service", f"/v1/ai/{path}")
 
 # Unified workflow creation endpoint
 @app.post("/v1/workflows/create-from-natural-language")
 async def create_workflow_from_natural_language(request: Request):
     """Create a workflow from natural language using AI service."""
     
-    async with httpx.AsyncClient() as client:
-        # First, parse the intent
-        intent_response = await client.post(
-            f"{SERVICE_URLS['ai-service']}/v1/parse-intent",
-            json=await request.json()
-        )
-        
-        if intent_response.status_code != 200:
-            raise HTTPException(status_code=intent_response.status_code, detail=intent_response.text)
-        
-        intent = intent_response.json()
-        
-        # Then generate the workflow
-        workflow_response = await client.post(
-            f"{SERVICE_URLS['ai-service']}/v1/generate-workflow",
-            json={
-                "description": intent["intent"],
-                "preferences": {}
-            }
-        )
-        
-        if workflow_response.status_code != 200:
-            raise HTTPException(status_code=workflow_response.status_code, detail=workflow_response.text)
-        
-        workflow = workflow_response.json()
-        
-        # Create the workflow in the workflow engine
-        create_response = await client.post(
-            f"{SERVICE_URLS['workflow-engine']}/v1/workflows",
-            json=workflow["workflow"]
-        )
-        
-        return create_response.json()
+    client = get_upstream_client("ai-service")
+    
+    # First, parse the intent
+    intent_response = await client.post(
+        "/v1/parse-intent",
+        json=await request.json()
+    )
+    
+    if intent_response.status_code != 200:
+        raise HTTPException(status_code=intent_response.status_code, detail=intent_response.text)
+    
+    intent = intent_response.json()
+    
+    # Then generate the workflow
+    workflow_response = await client.post(
+        "/v1/generate-workflow",
+        json={
+            "description": intent["intent"],
+            "preferences": {}
+        }
+    )
+    
+    if workflow_response.status_code != 200:
+        raise HTTPException(status_code=workflow_response.status_code, detail=workflow_response.text)
+    
+    workflow = workflow_response.json()
+    
+    # Create the workflow in the workflow engine
+    create_response = await get_upstream_client("workflow-engine").post(
+        "/v1/workflows",
+        json=workflow["workflow"]
+    )
+    
+    return create_response.json()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)</content>
-
-<write_to_file>
-<path>api_gateway/requirements.txt</path>
-<content>fastapi==0.104.1
-uvicorn==0.24.0
-httpx==0.25.2
-pydantic==2.5.0
-python-multipart==0.0.6
-python-jose[cryptography]==3.3.0
-passlib[bcrypt]==1.7.4
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# Request headers that change the response, so they are part of the cache key
+VARY_HEADERS = ("authorization", "cookie", "accept", "accept-encoding")
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    etag: str
+    expires_at: float
+    cacheable: bool = True
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "body": base64.b64encode(self.body).decode("ascii"),
+            "etag": self.etag,
+            "expires_at": self.expires_at
+        })
+
+    @classmethod
+    def from_json(cls, data) -> 'CachedResponse':
+        value = json.loads(data)
+        return cls(
+            status_code=value["status_code"],
+            headers=[tuple(header) for header in value["headers"]],
+            body=base64.b64decode(value["body"]),
+            etag=value["etag"],
+            expires_at=value["expires_at"]
+        )
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body."""
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+class ResponseCache:
+    """Cache of upstream GET responses for the gateway.
+
+    Entries live in a bounded in-memory LRU and, when a Redis client is given,
+    in Redis so every gateway replica shares them. Each route prefix has its
+    own TTL; routes without one are not cached. Concurrent misses for the same
+    key share a single upstream request.
+    """
+    def __init__(self,
+                 ttls: Dict[str, float],
+                 max_entries: int = 1000,
+                 max_body_size: int = 1024 * 1024,
+                 redis_client=None):
+        # Longest prefix first so specific routes override general ones
+        self.ttls = sorted(ttls.items(), key=lambda item: len(item[0]), reverse=True)
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+        self.redis_client = redis_client
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, path: str) -> Optional[float]:
+        """TTL for a gateway path, or None when its responses are not cached."""
+        for prefix, ttl in self.ttls:
+            if path.startswith(prefix):
+                return ttl if ttl > 0 else None
+        return None
+
+    def key(self, service_name: str, path: str, query: str, headers) -> str:
+        vary = "\n".join(headers.get(name, "") for name in VARY_HEADERS)
+        digest = hashlib.sha256(vary.encode("utf-8")).hexdigest()[:16]
+        return f"gateway:cache:{service_name}:{path}?{query}:{digest}"
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Get a fresh entry from memory, falling back to Redis."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                return entry
+            del self._entries[key]
+
+        if self.redis_client is not None:
+            try:
+                data = await self.redis_client.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache lookup failed: {str(e)}")
+                return None
+            if data is not None:
+                entry = CachedResponse.from_json(data)
+                if entry.expires_at > now:
+                    self._remember(key, entry)
+                    return entry
+        return None
+
+    async def set(self, key: str, entry: CachedResponse) -> None:
+        """Store an entry until its expiry."""
+        self._remember(key, entry)
+        if self.redis_client is not None:
+            try:
+                ttl = math.ceil(entry.expires_at - time.time())
+                if ttl > 0:
+                    await self.redis_client.set(key, entry.to_json(), ex=ttl)
+            except Exception as e:
+                logger.warning(f"Response cache write failed: {str(e)}")
+
+    async def fetch(self, key: str, loader: Callable[[], Awaitable[CachedResponse]]) -> Tuple[CachedResponse, bool]:
+        """Return (entry, hit), loading it once for all concurrent callers on a miss.
+
+        Entries the loader marks as not cacheable are shared with the callers
+        already waiting but not stored.
+        """
+        entry = await self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry, True
+
+        self.misses += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, loader))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future), False
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        entry = await loader()
+        if entry.cacheable and len(entry.body) <= self.max_body_size:
+            await self.set(key, entry)
+        return entry
+
+    def invalidate(self, service_name: str) -> None:
+        """Drop in-memory entries of a service, e.g. after a write through the gateway."""
+        prefix = f"gateway:cache:{service_name}:"
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hit/miss counters."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
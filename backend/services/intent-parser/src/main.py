@@ -1,8 +1,11 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional
 import openai
+import asyncio
+import os
 import json
 import re
 from datetime import datetime
@@ -14,6 +17,9 @@ from dataclasses import dataclass
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Batch items processed at once; results stream back as each one finishes
+INTENT_BATCH_CONCURRENCY = int(os.getenv("INTENT_BATCH_CONCURRENCY", "8"))
+
 app = FastAPI(title="Intent Parser Service", version="1.0.0")
 
 # CORS middleware
@@ -48,9 +54,15 @@ class ParsedIntent(BaseModel):
     steps: List[WorkflowStep]
     complexity: str  # 'simple', 'medium', 'complex'
 
+class BatchCommandRequest(BaseModel):
+    commands: List[str]
+
 class IntentRequest(BaseModel):
     intent: ParsedIntent
 
+class BatchIntentRequest(BaseModel):
+    intents: List[ParsedIntent]
+
 # Available MCP tools and agents mapping
 MCP_TOOLS = {
     "data_analysis": ["pandas_analyzer", "sql_query", "chart_generator"],
@@ -70,8 +82,63 @@ AGENT_TYPES = {
     "report_agent": ["reporting"]
 }
 
+# Features recognised in a command, as (kind, value) tags per literal fragment.
+# Fragments match anywhere in the lower-cased command, like substring checks.
+COMPLEX_INDICATORS = ["and", "then", "after", "if", "when", "multiple", "various"]
+ACTION_WORDS = ["create", "generate", "analyze", "monitor", "send", "backup"]
+SPECIFIC_TARGETS = ["database", "website", "file", "email", "report", "dashboard"]
+DATA_SOURCES = {
+    "Database": ["database", "db", "sql"],
+    "Files": ["file", "csv", "excel", "document"],
+    "Web Sources": ["website", "web", "url", "scrape"],
+    "API Services": ["api", "service", "endpoint"],
+    "Email": ["email", "inbox", "message"]
+}
+# In priority order; the first format with a match wins
+OUTPUT_FORMATS = {
+    "Presentation": ["presentation", "slides", "ppt"],
+    "Report": ["report", "document", "pdf"],
+    "Dashboard": ["dashboard", "chart", "graph"],
+    "Notification": ["email", "notification", "alert"],
+    "File": ["file", "backup", "export"]
+}
+
+def _trie_pattern(words) -> str:
+    """Regex matching the longest of `words` at a position, factored as a trie.
+    
+    Shared prefixes are tested once, which is much faster than a flat
+    alternation of many fragments.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Greedy optional: prefer continuing to a longer word when one ends here
+        return f"(?:{pattern})?" if "" in node else pattern
+    
+    return build(trie)
+
+@dataclass
+class CommandFeatures:
+    keywords: List[str]
+    word_count: int
+    has_complex_logic: bool
+    has_clear_action: bool
+    has_specific_target: bool
+    data_sources: List[str]
+    output_format: str
+
 class IntentParser:
     def __init__(self):
+        # Category patterns are literal fragments
         self.patterns = {
             "data_analysis": [r"analyz", r"report", r"dashboard", r"chart", r"graph", r"statistics"],
             "web_scraping": [r"scrape", r"extract", r"crawl", r"fetch", r"collect"],
@@ -80,52 +147,90 @@ class IntentParser:
             "file_management": [r"backup", r"save", r"upload", r"download", r"sync"],
             "reporting": [r"presentation", r"summary", r"email", r"send"]
         }
+        self._compile()
     
-    def extract_keywords(self, command: str) -> List[str]:
-        """Extract relevant keywords from the command"""
-        keywords = []
-        command_lower = command.lower()
+    def _compile(self):
+        """Compile every fragment into one overlapping-match regex.
+        
+        Each fragment maps to the feature tags of itself and of all fragments
+        that are its prefixes. Trying alternatives longest first at every
+        position then finds the tags of every fragment in the command in a
+        single scan.
+        """
+        fragments: Dict[str, set] = {}
+        def add(fragment: str, tag: tuple):
+            fragments.setdefault(fragment, set()).add(tag)
         
         for category, patterns in self.patterns.items():
             for pattern in patterns:
-                if re.search(pattern, command_lower):
-                    keywords.append(category)
-                    break
+                add(pattern, ("keyword", category))
+        for word in COMPLEX_INDICATORS:
+            add(word, ("complex", None))
+        for word in ACTION_WORDS:
+            add(word, ("action", None))
+        for word in SPECIFIC_TARGETS:
+            add(word, ("target", None))
+        for source, words in DATA_SOURCES.items():
+            for word in words:
+                add(word, ("data", source))
+        for output_format, words in OUTPUT_FORMATS.items():
+            for word in words:
+                add(word, ("output", output_format))
         
-        return keywords
+        self._fragment_tags = {
+            fragment: frozenset().union(*(tags for other, tags in fragments.items() if fragment.startswith(other)))
+            for fragment in fragments
+        }
+        self._matcher = re.compile(f"(?=({_trie_pattern(fragments)}))")
     
-    def determine_complexity(self, command: str, keywords: List[str]) -> str:
+    def analyze(self, command: str) -> CommandFeatures:
+        """Extract every command feature in a single pass over the text"""
+        tags = set()
+        for fragment in set(self._matcher.findall(command.lower())):
+            tags |= self._fragment_tags[fragment]
+        
+        output_format = next(
+            (name for name in OUTPUT_FORMATS if ("output", name) in tags),
+            "Data Output"
+        )
+        return CommandFeatures(
+            keywords=[category for category in self.patterns if ("keyword", category) in tags],
+            word_count=len(command.split()),
+            has_complex_logic=("complex", None) in tags,
+            has_clear_action=("action", None) in tags,
+            has_specific_target=("target", None) in tags,
+            data_sources=[source for source in DATA_SOURCES if ("data", source) in tags] or ["General Data"],
+            output_format=output_format
+        )
+    
+    def extract_keywords(self, command: str) -> List[str]:
+        """Extract relevant keywords from the command"""
+        return self.analyze(command).keywords
+    
+    def determine_complexity(self, command: str, keywords: List[str], features: Optional[CommandFeatures] = None) -> str:
         """Determine workflow complexity based on command analysis"""
-        word_count = len(command.split())
+        features = features or self.analyze(command)
+        word_count = features.word_count
         keyword_count = len(keywords)
         
-        # Check for complex indicators
-        complex_indicators = ["and", "then", "after", "if", "when", "multiple", "various"]
-        has_complex_logic = any(indicator in command.lower() for indicator in complex_indicators)
-        
-        if word_count > 20 or keyword_count > 3 or has_complex_logic:
+        if word_count > 20 or keyword_count > 3 or features.has_complex_logic:
             return "complex"
         elif word_count > 10 or keyword_count > 1:
             return "medium"
         else:
             return "simple"
     
-    def estimate_confidence(self, keywords: List[str], command: str) -> float:
+    def estimate_confidence(self, keywords: List[str], command: str, features: Optional[CommandFeatures] = None) -> float:
         """Estimate confidence based on keyword matches and command clarity"""
+        features = features or self.analyze(command)
         base_confidence = 0.5
         
         # Increase confidence for each matched keyword
         keyword_boost = min(len(keywords) * 0.15, 0.4)
         
-        # Check for clear action words
-        action_words = ["create", "generate", "analyze", "monitor", "send", "backup"]
-        has_clear_action = any(word in command.lower() for word in action_words)
-        action_boost = 0.2 if has_clear_action else 0
-        
-        # Check for specific data sources or targets
-        specific_targets = ["database", "website", "file", "email", "report", "dashboard"]
-        has_specific_target = any(target in command.lower() for target in specific_targets)
-        target_boost = 0.15 if has_specific_target else 0
+        # Clear action words and specific data sources or targets
+        action_boost = 0.2 if features.has_clear_action else 0
+        target_boost = 0.15 if features.has_specific_target else 0
         
         confidence = min(base_confidence + keyword_boost + action_boost + target_boost, 0.95)
         return round(confidence, 2)
@@ -223,39 +328,25 @@ class IntentParser:
     
     def extract_data_requirements(self, command: str) -> List[str]:
         """Extract required data sources from command"""
-        data_sources = []
-        command_lower = command.lower()
-        
-        # Common data source patterns
-        if any(word in command_lower for word in ["database", "db", "sql"]):
-            data_sources.append("Database")
-        if any(word in command_lower for word in ["file", "csv", "excel", "document"]):
-            data_sources.append("Files")
-        if any(word in command_lower for word in ["website", "web", "url", "scrape"]):
-            data_sources.append("Web Sources")
-        if any(word in command_lower for word in ["api", "service", "endpoint"]):
-            data_sources.append("API Services")
-        if any(word in command_lower for word in ["email", "inbox", "message"]):
-            data_sources.append("Email")
-        
-        return data_sources if data_sources else ["General Data"]
+        return self.analyze(command).data_sources
     
     def determine_output_format(self, command: str) -> str:
         """Determine expected output format"""
-        command_lower = command.lower()
+        return self.analyze(command).output_format
+    
+    def parse(self, command: str) -> ParsedIntent:
+        """Parse a non-empty command into a structured intent"""
+        features = self.analyze(command)
+        keywords = features.keywords
         
-        if any(word in command_lower for word in ["presentation", "slides", "ppt"]):
-            return "Presentation"
-        elif any(word in command_lower for word in ["report", "document", "pdf"]):
-            return "Report"
-        elif any(word in command_lower for word in ["dashboard", "chart", "graph"]):
-            return "Dashboard"
-        elif any(word in command_lower for word in ["email", "notification", "alert"]):
-            return "Notification"
-        elif any(word in command_lower for word in ["file", "backup", "export"]):
-            return "File"
-        else:
-            return "Data Output"
+        return ParsedIntent(
+            objective=f"Execute workflow to: {command}",
+            confidence=self.estimate_confidence(keywords, command, features),
+            requiredData=features.data_sources,
+            outputFormat=features.output_format,
+            steps=self.generate_workflow_steps(command, keywords),
+            complexity=self.determine_complexity(command, keywords, features)
+        )
 
 parser = IntentParser()
 
@@ -269,27 +360,9 @@ async def parse_intent(request: CommandRequest):
         
         logger.info(f"Parsing command: {command}")
         
-        # Extract keywords and analyze command
-        keywords = parser.extract_keywords(command)
-        complexity = parser.determine_complexity(command, keywords)
-        confidence = parser.estimate_confidence(keywords, command)
-        
-        # Generate workflow components
-        steps = parser.generate_workflow_steps(command, keywords)
-        required_data = parser.extract_data_requirements(command)
-        output_format = parser.determine_output_format(command)
-        
-        # Create objective summary
-        objective = f"Execute workflow to: {command}"
-        
-        parsed_intent = ParsedIntent(
-            objective=objective,
-            confidence=confidence,
-            requiredData=required_data,
-            outputFormat=output_format,
-            steps=steps,
-            complexity=complexity
-        )
+        # Analyze the command in one pass and build the intent
+        parsed_intent = parser.parse(command)
+        steps = parsed_intent.steps
         
         logger.info(f"Successfully parsed intent with {len(steps)} steps")
         return parsed_intent
@@ -298,6 +371,82 @@ async def parse_intent(request: CommandRequest):
         logger.error(f"Error parsing intent: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to parse intent: {str(e)}")
 
+def _ndjson_line(result: Dict[str, Any]) -> str:
+    return json.dumps(result, default=str) + "\n"
+
+async def _stream_batch(items: List[Any], handle: Callable[[int, Any], Dict[str, Any]]):
+    """Run handle(index, item) on worker threads, at most INTENT_BATCH_CONCURRENCY at once, yielding NDJSON lines in completion order"""
+    semaphore = asyncio.Semaphore(INTENT_BATCH_CONCURRENCY)
+
+    async def run(index: int, item: Any) -> Dict[str, Any]:
+        async with semaphore:
+            return await asyncio.to_thread(handle, index, item)
+
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield _ndjson_line(await next_done)
+    finally:
+        # Stop outstanding items if the client disconnects
+        for task in tasks:
+            task.cancel()
+
+def _parse_one(index: int, command: str) -> Dict[str, Any]:
+    command = command.strip()
+    if not command:
+        return {"index": index, "error": "Command cannot be empty"}
+    try:
+        return {"index": index, "intent": parser.parse(command).model_dump()}
+    except Exception as e:
+        logger.error(f"Error parsing intent: {str(e)}")
+        return {"index": index, "error": f"Failed to parse intent: {str(e)}"}
+
+async def _parse_batch(commands: List[str]):
+    async for line in _stream_batch(commands, _parse_one):
+        yield line
+    logger.info(f"Parsed batch of {len(commands)} commands")
+
+@app.post("/parse/batch")
+async def parse_intents(request: BatchCommandRequest):
+    """Parse many commands in one request, streaming one NDJSON result per command as it finishes"""
+    return StreamingResponse(_parse_batch(request.commands), media_type="application/x-ndjson")
+
+def build_workflow(intent: ParsedIntent) -> Dict[str, Any]:
+    """Convert a parsed intent into the executable workflow format"""
+    created_at = datetime.utcnow().isoformat()
+    
+    # Convert intent steps to executable workflow format
+    workflow_steps = []
+    for step in intent.steps:
+        workflow_step = {
+            "id": step.id,
+            "name": step.title,
+            "description": step.description,
+            "agent_type": step.agent,
+            "tools": step.tools,
+            "dependencies": step.dependencies,
+            "estimated_duration": step.estimatedTime,
+            "parameters": step.parameters or {},
+            "status": "pending",
+            "created_at": created_at
+        }
+        workflow_steps.append(workflow_step)
+    
+    # Create workflow metadata
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"Auto-generated: {intent.objective[:50]}...",
+        "description": intent.objective,
+        "complexity": intent.complexity,
+        "confidence": intent.confidence,
+        "required_data": intent.requiredData,
+        "output_format": intent.outputFormat,
+        "steps": workflow_steps,
+        "status": "draft",
+        "created_at": created_at,
+        "estimated_total_time": f"{len(workflow_steps) * 5}-{len(workflow_steps) * 10} minutes"
+    }
+
 @app.post("/generate")
 async def generate_workflow(request: IntentRequest):
     """Generate executable workflow from parsed intent"""
@@ -305,37 +454,7 @@ async def generate_workflow(request: IntentRequest):
         intent = request.intent
         logger.info(f"Generating workflow for: {intent.objective}")
         
-        # Convert intent steps to executable workflow format
-        workflow_steps = []
-        for step in intent.steps:
-            workflow_step = {
-                "id": step.id,
-                "name": step.title,
-                "description": step.description,
-                "agent_type": step.agent,
-                "tools": step.tools,
-                "dependencies": step.dependencies,
-                "estimated_duration": step.estimatedTime,
-                "parameters": step.parameters or {},
-                "status": "pending",
-                "created_at": datetime.utcnow().isoformat()
-            }
-            workflow_steps.append(workflow_step)
-        
-        # Create workflow metadata
-        workflow = {
-            "id": str(uuid.uuid4()),
-            "name": f"Auto-generated: {intent.objective[:50]}...",
-            "description": intent.objective,
-            "complexity": intent.complexity,
-            "confidence": intent.confidence,
-            "required_data": intent.requiredData,
-            "output_format": intent.outputFormat,
-            "steps": workflow_steps,
-            "status": "draft",
-            "created_at": datetime.utcnow().isoformat(),
-            "estimated_total_time": f"{len(workflow_steps) * 5}-{len(workflow_steps) * 10} minutes"
-        }
+        workflow = build_workflow(intent)
         
         logger.info(f"Generated workflow with ID: {workflow['id']}")
         return workflow
@@ -344,6 +463,23 @@ async def generate_workflow(request: IntentRequest):
         logger.error(f"Error generating workflow: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate workflow: {str(e)}")
 
+def _generate_one(index: int, intent: ParsedIntent) -> Dict[str, Any]:
+    try:
+        return {"index": index, "workflow": build_workflow(intent)}
+    except Exception as e:
+        logger.error(f"Error generating workflow: {str(e)}")
+        return {"index": index, "error": f"Failed to generate workflow: {str(e)}"}
+
+async def _generate_batch(intents: List[ParsedIntent]):
+    async for line in _stream_batch(intents, _generate_one):
+        yield line
+    logger.info(f"Generated batch of {len(intents)} workflows")
+
+@app.post("/generate/batch")
+async def generate_workflows(request: BatchIntentRequest):
+    """Generate workflows for many intents, streaming one NDJSON result per intent as it finishes"""
+    return StreamingResponse(_generate_batch(request.intents), media_type="application/x-ndjson")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -1,15 +1,21 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
+import os
 import uuid
 import json
+import base64
+import bisect
 import asyncio
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, timezone
 import logging
 from enum import Enum
 import aiohttp
-from dataclasses import dataclass, asdict
+from collections import deque
+from dataclasses import dataclass, asdict, field
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -82,6 +88,10 @@ class WorkflowExecution(BaseModel):
     execution_log: List[Dict[str, Any]] = []
     context: Dict[str, Any] = {}
 
+class ExecutionPage(BaseModel):
+    executions: List[WorkflowExecution]
+    next_cursor: Optional[str] = None
+
 class CreateWorkflowRequest(BaseModel):
     name: str
     description: str
@@ -99,6 +109,259 @@ class UpdateWorkflowRequest(BaseModel):
 # In-memory storage (replace with database in production)
 workflows: Dict[str, Workflow] = {}
 executions: Dict[str, WorkflowExecution] = {}
+execution_logs: Dict[str, "ExecutionLog"] = {}
+
+def _utc_naive(value: datetime) -> datetime:
+    """Compare query timestamps with the naive UTC ones executions are stamped with"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def encode_cursor(key: Tuple[datetime, str]) -> str:
+    """Opaque page cursor pointing just past the execution with this (started_at, id)"""
+    started_at, execution_id = key
+    return base64.urlsafe_b64encode(json.dumps([started_at.isoformat(), execution_id]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        started_at, execution_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return _utc_naive(datetime.fromisoformat(started_at)), str(execution_id)
+    except (TypeError, ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Execution logs keep their most recent entries in memory and append older
+# ones to a JSON lines file per execution
+EXECUTION_LOG_SIZE = int(os.getenv("EXECUTION_LOG_SIZE", "200"))
+EXECUTION_LOG_SPILL_BATCH = int(os.getenv("EXECUTION_LOG_SPILL_BATCH", "100"))
+EXECUTION_LOG_DIR = os.getenv("EXECUTION_LOG_DIR", os.path.join(tempfile.gettempdir(), "workflow-engine-logs"))
+# Log files untouched for longer than this (seconds) are deleted, checked every prune interval
+EXECUTION_LOG_RETENTION = float(os.getenv("EXECUTION_LOG_RETENTION", str(24 * 3600)))
+EXECUTION_LOG_PRUNE_INTERVAL = float(os.getenv("EXECUTION_LOG_PRUNE_INTERVAL", "600"))
+
+# Monotonic clock anchored to the wall clock, in integer nanoseconds
+_WALL_CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+class LogEntry:
+    __slots__ = ("seq", "timestamp_ns", "step_id", "event", "message", "error")
+    
+    def __init__(self, seq: int, step_id: str, event: str, message: str, error: Optional[str] = None):
+        self.seq = seq
+        self.timestamp_ns = time.monotonic_ns() + _WALL_CLOCK_OFFSET_NS
+        self.step_id = step_id
+        self.event = event
+        self.message = message
+        self.error = error
+    
+    def to_dict(self) -> Dict[str, Any]:
+        entry = {
+            "seq": self.seq,
+            "timestamp": datetime.utcfromtimestamp(self.timestamp_ns / 1e9).isoformat(),
+            "step_id": self.step_id,
+            "event": self.event,
+            "message": self.message
+        }
+        if self.error is not None:
+            entry["error"] = self.error
+        return entry
+
+class ExecutionLog:
+    """Bounded log of one execution
+    
+    The latest `capacity` entries are kept in a ring buffer. Evicted entries
+    are appended to the execution's log file in batches on a worker thread,
+    and read back only when a page of the log reaches them. The sequence
+    number and byte offset of every line in the file are kept, so a page is
+    read with one seek.
+    """
+    def __init__(self, execution_id: str, capacity: int = EXECUTION_LOG_SIZE, spill_batch_size: int = EXECUTION_LOG_SPILL_BATCH):
+        self.path = os.path.join(EXECUTION_LOG_DIR, f"{execution_id}.jsonl")
+        self.spill_batch_size = spill_batch_size
+        self._entries: deque = deque(maxlen=max(1, capacity))
+        self._evicted: List[LogEntry] = []
+        # Batches handed to the writer but not in the file yet
+        self._writing: List[List[LogEntry]] = []
+        self._write_lock = asyncio.Lock()
+        self._writers: Set[asyncio.Task] = set()
+        # Sequence numbers of the lines in the file, and their start offsets
+        # followed by the end of the last line
+        self._spilled_seqs: List[int] = []
+        self._offsets: List[int] = [0]
+        self.next_seq = 0
+    
+    def append(self, step_id: str, event: str, message: str, error: Optional[str] = None):
+        if len(self._entries) == self._entries.maxlen:
+            self._evicted.append(self._entries[0])
+        self._entries.append(LogEntry(self.next_seq, step_id, event, message, error))
+        self.next_seq += 1
+        if len(self._evicted) >= self.spill_batch_size:
+            batch, self._evicted = self._evicted, []
+            self._writing.append(batch)
+            writer = asyncio.create_task(self._spill(batch))
+            self._writers.add(writer)
+            writer.add_done_callback(self._writers.discard)
+    
+    async def _spill(self, batch: List[LogEntry]):
+        # The lock keeps batches in order; tasks acquire it in creation order
+        async with self._write_lock:
+            lines = [(json.dumps(entry.to_dict()) + "\n").encode("utf-8") for entry in batch]
+            try:
+                start = await asyncio.to_thread(self._write_lines, lines)
+            except OSError as e:
+                logger.warning(f"Failed to spill execution log to {self.path}: {str(e)}")
+                # Keep the newest evicted entries for the next attempt
+                self._evicted = (batch + self._evicted)[-self.spill_batch_size:]
+                return
+            finally:
+                self._writing.remove(batch)
+            if start != self._offsets[-1]:
+                # The file was pruned or changed behind our back; index only this batch
+                self._spilled_seqs, self._offsets = [], [start]
+            for entry, line in zip(batch, lines):
+                self._spilled_seqs.append(entry.seq)
+                self._offsets.append(self._offsets[-1] + len(line))
+    
+    def _write_lines(self, lines: List[bytes]) -> int:
+        """Append lines to the log file and return the offset they start at"""
+        os.makedirs(EXECUTION_LOG_DIR, exist_ok=True)
+        with open(self.path, "ab") as log_file:
+            start = log_file.tell()
+            try:
+                log_file.write(b"".join(lines))
+                log_file.flush()
+            except OSError:
+                # Drop a partial batch so indexed offsets stay valid
+                log_file.truncate(start)
+                raise
+        return start
+    
+    def forget_spilled(self):
+        """Drop the index of a log file that has been deleted"""
+        self._spilled_seqs, self._offsets = [], [0]
+    
+    def recent(self) -> List[Dict[str, Any]]:
+        """Entries still in memory, oldest first"""
+        pending = [entry for batch in self._writing for entry in batch] + self._evicted
+        return [entry.to_dict() for entry in pending] + [entry.to_dict() for entry in self._entries]
+    
+    async def read(self, before: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """The last `limit` entries before sequence number `before`, oldest first"""
+        entries = [entry for entry in self.recent() if before is None or entry["seq"] < before][-limit:]
+        if len(entries) < limit:
+            upper = entries[0]["seq"] if entries else before
+            end = bisect.bisect_left(self._spilled_seqs, upper) if upper is not None else len(self._spilled_seqs)
+            start = max(0, end - (limit - len(entries)))
+            if start < end:
+                entries = await asyncio.to_thread(self._read_spilled, self._offsets[start], self._offsets[end]) + entries
+        return entries
+    
+    def _read_spilled(self, start: int, end: int) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "rb") as log_file:
+                log_file.seek(start)
+                data = log_file.read(end - start)
+        except FileNotFoundError:
+            return []
+        return [json.loads(line) for line in data.splitlines()]
+
+def prune_execution_logs(now: Optional[float] = None) -> int:
+    """Delete log files untouched for EXECUTION_LOG_RETENTION seconds; returns how many"""
+    now = time.time() if now is None else now
+    try:
+        names = os.listdir(EXECUTION_LOG_DIR)
+    except FileNotFoundError:
+        return 0
+    pruned = 0
+    for name in names:
+        path = os.path.join(EXECUTION_LOG_DIR, name)
+        try:
+            if not name.endswith(".jsonl") or now - os.path.getmtime(path) < EXECUTION_LOG_RETENTION:
+                continue
+            os.remove(path)
+        except OSError:
+            continue
+        pruned += 1
+        execution_log = execution_logs.get(name[:-len(".jsonl")])
+        if execution_log is not None:
+            execution_log.forget_spilled()
+    return pruned
+
+async def prune_execution_logs_periodically():
+    while True:
+        try:
+            pruned = await asyncio.to_thread(prune_execution_logs)
+            if pruned:
+                logger.info(f"Pruned {pruned} execution log files")
+        except Exception as e:
+            logger.error(f"Execution log pruning failed: {str(e)}")
+        await asyncio.sleep(EXECUTION_LOG_PRUNE_INTERVAL)
+
+class ExecutionIndex:
+    """Secondary indexes over `executions` for paginated listing and stats
+    
+    Executions of each workflow are kept sorted by (started_at, id), so a page
+    is a binary search plus a slice; executions are also grouped by status,
+    and those groups double as incrementally maintained status counters.
+    Status changes must go through set_status to keep the indexes in sync.
+    """
+    def __init__(self):
+        self.by_workflow: Dict[str, List[Tuple[datetime, str]]] = {}
+        self.by_status: Dict[WorkflowStatus, Set[str]] = {}
+    
+    def add(self, execution: WorkflowExecution):
+        bisect.insort(self.by_workflow.setdefault(execution.workflow_id, []), (execution.started_at, execution.id))
+        self.by_status.setdefault(execution.status, set()).add(execution.id)
+    
+    def set_status(self, execution: WorkflowExecution, status: WorkflowStatus):
+        if execution.status != status:
+            self.by_status[execution.status].discard(execution.id)
+            self.by_status.setdefault(status, set()).add(execution.id)
+        execution.status = status
+    
+    def status_counts(self) -> Dict[str, int]:
+        return {status.value: len(ids) for status, ids in self.by_status.items() if ids}
+    
+    def page(self,
+             workflow_id: str,
+             status: Optional[WorkflowStatus] = None,
+             started_after: Optional[datetime] = None,
+             started_before: Optional[datetime] = None,
+             cursor: Optional[Tuple[datetime, str]] = None,
+             limit: int = 50) -> Tuple[List[WorkflowExecution], Optional[str]]:
+        """One page of a workflow's executions, newest first, and the next page's cursor"""
+        keys = self.by_workflow.get(workflow_id, [])
+        # Keys in [lower, upper) match the time range and come after the cursor
+        lower = (_utc_naive(started_after), "") if started_after else None
+        upper = (_utc_naive(started_before), "") if started_before else None
+        if cursor is not None and (upper is None or cursor < upper):
+            upper = cursor
+        lo = bisect.bisect_left(keys, lower) if lower else 0
+        hi = bisect.bisect_left(keys, upper) if upper else len(keys)
+        
+        if status is None:
+            matches = keys[max(lo, hi - limit - 1):hi][::-1]
+        else:
+            status_ids = self.by_status.get(status, set())
+            if len(status_ids) < hi - lo:
+                # The status group is the smaller index; filter and order it instead
+                candidates = (executions[execution_id] for execution_id in status_ids)
+                matches = sorted((
+                    (execution.started_at, execution.id) for execution in candidates
+                    if execution.workflow_id == workflow_id
+                    and (lower is None or (execution.started_at, execution.id) >= lower)
+                    and (upper is None or (execution.started_at, execution.id) < upper)
+                ), reverse=True)[:limit + 1]
+            else:
+                matches = []
+                for index in range(hi - 1, lo - 1, -1):
+                    if keys[index][1] in status_ids:
+                        matches.append(keys[index])
+                        if len(matches) > limit:
+                            break
+        
+        next_cursor = encode_cursor(matches[limit - 1]) if len(matches) > limit else None
+        return [executions[execution_id] for _, execution_id in matches[:limit]], next_cursor
+
+execution_index = ExecutionIndex()
 
 # Agent and tool registry
 AGENT_ENDPOINTS = {
@@ -110,12 +373,122 @@ AGENT_ENDPOINTS = {
     "general_agent": "http://localhost:8009"
 }
 
+# Scheduler limits: steps in flight per execution, and per agent type across
+# all executions of this engine process
+MAX_CONCURRENT_STEPS = int(os.getenv("MAX_CONCURRENT_STEPS", "8"))
+DEFAULT_AGENT_CONCURRENCY = int(os.getenv("DEFAULT_AGENT_CONCURRENCY", "16"))
+AGENT_CONCURRENCY_LIMITS: Dict[str, int] = {
+    "data_agent": DEFAULT_AGENT_CONCURRENCY,
+    "web_agent": DEFAULT_AGENT_CONCURRENCY,
+    "file_agent": DEFAULT_AGENT_CONCURRENCY,
+    "monitor_agent": DEFAULT_AGENT_CONCURRENCY,
+    "report_agent": DEFAULT_AGENT_CONCURRENCY,
+    "general_agent": DEFAULT_AGENT_CONCURRENCY
+}
+
+# Agent HTTP client tuning; one pooled session is shared by all step dispatches
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "100"))
+AGENT_POOL_SIZE_PER_HOST = int(os.getenv("AGENT_POOL_SIZE_PER_HOST", "20"))
+AGENT_KEEPALIVE_TIMEOUT = float(os.getenv("AGENT_KEEPALIVE_TIMEOUT", "60"))
+AGENT_DNS_CACHE_TTL = int(os.getenv("AGENT_DNS_CACHE_TTL", "300"))
+AGENT_CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", "10"))
+DEFAULT_AGENT_TIMEOUT = float(os.getenv("DEFAULT_AGENT_TIMEOUT", "300"))
+
+# Total request timeout in seconds per agent type
+AGENT_TIMEOUTS: Dict[str, float] = {
+    "data_agent": 300,
+    "web_agent": 120,
+    "file_agent": 120,
+    "monitor_agent": 60,
+    "report_agent": 300,
+    "general_agent": DEFAULT_AGENT_TIMEOUT
+}
+
+@dataclass
+class ExecutionPlan:
+    """Dependency graph of a workflow version, compiled once and shared by its executions"""
+    version: datetime
+    steps_by_id: Dict[str, WorkflowStep]
+    in_degree: Dict[str, int]
+    dependents: Dict[str, List[str]] = field(default_factory=dict)
+
+def compile_execution_plan(workflow: Workflow) -> ExecutionPlan:
+    """Index steps by id and build in-degree counters and reverse dependency lists"""
+    steps_by_id = {step.id: step for step in workflow.steps}
+    in_degree = {}
+    dependents: Dict[str, List[str]] = {}
+    
+    for step in workflow.steps:
+        in_degree[step.id] = len(step.dependencies)
+        for dep_id in step.dependencies:
+            # Unknown dependencies are never satisfied, so the step is never ready
+            dependents.setdefault(dep_id, []).append(step.id)
+    
+    return ExecutionPlan(
+        version=workflow.updated_at,
+        steps_by_id=steps_by_id,
+        in_degree=in_degree,
+        dependents=dependents
+    )
+
 class WorkflowEngine:
     def __init__(self):
         self.running_executions: Dict[str, asyncio.Task] = {}
+        self.agent_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.execution_plans: Dict[str, ExecutionPlan] = {}
+        self.session: Optional[aiohttp.ClientSession] = None
+    
+    def get_session(self) -> aiohttp.ClientSession:
+        """Get the long-lived agent HTTP session, creating it on first use"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=AGENT_POOL_SIZE,
+                limit_per_host=AGENT_POOL_SIZE_PER_HOST,
+                keepalive_timeout=AGENT_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=AGENT_DNS_CACHE_TTL
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+    
+    async def close(self):
+        """Close the agent HTTP session"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    def get_agent_timeout(self, agent_type: str) -> aiohttp.ClientTimeout:
+        """Get the request timeout for an agent type"""
+        total = AGENT_TIMEOUTS.get(agent_type, DEFAULT_AGENT_TIMEOUT)
+        return aiohttp.ClientTimeout(total=total, connect=AGENT_CONNECT_TIMEOUT)
+    
+    def get_execution_plan(self, workflow: Workflow) -> ExecutionPlan:
+        """Get the compiled plan for the current version of a workflow"""
+        plan = self.execution_plans.get(workflow.id)
+        if plan is None or plan.version != workflow.updated_at:
+            plan = compile_execution_plan(workflow)
+            self.execution_plans[workflow.id] = plan
+        return plan
+    
+    def invalidate_execution_plan(self, workflow_id: str):
+        """Drop the compiled plan of a workflow that was changed or deleted"""
+        self.execution_plans.pop(workflow_id, None)
+    
+    def get_agent_semaphore(self, agent_type: str) -> asyncio.Semaphore:
+        """Get the semaphore capping concurrent steps for an agent type"""
+        semaphore = self.agent_semaphores.get(agent_type)
+        if semaphore is None:
+            limit = AGENT_CONCURRENCY_LIMITS.get(agent_type, DEFAULT_AGENT_CONCURRENCY)
+            semaphore = asyncio.Semaphore(limit)
+            self.agent_semaphores[agent_type] = semaphore
+        return semaphore
     
     async def execute_step(self, execution: WorkflowExecution, step: WorkflowStep) -> bool:
-        """Execute a single workflow step"""
+        """Execute a single workflow step, waiting for a free slot for its agent type"""
+        async with self.get_agent_semaphore(step.agent_type):
+            return await self._execute_step(execution, step)
+    
+    async def _execute_step(self, execution: WorkflowExecution, step: WorkflowStep) -> bool:
+        """Dispatch a step to its agent and record the outcome"""
         try:
             logger.info(f"Executing step {step.id}: {step.name}")
             
@@ -124,12 +497,7 @@ class WorkflowEngine:
             step.started_at = datetime.utcnow()
             
             # Log execution start
-            execution.execution_log.append({
-                "timestamp": datetime.utcnow().isoformat(),
-                "step_id": step.id,
-                "event": "step_started",
-                "message": f"Started executing step: {step.name}"
-            })
+            execution_logs[execution.id].append(step.id, "step_started", f"Started executing step: {step.name}")
             
             # Get agent endpoint
             agent_endpoint = AGENT_ENDPOINTS.get(step.agent_type)
@@ -144,35 +512,28 @@ class WorkflowEngine:
                 "context": execution.context
             }
             
-            # Execute step via agent
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{agent_endpoint}/execute",
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=300)  # 5 minute timeout
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        step.output = result.get("output", {})
-                        step.status = StepStatus.COMPLETED
-                        step.completed_at = datetime.utcnow()
-                        
-                        # Update execution context with step output
-                        execution.context.update(result.get("context_updates", {}))
-                        
-                        # Log success
-                        execution.execution_log.append({
-                            "timestamp": datetime.utcnow().isoformat(),
-                            "step_id": step.id,
-                            "event": "step_completed",
-                            "message": f"Successfully completed step: {step.name}",
-                            "output": step.output
-                        })
-                        
-                        return True
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"Agent execution failed: {error_text}")
+            # Execute step via agent over the shared connection pool
+            async with self.get_session().post(
+                f"{agent_endpoint}/execute",
+                json=payload,
+                timeout=self.get_agent_timeout(step.agent_type)
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    step.output = result.get("output", {})
+                    step.status = StepStatus.COMPLETED
+                    step.completed_at = datetime.utcnow()
+                    
+                    # Update execution context with step output
+                    execution.context.update(result.get("context_updates", {}))
+                    
+                    # Log success; the output itself stays on the step
+                    execution_logs[execution.id].append(step.id, "step_completed", f"Successfully completed step: {step.name}")
+                    
+                    return True
+                else:
+                    error_text = await response.text()
+                    raise Exception(f"Agent execution failed: {error_text}")
         
         except Exception as e:
             logger.error(f"Step execution failed: {str(e)}")
@@ -181,37 +542,10 @@ class WorkflowEngine:
             step.completed_at = datetime.utcnow()
             
             # Log failure
-            execution.execution_log.append({
-                "timestamp": datetime.utcnow().isoformat(),
-                "step_id": step.id,
-                "event": "step_failed",
-                "message": f"Step failed: {str(e)}",
-                "error": str(e)
-            })
+            execution_logs[execution.id].append(step.id, "step_failed", f"Step failed: {str(e)}", error=str(e))
             
             return False
     
-    def get_ready_steps(self, workflow: Workflow) -> List[WorkflowStep]:
-        """Get steps that are ready to execute (dependencies satisfied)"""
-        ready_steps = []
-        
-        for step in workflow.steps:
-            if step.status != StepStatus.PENDING:
-                continue
-            
-            # Check if all dependencies are completed
-            dependencies_satisfied = True
-            for dep_id in step.dependencies:
-                dep_step = next((s for s in workflow.steps if s.id == dep_id), None)
-                if not dep_step or dep_step.status != StepStatus.COMPLETED:
-                    dependencies_satisfied = False
-                    break
-            
-            if dependencies_satisfied:
-                ready_steps.append(step)
-        
-        return ready_steps
-    
     async def execute_workflow(self, workflow_id: str) -> str:
         """Execute a workflow and return execution ID"""
         workflow = workflows.get(workflow_id)
@@ -227,6 +561,8 @@ class WorkflowEngine:
             started_at=datetime.utcnow()
         )
         executions[execution_id] = execution
+        execution_logs[execution_id] = ExecutionLog(execution_id)
+        execution_index.add(execution)
         
         # Start execution task
         task = asyncio.create_task(self._run_workflow_execution(workflow, execution))
@@ -236,43 +572,62 @@ class WorkflowEngine:
     
     async def _run_workflow_execution(self, workflow: Workflow, execution: WorkflowExecution):
         """Run the actual workflow execution"""
+        running: Dict[asyncio.Task, WorkflowStep] = {}
         try:
             logger.info(f"Starting workflow execution: {execution.id}")
             
+            plan = self.get_execution_plan(workflow)
             total_steps = len(workflow.steps)
             completed_steps = 0
             
-            while completed_steps < total_steps:
-                # Get ready steps
-                ready_steps = self.get_ready_steps(workflow)
+            # Per-execution dependency counters; steps already completed count as done
+            remaining = dict(plan.in_degree)
+            for step in workflow.steps:
+                if step.status == StepStatus.COMPLETED:
+                    for dependent_id in plan.dependents.get(step.id, []):
+                        remaining[dependent_id] -= 1
+            ready = deque(
+                step for step in workflow.steps
+                if step.status == StepStatus.PENDING and remaining[step.id] == 0
+            )
+            
+            while True:
+                # Start every ready step as soon as its dependencies are done
+                while ready and len(running) < MAX_CONCURRENT_STEPS:
+                    step = ready.popleft()
+                    execution.current_step_id = step.id
+                    running[asyncio.create_task(self.execute_step(execution, step))] = step
                 
-                if not ready_steps:
+                if not running:
                     # Check if we're stuck (no ready steps but not all completed)
                     pending_steps = [s for s in workflow.steps if s.status == StepStatus.PENDING]
                     if pending_steps:
                         raise Exception("Workflow stuck: circular dependencies or missing dependencies")
                     break
                 
-                # Execute ready steps (can be parallel in the future)
-                for step in ready_steps:
-                    execution.current_step_id = step.id
-                    success = await self.execute_step(execution, step)
-                    
-                    if success:
+                # Wake up on the first finished step rather than the whole batch
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step = running.pop(task)
+                    if task.result():
                         completed_steps += 1
                         execution.progress = (completed_steps / total_steps) * 100
+                        
+                        # Release dependents whose last dependency just finished
+                        for dependent_id in plan.dependents.get(step.id, []):
+                            remaining[dependent_id] -= 1
+                            dependent = plan.steps_by_id[dependent_id]
+                            if remaining[dependent_id] == 0 and dependent.status == StepStatus.PENDING:
+                                ready.append(dependent)
                     else:
                         # Step failed, stop execution
-                        execution.status = WorkflowStatus.FAILED
+                        execution_index.set_status(execution, WorkflowStatus.FAILED)
                         execution.error_message = step.error_message
                         execution.completed_at = datetime.utcnow()
                         return
-                
-                # Small delay between step batches
-                await asyncio.sleep(1)
             
             # All steps completed successfully
-            execution.status = WorkflowStatus.COMPLETED
+            execution_index.set_status(execution, WorkflowStatus.COMPLETED)
             execution.progress = 100.0
             execution.completed_at = datetime.utcnow()
             execution.current_step_id = None
@@ -281,16 +636,33 @@ class WorkflowEngine:
             
         except Exception as e:
             logger.error(f"Workflow execution failed: {str(e)}")
-            execution.status = WorkflowStatus.FAILED
+            execution_index.set_status(execution, WorkflowStatus.FAILED)
             execution.error_message = str(e)
             execution.completed_at = datetime.utcnow()
         
         finally:
+            # Stop steps still in flight after a failure or cancellation
+            for task in running:
+                task.cancel()
+            
             # Clean up running execution
             if execution.id in self.running_executions:
                 del self.running_executions[execution.id]
 
 workflow_engine = WorkflowEngine()
+execution_log_pruner: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def startup_event():
+    global execution_log_pruner
+    execution_log_pruner = asyncio.create_task(prune_execution_logs_periodically())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled agent connections"""
+    if execution_log_pruner is not None:
+        execution_log_pruner.cancel()
+    await workflow_engine.close()
 
 # API Endpoints
 @app.get("/workflows", response_model=List[Workflow])
@@ -348,6 +720,7 @@ async def update_workflow(workflow_id: str, request: UpdateWorkflowRequest):
         workflow.metadata = request.metadata
     
     workflow.updated_at = datetime.utcnow()
+    workflow_engine.invalidate_execution_plan(workflow_id)
     
     logger.info(f"Updated workflow: {workflow_id}")
     return workflow
@@ -359,6 +732,7 @@ async def delete_workflow(workflow_id: str):
         raise HTTPException(status_code=404, detail="Workflow not found")
     
     del workflows[workflow_id]
+    workflow_engine.invalidate_execution_plan(workflow_id)
     logger.info(f"Deleted workflow: {workflow_id}")
     
     return {"message": "Workflow deleted successfully"}
@@ -380,13 +754,46 @@ async def get_execution(workflow_id: str, execution_id: str):
     if not execution or execution.workflow_id != workflow_id:
         raise HTTPException(status_code=404, detail="Execution not found")
     
-    return execution
+    # Recent log entries only; older ones are paged in from /log
+    return execution.model_copy(update={"execution_log": execution_logs[execution_id].recent()})
+
+@app.get("/workflows/{workflow_id}/executions/{execution_id}/log")
+async def get_execution_log(workflow_id: str,
+                            execution_id: str,
+                            before: Optional[int] = Query(None, ge=0),
+                            limit: int = Query(100, ge=1, le=1000)):
+    """Page through an execution's log, newest page first
+    
+    Pass the returned next_before as `before` to get the preceding entries.
+    """
+    execution = executions.get(execution_id)
+    if not execution or execution.workflow_id != workflow_id:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    entries = await execution_logs[execution_id].read(before, limit)
+    first_seq = entries[0]["seq"] if entries else 0
+    return {"entries": entries, "next_before": first_seq if first_seq > 0 else None}
 
-@app.get("/workflows/{workflow_id}/executions", response_model=List[WorkflowExecution])
-async def get_workflow_executions(workflow_id: str):
-    """Get all executions for a workflow"""
-    workflow_executions = [e for e in executions.values() if e.workflow_id == workflow_id]
-    return workflow_executions
+@app.get("/workflows/{workflow_id}/executions", response_model=ExecutionPage)
+async def get_workflow_executions(workflow_id: str,
+                                  status: Optional[WorkflowStatus] = None,
+                                  started_after: Optional[datetime] = None,
+                                  started_before: Optional[datetime] = None,
+                                  cursor: Optional[str] = None,
+                                  limit: int = Query(50, ge=1, le=500)):
+    """Get a page of executions for a workflow, newest first
+    
+    Pass the returned next_cursor as `cursor` to get the following page.
+    """
+    page, next_cursor = execution_index.page(
+        workflow_id,
+        status=status,
+        started_after=started_after,
+        started_before=started_before,
+        cursor=decode_cursor(cursor) if cursor else None,
+        limit=limit
+    )
+    return ExecutionPage(executions=page, next_cursor=next_cursor)
 
 @app.post("/workflows/{workflow_id}/executions/{execution_id}/stop")
 async def stop_execution(workflow_id: str, execution_id: str):
@@ -398,7 +805,7 @@ async def stop_execution(workflow_id: str, execution_id: str):
     if execution_id in workflow_engine.running_executions:
         task = workflow_engine.running_executions[execution_id]
         task.cancel()
-        execution.status = WorkflowStatus.PAUSED
+        execution_index.set_status(execution, WorkflowStatus.PAUSED)
         execution.completed_at = datetime.utcnow()
         
         logger.info(f"Stopped execution: {execution_id}")
@@ -423,10 +830,7 @@ async def get_stats():
     total_executions = len(executions)
     running_executions = len(workflow_engine.running_executions)
     
-    status_counts = {}
-    for execution in executions.values():
-        status = execution.status
-        status_counts[status] = status_counts.get(status, 0) + 1
+    status_counts = execution_index.status_counts()
     
     return {
         "total_workflows": total_workflows,
@@ -4,7 +4,7 @@ from typing import Dict, Any, List
 
 # Import shared modules
 from shared.models.core import OrchestraAgent, AgentConfig, Tool, ToolConfig
-from shared.models.flow import Flow, Node, AgentNode, FlowBuilder
+from shared.models.flow import Flow, Node, AgentNode, FlowBuilder, RunState
 from shared.utils.flow_utils import flow_to_dict, dict_to_flow, flow_to_yaml
 from shared.utils.logging import get_logger
 
@@ -157,16 +157,17 @@ def create_rag_workflow() -> Flow:
 # Example function to run a flow
 async def run_flow(flow: Flow, initial_context: Dict[str, Any]) -> Dict[str, Any]:
     """Run a flow with the given initial context."""
+    state = RunState()
     try:
-        result = await flow.exec(initial_context)
-        print(f"Flow completed with status: {flow.status.value}")
-        print(f"Flow history:\n{json.dumps(flow.history, indent=2)}")
+        result = await flow.exec(initial_context, state)
+        print(f"Flow completed with status: {state.status.value}")
+        print(f"Flow history:\n{json.dumps(state.history.to_list(), indent=2)}")
         return result
     except Exception as e:
         print(f"Flow failed: {str(e)}")
-        print(f"Flow status: {flow.status.value}")
-        print(f"Flow error: {flow.error}")
-        print(f"Flow history:\n{json.dumps(flow.history, indent=2)}")
+        print(f"Flow status: {state.status.value}")
+        print(f"Flow error: {state.error}")
+        print(f"Flow history:\n{json.dumps(state.history.to_list(), indent=2)}")
         return {"error": str(e)}
 
 # Example usage
@@ -36,7 +36,85 @@ def init_db():
                     FOREIGN KEY (workflow_id) REFERENCES workflows(workflow_id)
                 )
             """)
-            
+            cur.execute("ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS current_node_id VARCHAR(255)")
+
+            # Composite indexes matching the keyset order of run listings
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_workflow_runs_created
+                ON workflow_runs (created_at DESC, run_id DESC)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_workflow_runs_workflow_created
+                ON workflow_runs (workflow_id, created_at DESC, run_id DESC)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_workflow_runs_status_created
+                ON workflow_runs (status, created_at DESC, run_id DESC)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_workflow_runs_workflow_status_created
+                ON workflow_runs (workflow_id, status, created_at DESC, run_id DESC)
+            """)
+
+            # History events spilled from runs' in-memory ring buffers
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS workflow_run_events (
+                    run_id VARCHAR(255) NOT NULL,
+                    seq BIGINT NOT NULL,
+                    timestamp_ns BIGINT NOT NULL,
+                    status VARCHAR(50) NOT NULL,
+                    node_id VARCHAR(255),
+                    action VARCHAR(255),
+                    error TEXT,
+                    PRIMARY KEY (run_id, seq)
+                )
+            """)
+
+            # Run counts per workflow and status, kept up to date by a trigger
+            # instead of counting workflow_runs on every request
+            cur.execute("SELECT to_regclass('workflow_run_counts') IS NULL")
+            backfill_counts = cur.fetchone()[0]
+            # One statement list runs as one transaction; creating the triggers locks
+            # out concurrent writes, so the backfill and the triggers never overlap
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS workflow_run_counts (
+                    workflow_id VARCHAR(255) NOT NULL,
+                    status VARCHAR(50) NOT NULL,
+                    count BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (workflow_id, status)
+                );
+
+                CREATE OR REPLACE FUNCTION update_workflow_run_counts() RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        UPDATE workflow_run_counts SET count = count - 1
+                        WHERE workflow_id = OLD.workflow_id AND status = OLD.status;
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        INSERT INTO workflow_run_counts (workflow_id, status, count)
+                        VALUES (NEW.workflow_id, NEW.status, 1)
+                        ON CONFLICT (workflow_id, status) DO UPDATE SET count = workflow_run_counts.count + 1;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS workflow_run_counts_insert_delete ON workflow_runs;
+                CREATE TRIGGER workflow_run_counts_insert_delete
+                AFTER INSERT OR DELETE ON workflow_runs
+                FOR EACH ROW EXECUTE FUNCTION update_workflow_run_counts();
+
+                DROP TRIGGER IF EXISTS workflow_run_counts_update ON workflow_runs;
+                CREATE TRIGGER workflow_run_counts_update
+                AFTER UPDATE OF workflow_id, status ON workflow_runs
+                FOR EACH ROW
+                WHEN (OLD.workflow_id IS DISTINCT FROM NEW.workflow_id OR OLD.status IS DISTINCT FROM NEW.status)
+                EXECUTE FUNCTION update_workflow_run_counts();
+            """ + ("""
+                INSERT INTO workflow_run_counts (workflow_id, status, count)
+                SELECT workflow_id, status, COUNT(*) FROM workflow_runs GROUP BY workflow_id, status;
+            """ if backfill_counts else ""))
+
             # Create agents table
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS agents (
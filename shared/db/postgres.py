@@ -1,25 +1,301 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.extras import Json, RealDictCursor, execute_values
+import asyncio
+import functools
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 POSTGRES_DSN = os.getenv("POSTGRES_DSN", "dbname=orchestra user=postgres password=postgres host=localhost")
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+# Pooled connections idle for at least this many seconds are probed with
+# SELECT 1 before they are handed out (0 probes every checkout)
+POSTGRES_PROBE_IDLE = float(os.getenv("POSTGRES_PROBE_IDLE", "0"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of waiting when it is exhausted, so
+# callers queue here for one of its POSTGRES_POOL_MAX connections
+_pool_slots = threading.BoundedSemaphore(POSTGRES_POOL_MAX)
+# Async helpers get their own workers, one per connection, so waiting for the
+# database never ties up the default executor
+_executor = ThreadPoolExecutor(max_workers=POSTGRES_POOL_MAX, thread_name_prefix="postgres")
+# When each pooled connection was last returned, by id
+_returned_at = {}
 
 def get_conn():
+    """Open a dedicated connection (for admin tasks such as init_db)."""
     return psycopg2.connect(POSTGRES_DSN)
 
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(POSTGRES_POOL_MIN, POSTGRES_POOL_MAX, POSTGRES_DSN)
+    return _pool
+
+def close_pool():
+    """Close every pooled connection."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+def _is_alive(conn):
+    """Whether a pooled connection still works; server restarts and network
+    drops only show up when the connection is used."""
+    if conn.closed or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        return False
+    if time.monotonic() - _returned_at.get(id(conn), float("-inf")) < POSTGRES_PROBE_IDLE:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+def _checkout(pool):
+    # Every pooled connection may be dead after a restart, so keep replacing
+    # them; getconn raises once no new connection can be opened
+    for _ in range(POSTGRES_POOL_MAX + 1):
+        conn = pool.getconn()
+        if _is_alive(conn):
+            return conn
+        _returned_at.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("No live database connection could be checked out")
+
+@contextmanager
+def connection():
+    """Borrow a live pooled connection, waiting for one if all are in use.
+    
+    Commits on success and rolls back on error.
+    """
+    with _pool_slots:
+        pool = get_pool()
+        conn = _checkout(pool)
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if broken or conn.closed:
+                _returned_at.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+            else:
+                _returned_at[id(conn)] = time.monotonic()
+                pool.putconn(conn)
+
+def ping():
+    """Check database connectivity."""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            return cur.fetchone()[0] == 1
+
 def save_workflow(workflow_id, workflow_json):
-    with get_conn() as conn:
+    with connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO workflows (workflow_id, workflow_json)
                 VALUES (%s, %s)
-                ON CONFLICT (workflow_id) DO UPDATE SET workflow_json = EXCLUDED.workflow_json
+                ON CONFLICT (workflow_id) DO UPDATE SET workflow_json = EXCLUDED.workflow_json, updated_at = CURRENT_TIMESTAMP
             """, (workflow_id, workflow_json))
-            conn.commit()
 
 def get_workflow(workflow_id):
-    with get_conn() as conn:
+    with connection() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT workflow_json FROM workflows WHERE workflow_id = %s", (workflow_id,))
             row = cur.fetchone()
             return row[0] if row else None
-# Add similar helpers for runs, logs, etc.
+
+def save_run(run_id, workflow_id, status, context, history, error=None):
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO workflow_runs (run_id, workflow_id, status, context, history, error)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (run_id) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    context = EXCLUDED.context,
+                    history = EXCLUDED.history,
+                    error = EXCLUDED.error,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (run_id, workflow_id, status, Json(context), Json(history), error))
+
+def save_runs(runs):
+    """Upsert a batch of runs in one round trip.
+    
+    Each run is a dict with run_id, workflow_id, status, current_node_id,
+    context, history, error, created_at and updated_at; context and history may
+    be pre-encoded JSON strings.
+    """
+    rows = [(
+        run["run_id"],
+        run["workflow_id"],
+        run["status"],
+        run.get("current_node_id"),
+        run["context"] if isinstance(run["context"], str) else Json(run["context"]),
+        run["history"] if isinstance(run["history"], str) else Json(run["history"]),
+        run.get("error"),
+        run["created_at"],
+        run["updated_at"]
+    ) for run in runs]
+    with connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO workflow_runs (run_id, workflow_id, status, current_node_id, context, history, error, created_at, updated_at)
+                VALUES %s
+                ON CONFLICT (run_id) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    current_node_id = EXCLUDED.current_node_id,
+                    context = EXCLUDED.context,
+                    history = EXCLUDED.history,
+                    error = EXCLUDED.error,
+                    updated_at = EXCLUDED.updated_at
+            """, rows)
+
+def get_run(run_id):
+    with connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM workflow_runs WHERE run_id = %s", (run_id,))
+            row = cur.fetchone()
+            return dict(row) if row else None
+
+def list_runs(workflow_id=None, limit=100, status=None, created_after=None, created_before=None, before=None):
+    """List runs newest first, optionally filtered by workflow, status and creation time.
+    
+    `before` is the (created_at, run_id) of the last run of the previous page; pages
+    are read by keyset on the composite indexes, so deep pages cost as much as the first.
+    """
+    conditions = []
+    params = []
+    if workflow_id:
+        conditions.append("workflow_id = %s")
+        params.append(workflow_id)
+    if status:
+        conditions.append("status = %s")
+        params.append(status)
+    if created_after is not None:
+        conditions.append("created_at >= %s")
+        params.append(created_after)
+    if created_before is not None:
+        conditions.append("created_at < %s")
+        params.append(created_before)
+    if before is not None:
+        conditions.append("(created_at, run_id) < (%s, %s)")
+        params.extend(before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT run_id, workflow_id, status, current_node_id, error, created_at, updated_at FROM workflow_runs
+                {where} ORDER BY created_at DESC, run_id DESC LIMIT %s
+            """, (*params, limit))
+            return [dict(row) for row in cur.fetchall()]
+
+def count_runs_by_status(workflow_id=None):
+    """Run counts per status from the trigger-maintained workflow_run_counts table."""
+    with connection() as conn:
+        with conn.cursor() as cur:
+            if workflow_id:
+                cur.execute("""
+                    SELECT status, count FROM workflow_run_counts WHERE workflow_id = %s AND count > 0
+                """, (workflow_id,))
+            else:
+                cur.execute("""
+                    SELECT status, SUM(count) FROM workflow_run_counts GROUP BY status HAVING SUM(count) > 0
+                """)
+            return {status: int(count) for status, count in cur.fetchall()}
+
+def save_run_events(run_id, events):
+    """Append spilled history events of a run; already stored events are skipped.
+    
+    Each event is a dict with seq, timestamp_ns, status, node_id, action and error.
+    """
+    rows = [(
+        run_id,
+        event["seq"],
+        event["timestamp_ns"],
+        event["status"],
+        event.get("node_id"),
+        event.get("action"),
+        event.get("error")
+    ) for event in events]
+    with connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO workflow_run_events (run_id, seq, timestamp_ns, status, node_id, action, error)
+                VALUES %s
+                ON CONFLICT (run_id, seq) DO NOTHING
+            """, rows)
+
+def list_run_events(run_id, before_seq=None, limit=100):
+    """The latest `limit` stored history events of a run before `before_seq`, oldest first."""
+    with connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT seq, timestamp_ns, status, node_id, action, error FROM workflow_run_events
+                WHERE run_id = %s AND (%s IS NULL OR seq < %s)
+                ORDER BY seq DESC LIMIT %s
+            """, (run_id, before_seq, before_seq, limit))
+            return [dict(row) for row in reversed(cur.fetchall())]
+
+def log_audit_event(action, resource_type, resource_id=None, details=None, user_id=None, org_id=None):
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO audit_logs (user_id, org_id, action, resource_type, resource_id, details)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (user_id, org_id, action, resource_type, resource_id, Json(details) if details is not None else None))
+
+# Async variants run the pooled calls in worker threads so event loops never block
+# on the database; the pool size bounds how many of them hit Postgres at once.
+def _run_in_executor(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(_executor, functools.partial(fn, *args))
+
+async def save_workflow_async(workflow_id, workflow_json):
+    await _run_in_executor(save_workflow, workflow_id, workflow_json)
+
+async def get_workflow_async(workflow_id):
+    return await _run_in_executor(get_workflow, workflow_id)
+
+async def save_run_async(run_id, workflow_id, status, context, history, error=None):
+    await _run_in_executor(save_run, run_id, workflow_id, status, context, history, error)
+
+async def save_runs_async(runs):
+    await _run_in_executor(save_runs, runs)
+
+async def get_run_async(run_id):
+    return await _run_in_executor(get_run, run_id)
+
+async def list_runs_async(workflow_id=None, limit=100, status=None, created_after=None, created_before=None, before=None):
+    return await _run_in_executor(list_runs, workflow_id, limit, status, created_after, created_before, before)
+
+async def count_runs_by_status_async(workflow_id=None):
+    return await _run_in_executor(count_runs_by_status, workflow_id)
+
+async def save_run_events_async(run_id, events):
+    await _run_in_executor(save_run_events, run_id, events)
+
+async def list_run_events_async(run_id, before_seq=None, limit=100):
+    return await _run_in_executor(list_run_events, run_id, before_seq, limit)
+
+async def log_audit_event_async(action, resource_type, resource_id=None, details=None, user_id=None, org_id=None):
+    await _run_in_executor(log_audit_event, action, resource_type, resource_id, details, user_id, org_id)
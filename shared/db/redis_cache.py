@@ -1,8 +1,14 @@
 import redis
+import redis.asyncio
+import json
 import os
 
+from shared.models.context import apply_context_delta
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 3600)))
 redis_client = redis.Redis.from_url(REDIS_URL)
+async_redis_client = redis.asyncio.Redis.from_url(REDIS_URL)
 
 def get_agent_state(run_id, agent_id):
     key = f"run:{run_id}:agent:{agent_id}"
@@ -12,3 +18,60 @@ def get_agent_state(run_id, agent_id):
 def set_agent_state(run_id, agent_id, state):
     key = f"run:{run_id}:agent:{agent_id}"
     redis_client.set(key, state)
+
+def _checkpoint_key(run_id):
+    return f"run:{run_id}:checkpoint"
+
+def _checkpoint_log_key(run_id):
+    return f"run:{run_id}:checkpoint:log"
+
+def _apply_checkpoint_log(checkpoint, entries):
+    """Bring a snapshot up to date with the step entries appended since."""
+    checkpoint = json.loads(checkpoint)
+    for entry in entries:
+        entry = json.loads(entry)
+        apply_context_delta(checkpoint["context"], entry.pop("context"))
+        checkpoint.update(entry)
+    return checkpoint
+
+def save_checkpoint(run_id, checkpoint):
+    pipe = redis_client.pipeline()
+    pipe.set(_checkpoint_key(run_id), json.dumps(checkpoint, default=str), ex=CHECKPOINT_TTL)
+    pipe.delete(_checkpoint_log_key(run_id))
+    pipe.execute()
+
+def get_checkpoint(run_id):
+    pipe = redis_client.pipeline()
+    pipe.get(_checkpoint_key(run_id))
+    pipe.lrange(_checkpoint_log_key(run_id), 0, -1)
+    checkpoint, entries = pipe.execute()
+    return _apply_checkpoint_log(checkpoint, entries) if checkpoint else None
+
+def delete_checkpoint(run_id):
+    redis_client.delete(_checkpoint_key(run_id), _checkpoint_log_key(run_id))
+
+async def save_checkpoint_async(run_id, checkpoint):
+    """Replace a run's checkpoint with a full snapshot."""
+    pipe = async_redis_client.pipeline()
+    pipe.set(_checkpoint_key(run_id), json.dumps(checkpoint, default=str), ex=CHECKPOINT_TTL)
+    pipe.delete(_checkpoint_log_key(run_id))
+    await pipe.execute()
+
+async def append_checkpoint_async(run_id, entry):
+    """Append a step to a run's checkpoint; `entry["context"]` is a context delta."""
+    key = _checkpoint_log_key(run_id)
+    pipe = async_redis_client.pipeline()
+    pipe.rpush(key, json.dumps(entry, default=str))
+    pipe.expire(key, CHECKPOINT_TTL)
+    pipe.expire(_checkpoint_key(run_id), CHECKPOINT_TTL)
+    await pipe.execute()
+
+async def get_checkpoint_async(run_id):
+    pipe = async_redis_client.pipeline()
+    pipe.get(_checkpoint_key(run_id))
+    pipe.lrange(_checkpoint_log_key(run_id), 0, -1)
+    checkpoint, entries = await pipe.execute()
+    return _apply_checkpoint_log(checkpoint, entries) if checkpoint else None
+
+async def delete_checkpoint_async(run_id):
+    await async_redis_client.delete(_checkpoint_key(run_id), _checkpoint_log_key(run_id))
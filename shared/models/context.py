@@ -0,0 +1,192 @@
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+# Layers deeper than this are flattened so lookups stay cheap
+MAX_CONTEXT_DEPTH = 32
+
+_DELETED = object()
+_MISSING = object()
+
+class FlowContext(MutableMapping):
+    """Copy-on-write mapping used as the flow context.
+
+    A context is a stack of small change layers over shared, frozen parents, so
+    `copy()` is O(1) and writes only touch the copy that made them. Values are
+    never copied: unchanged keys, including large payloads such as retrieved
+    documents, are shared between every step of a run. `diff()` returns what
+    changed between two versions without comparing the whole context.
+    """
+    __slots__ = ("_parent", "_changes", "_depth")
+
+    def __init__(self, data: Optional[Mapping] = None):
+        self._parent: Optional[FlowContext] = None
+        self._changes: Dict[str, Any] = dict(data) if data else {}
+        self._depth = 0
+
+    @classmethod
+    def _layer(cls, parent: Optional['FlowContext'], changes: Dict[str, Any], depth: int) -> 'FlowContext':
+        layer = cls.__new__(cls)
+        layer._parent = parent
+        layer._changes = changes
+        layer._depth = depth
+        return layer
+
+    def _lookup(self, key: str) -> Any:
+        node = self
+        while node is not None:
+            value = node._changes.get(key, _MISSING)
+            if value is not _MISSING:
+                return _MISSING if value is _DELETED else value
+            node = node._parent
+        return _MISSING
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._changes[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if self._lookup(key) is _MISSING:
+            raise KeyError(key)
+        if self._parent is None:
+            del self._changes[key]
+        else:
+            # Tombstone hides the value still held by the shared parents
+            self._changes[key] = _DELETED
+
+    def __contains__(self, key: object) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def _flat(self) -> Dict[str, Any]:
+        layers = []
+        node = self
+        while node is not None:
+            layers.append(node._changes)
+            node = node._parent
+        flat: Dict[str, Any] = {}
+        for changes in reversed(layers):
+            for key, value in changes.items():
+                if value is _DELETED:
+                    flat.pop(key, None)
+                else:
+                    flat[key] = value
+        return flat
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._flat())
+
+    def __len__(self) -> int:
+        return len(self._flat())
+
+    def __repr__(self) -> str:
+        return f"FlowContext({self._flat()!r})"
+
+    def copy(self) -> 'FlowContext':
+        """Return an independent version of this context in O(1)."""
+        if self._depth >= MAX_CONTEXT_DEPTH:
+            # Flatten references only; values stay shared
+            self._changes = self._flat()
+            self._parent = None
+            self._depth = 0
+
+        if self._changes:
+            # Freeze the current changes into a shared parent of both versions
+            frozen = FlowContext._layer(self._parent, self._changes, self._depth)
+            self._parent = frozen
+            self._changes = {}
+            self._depth = frozen._depth + 1
+        return FlowContext._layer(self._parent, {}, self._depth)
+
+    def diff(self, since: 'FlowContext') -> Tuple[Dict[str, Any], Set[str]]:
+        """Return the keys set and the keys removed relative to an earlier version.
+
+        Only the layers written since the two versions shared a parent are
+        visited, so the cost is proportional to the changes, not the context.
+        """
+        since_chain = {}
+        node = since
+        while node is not None:
+            since_chain[id(node)] = node
+            node = node._parent
+
+        candidates = set()
+        node = self
+        while node is not None and id(node) not in since_chain:
+            candidates.update(node._changes)
+            node = node._parent
+
+        if node is None:
+            # No shared history (e.g. after flattening): compare everything
+            candidates = set(self._flat()) | set(since._flat())
+        else:
+            other = since
+            while other is not node:
+                candidates.update(other._changes)
+                other = other._parent
+
+        changed = {}
+        removed = set()
+        for key in candidates:
+            value = self._lookup(key)
+            if value is _MISSING:
+                if since._lookup(key) is not _MISSING:
+                    removed.add(key)
+            elif since._lookup(key) is not value:
+                changed[key] = value
+        return changed, removed
+
+    def to_dict(self, _memo: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Convert to plain dicts (recursively) for serialization.
+
+        Contexts nested more than once, such as versions shared between steps,
+        are converted once and the result reused.
+        """
+        memo = {} if _memo is None else _memo
+        converted = memo.get(id(self))
+        if converted is None:
+            converted = memo[id(self)] = {
+                key: value.to_dict(memo) if isinstance(value, FlowContext) else value
+                for key, value in self._flat().items()
+            }
+        return converted
+
+def context_delta(context: FlowContext, since: FlowContext) -> Dict[str, Any]:
+    """Serializable changes from `since` to `context`, for apply_context_delta.
+
+    Nested contexts that both versions hold, such as `node_outputs`, are
+    diffed recursively, so a step's delta holds only what the step wrote.
+    """
+    changed, removed = context.diff(since)
+    values: Dict[str, Any] = {}
+    nested: Dict[str, Any] = {}
+    for key, value in changed.items():
+        previous = since.get(key)
+        if isinstance(value, FlowContext) and isinstance(previous, FlowContext):
+            value_delta = context_delta(value, previous)
+            if value_delta:
+                nested[key] = value_delta
+        else:
+            values[key] = value.to_dict() if isinstance(value, FlowContext) else value
+    delta: Dict[str, Any] = {}
+    if values:
+        delta["set"] = values
+    if nested:
+        delta["nested"] = nested
+    if removed:
+        delta["removed"] = sorted(removed)
+    return delta
+
+def apply_context_delta(data: MutableMapping, delta: Dict[str, Any]) -> None:
+    """Apply a delta from context_delta to a context or plain dict in place."""
+    for key, value_delta in delta.get("nested", {}).items():
+        value = data.get(key)
+        value = value.copy() if isinstance(value, FlowContext) else dict(value or {})
+        apply_context_delta(value, value_delta)
+        data[key] = value
+    data.update(delta.get("set", {}))
+    for key in delta.get("removed", ()):
+        data.pop(key, None)
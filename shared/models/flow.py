@@ -1,14 +1,33 @@
-from typing import Any, Dict, List, Optional, Callable, Union, TypeVar, Generic
+from typing import Any, Awaitable, Dict, List, Optional, Callable, Union, TypeVar, Generic
 from pydantic import BaseModel, Field
 import asyncio
+import sys
 import uuid
 from datetime import datetime
 from enum import Enum
 
+from shared.models.context import FlowContext, apply_context_delta, context_delta
+from shared.models.history import RunHistory, RUN_HISTORY_SIZE
+from shared.models.flow_graph import FlowGraph
+from shared.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
 # Type variables for generic typing
 T = TypeVar('T')
 R = TypeVar('R')
 
+# Default number of fan-out branches executed at the same time
+DEFAULT_MAX_CONCURRENCY = 10
+
+# Called after every step with the run state (cursor) and the context to resume with
+CheckpointFn = Callable[['RunState', Dict[str, Any]], Awaitable[None]]
+
+# Called synchronously with the run state, event type and event details as a
+# run progresses (run_started, node_started, node_completed, node_failed,
+# run_paused, run_resumed, run_completed, run_failed)
+RunEventFn = Callable[['RunState', str, Dict[str, Any]], None]
+
 class FlowStatus(str, Enum):
     """Status of a flow execution"""
     PENDING = "pending"
@@ -21,12 +40,15 @@ class BaseNode(Generic[T, R]):
     """Base class for all nodes in a flow.
     
     Implements the prep -> exec -> post lifecycle similar to OrchestraAgent
-    but with a more flexible interface for flow control.
+    but with a more flexible interface for flow control. Nodes are slotted to
+    stay small; inside a Flow their edges live in the flow's FlowGraph, so
+    `successors` is only allocated for edges added to the node itself.
     """
+    __slots__ = ("node_id", "successors")
+    
     def __init__(self, node_id: Optional[str] = None):
-        self.node_id = node_id or str(uuid.uuid4())
-        self.successors = {}
-        self.store = {}
+        self.node_id = sys.intern(node_id) if node_id else str(uuid.uuid4())
+        self.successors: Optional[Dict[str, List['BaseNode']]] = None
     
     def prep(self, context: Dict[str, Any]) -> T:
         """Prepare inputs for execution from the flow context."""
@@ -41,16 +63,31 @@ class BaseNode(Generic[T, R]):
         return "default", context
     
     def add_edge(self, action: str, node: 'BaseNode'):
-        """Add an edge from this node to another node based on an action."""
-        self.successors[action] = node
+        """Add an edge from this node to another node based on an action.
+        
+        Adding several edges for the same action fans out: all targets run
+        concurrently when the action is taken.
+        """
+        if self.successors is None:
+            self.successors = {}
+        targets = self.successors.setdefault(action, [])
+        if node not in targets:
+            targets.append(node)
         return self
     
     def get_next(self, action: str) -> Optional['BaseNode']:
-        """Get the next node based on an action."""
-        return self.successors.get(action)
+        """Get the first next node based on an action."""
+        targets = self.get_successors(action)
+        return targets[0] if targets else None
+    
+    def get_successors(self, action: str) -> List['BaseNode']:
+        """Get every next node for an action (more than one means fan-out)."""
+        return self.successors.get(action, []) if self.successors else []
 
 class Node(BaseNode[Dict[str, Any], Dict[str, Any]]):
     """Standard node implementation that works with dictionary inputs and outputs."""
+    __slots__ = ("_prep_fn", "_exec_fn", "_post_fn")
+    
     def __init__(self, 
                  node_id: Optional[str] = None,
                  prep_fn: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
@@ -78,10 +115,14 @@ class Node(BaseNode[Dict[str, Any], Dict[str, Any]]):
     def post(self, result: Dict[str, Any], context: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
         if self._post_fn:
             return self._post_fn(result, context)
-        return "default", {**context, **result}
+        updated_context = context.copy()
+        updated_context.update(result)
+        return "default", updated_context
 
 class AgentNode(Node):
     """Node that wraps an OrchestraAgent for use in a flow."""
+    __slots__ = ("agent",)
+    
     def __init__(self, agent, node_id: Optional[str] = None):
         super().__init__(node_id)
         self.agent = agent
@@ -95,141 +136,497 @@ class AgentNode(Node):
     def post(self, result: Dict[str, Any], context: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
         return self.agent.post(result, context)
 
+def _as_context(value: Optional[Dict[str, Any]]) -> FlowContext:
+    """Wrap a mapping in a FlowContext so later copies share it."""
+    return value if isinstance(value, FlowContext) else FlowContext(value)
+
+def merge_contexts(base_context: FlowContext, branch_contexts: List[FlowContext]) -> FlowContext:
+    """Default fan-in merge.
+    
+    Only what each branch changed relative to the fan-out context is applied,
+    in branch order, so later branches win on conflicts, while `node_outputs`
+    is merged key by key so every branch's outputs are kept.
+    """
+    base_context = _as_context(base_context)
+    base_outputs = _as_context(base_context.get("node_outputs"))
+    merged = base_context.copy()
+    node_outputs = base_outputs.copy()
+    for branch_context in branch_contexts:
+        changed, removed = _as_context(branch_context).diff(base_context)
+        for key, value in changed.items():
+            if key == "node_outputs":
+                outputs_changed, _ = _as_context(value).diff(base_outputs)
+                node_outputs.update(outputs_changed)
+            else:
+                merged[key] = value
+        for key in removed:
+            merged.pop(key, None)
+    merged["node_outputs"] = node_outputs
+    return merged
+
+class JoinNode(Node):
+    """Fan-in node that merges the contexts of concurrently executed branches.
+    
+    Branches started by a fan-out stop when they reach a JoinNode; the flow then
+    merges their contexts with `merge` and continues from the join. Outside of a
+    fan-out a JoinNode is a simple passthrough.
+    """
+    __slots__ = ("_merge_fn",)
+    
+    def __init__(self,
+                 node_id: Optional[str] = None,
+                 merge_fn: Optional[Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]]] = None):
+        super().__init__(node_id)
+        self._merge_fn = merge_fn
+    
+    def merge(self, base_context: Dict[str, Any], branch_contexts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge branch contexts into a single context."""
+        if self._merge_fn:
+            return self._merge_fn(base_context, branch_contexts)
+        return merge_contexts(base_context, branch_contexts)
+
+# Progress of one fan-out branch stopped by a pause: "done" branches reached
+# their join (or the end of the flow) with "context"; the others continue at
+# "node_id" with "context", after "action" and nested "branches" when they
+# stopped inside a nested fan-out of that node
+BranchProgress = Dict[str, Any]
+
+def dump_branches(branches: List[BranchProgress], base: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Serialize fan-out progress, storing branch contexts as deltas from the fan-out's context."""
+    base = _as_context(base)
+    dumped = []
+    for branch in branches:
+        context = _as_context(branch["context"])
+        entry = {key: value for key, value in branch.items() if key not in ("context", "branches")}
+        entry["context"] = context_delta(context, base)
+        if branch.get("branches"):
+            entry["branches"] = dump_branches(branch["branches"], context)
+        dumped.append(entry)
+    return dumped
+
+def load_branches(data: List[Dict[str, Any]], base: Dict[str, Any]) -> List[BranchProgress]:
+    """Rebuild fan-out progress saved by dump_branches on top of the fan-out's context."""
+    base = _as_context(base)
+    branches = []
+    for entry in data:
+        context = base.copy()
+        apply_context_delta(context, entry["context"])
+        branch = {**entry, "context": context}
+        if entry.get("branches"):
+            branch["branches"] = load_branches(entry["branches"], context)
+        branches.append(branch)
+    return branches
+
+class RunState:
+    """Mutable state of a single flow run.
+    
+    Flows only hold the node graph, so any number of runs can execute against
+    one Flow concurrently, each with its own RunState.
+    """
+    def __init__(self,
+                 run_id: Optional[str] = None,
+                 on_event: Optional[RunEventFn] = None,
+                 history_size: int = RUN_HISTORY_SIZE,
+                 spill_history: bool = False):
+        self.run_id = run_id or str(uuid.uuid4())
+        self.on_event = on_event
+        self.current_node: Optional[BaseNode] = None
+        self.status = FlowStatus.PENDING
+        # Action taken by current_node before a pause inside its fan-out, and
+        # how far each branch of that fan-out got
+        self.resume_action: Optional[str] = None
+        self.branches: Optional[List[BranchProgress]] = None
+        # Recent events only; with spill_history the owner writes older ones to storage
+        self.history = RunHistory(history_size, spill=spill_history)
+        self.created_at = datetime.now().isoformat()
+        self.updated_at = self.created_at
+        self.error: Optional[str] = None
+    
+    def pause(self) -> None:
+        """Pause the run after the nodes currently executing."""
+        if self.status == FlowStatus.RUNNING:
+            self.status = FlowStatus.PAUSED
+            self.updated_at = datetime.now().isoformat()
+            self.record("run_paused", "paused")
+    
+    def resume(self) -> None:
+        """Mark a paused run as running again."""
+        if self.status == FlowStatus.PAUSED:
+            self.status = FlowStatus.RUNNING
+            self.updated_at = datetime.now().isoformat()
+            self.record("run_resumed", "resumed")
+    
+    def record(self,
+               event_type: str,
+               status: str,
+               node_id: Optional[str] = None,
+               action: Optional[str] = None,
+               error: Optional[str] = None) -> None:
+        """Append an entry to the run history and emit it as an event."""
+        event = self.history.append(status, node_id=node_id, action=action, error=error)
+        if self.on_event is not None:
+            self.emit(event_type, event.to_dict())
+    
+    def emit(self, event_type: str, details: Dict[str, Any]) -> None:
+        """Notify the run's event listener; listener errors never fail the run."""
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(self, event_type, details)
+        except Exception as e:
+            logger.warning(f"Run event listener failed for run {self.run_id}: {str(e)}")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert run state to dictionary for serialization."""
+        return {
+            "run_id": self.run_id,
+            "status": self.status.value,
+            "current_node_id": self.current_node.node_id if self.current_node else None,
+            "history": self.history.to_list(),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "error": self.error
+        }
+
 class Flow(BaseNode[Dict[str, Any], Dict[str, Any]]):
     """A flow is a directed graph of nodes that can be executed.
     
     Flows can be nested within other flows, allowing for complex workflows.
+    When an action maps to several successors the branches run concurrently,
+    at most `max_concurrency` at a time, until they meet at a JoinNode.
+    
+    Nodes are stored in a list and addressed by integer index, and edges in a
+    FlowGraph adjacency table. Edges added with connect() are buffered and
+    compiled into the table the next time the flow looks up a successor.
+    Edges added to the nodes themselves with add_edge() are followed as soon
+    as they exist, and folded into the table whenever it is next compiled.
     """
-    def __init__(self, start_node: Node, node_id: Optional[str] = None):
+    __slots__ = ("start_node", "max_concurrency", "_nodes", "_index", "_graph",
+                 "_pending_edges", "_dirty", "created_at", "updated_at")
+    
+    def __init__(self, start_node: Node, node_id: Optional[str] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
         super().__init__(node_id)
         self.start_node = start_node
-        self.nodes = {start_node.node_id: start_node}
-        self.current_node = None
-        self.status = FlowStatus.PENDING
-        self.history = []
+        self.max_concurrency = max_concurrency
+        self._nodes: List[BaseNode] = [start_node]
+        self._index: Dict[str, int] = {start_node.node_id: 0}
+        self._graph = FlowGraph()
+        self._pending_edges: List[tuple[int, str, int]] = []
+        self._dirty = True
         self.created_at = datetime.now().isoformat()
         self.updated_at = self.created_at
-        self.error = None
+    
+    @property
+    def nodes(self) -> Dict[str, BaseNode]:
+        """Nodes by id (a new dict; use get_node for single lookups)."""
+        return {node.node_id: node for node in self._nodes}
+    
+    def get_node(self, node_id: str) -> Optional[BaseNode]:
+        index = self._index.get(node_id)
+        return self._nodes[index] if index is not None else None
     
     def add_node(self, node: Node) -> Node:
-        """Add a node to the flow."""
-        self.nodes[node.node_id] = node
+        """Add a node to the flow, replacing any node with the same id."""
+        index = self._index.get(node.node_id)
+        if index is None:
+            self._index[node.node_id] = len(self._nodes)
+            self._nodes.append(node)
+        else:
+            self._nodes[index] = node
+        self._dirty = True
         return node
     
     def connect(self, from_node_id: str, action: str, to_node_id: str) -> 'Flow':
         """Connect two nodes with an edge."""
-        from_node = self.nodes.get(from_node_id)
-        to_node = self.nodes.get(to_node_id)
+        from_index = self._index.get(from_node_id)
+        to_index = self._index.get(to_node_id)
         
-        if not from_node or not to_node:
-            raise ValueError(f"Node not found: {from_node_id if not from_node else to_node_id}")
+        if from_index is None or to_index is None:
+            raise ValueError(f"Node not found: {from_node_id if from_index is None else to_node_id}")
         
-        from_node.add_edge(action, to_node)
+        self._pending_edges.append((from_index, action, to_index))
+        self._dirty = True
         return self
     
-    async def exec(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the flow from start to finish."""
-        context = inputs.copy()
-        self.current_node = self.start_node
-        self.status = FlowStatus.RUNNING
-        self.updated_at = datetime.now().isoformat()
+    def _compile(self) -> FlowGraph:
+        """Fold buffered and node-level edges into the adjacency table."""
+        edges = self._pending_edges
+        for index, node in enumerate(self._nodes):
+            for action, targets in (node.successors or {}).items():
+                for target in targets:
+                    target_index = self._index.get(target.node_id)
+                    if target_index is not None and self._nodes[target_index] is target:
+                        edges.append((index, action, target_index))
+        self._graph = self._graph.extend(len(self._nodes), edges)
+        self._pending_edges = []
+        self._dirty = False
+        return self._graph
+    
+    @property
+    def graph(self) -> FlowGraph:
+        """The compiled adjacency table of the flow."""
+        return self._compile() if self._dirty else self._graph
+    
+    def next_nodes(self, node: BaseNode, action: str) -> List[BaseNode]:
+        """Every next node of a node in this flow for an action (more than one means fan-out)."""
+        index = self._index.get(node.node_id)
+        if index is None or self._nodes[index] is not node:
+            return node.get_successors(action)
+        targets = self.graph.successors(index, action)
+        # Node-level edges may have been added after the table was compiled
+        for target in node.get_successors(action):
+            target_index = self._index.get(target.node_id)
+            if target_index is not None and self._nodes[target_index] is target and target_index not in targets:
+                targets.append(target_index)
+        return [self._nodes[target] for target in targets]
+    
+    def edges(self) -> List[tuple[str, str, str]]:
+        """All edges as (from_node_id, action, to_node_id), including node-level ones."""
+        return [
+            (self._nodes[source].node_id, action, self._nodes[target].node_id)
+            for source, action, target in self._compile().edges()
+        ]
+    
+    async def exec(self,
+                   inputs: Dict[str, Any],
+                   state: Optional[RunState] = None,
+                   resume_from: Optional[str] = None,
+                   checkpoint: Optional[CheckpointFn] = None,
+                   resume_action: Optional[str] = None,
+                   resume_branches: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Execute the flow from start to finish.
+        
+        Progress is recorded on `state`; pass one in to observe or pause the run.
+        `resume_from` starts at a node saved by an earlier checkpoint instead of
+        the start node, and `checkpoint` is awaited after every step with the
+        node to continue from and the context at that point. Fan-outs are
+        checkpointed as a whole once their branches have been merged; a run
+        paused inside a fan-out is checkpointed at the fan-out's source with
+        `state.resume_action` and `state.branches` set. Resuming with that
+        `resume_action` and `resume_branches` (from dump_branches) continues
+        each unfinished branch where it stopped and merges the finished ones
+        as they were, without re-running the source node.
+        """
+        state = state if state is not None else RunState()
+        # Copy-on-write context: each step shares everything it did not change
+        context = _as_context(inputs).copy()
+        if resume_from is not None:
+            if resume_from not in self._index:
+                raise ValueError(f"Node not found: {resume_from}")
+            state.current_node = self._nodes[self._index[resume_from]]
+            state.resume_action = resume_action
+            state.branches = load_branches(resume_branches, context) if resume_branches else None
+        else:
+            state.current_node = self.start_node
+        state.status = FlowStatus.RUNNING
+        state.updated_at = datetime.now().isoformat()
+        state.emit("run_started", {
+            "node_id": state.current_node.node_id,
+            "timestamp": state.updated_at
+        })
         
         try:
-            while self.current_node and self.status == FlowStatus.RUNNING:
-                node = self.current_node
+            while state.current_node and state.status == FlowStatus.RUNNING:
+                node = state.current_node
+                branches = None
+                if state.resume_action is not None:
+                    # The node already ran before a pause inside its fan-out
+                    action, state.resume_action = state.resume_action, None
+                    branches, state.branches = state.branches, None
+                else:
+                    action, context = await self._exec_node(node, context, state)
                 
-                # Record execution start
-                step_start = datetime.now().isoformat()
-                self.history.append({
-                    "node_id": node.node_id,
-                    "status": "started",
-                    "timestamp": step_start
-                })
+                # Find next node, running all branches of a fan-out concurrently
+                successors = self.next_nodes(node, action)
+                if len(successors) > 1:
+                    merged, join, progress = await self._fan_out(successors, context, state, branches)
+                    if progress is not None:
+                        # Paused with branches between nodes: stay at the source
+                        # with this context and remember how far each branch got
+                        state.resume_action = action
+                        state.branches = progress
+                    else:
+                        context, state.current_node = merged, join
+                else:
+                    state.current_node = successors[0] if successors else None
                 
-                try:
-                    # Execute node lifecycle
-                    node_inputs = node.prep(context)
-                    node_result = await node.exec(node_inputs)
-                    action, updated_context = node.post(node_result, context)
-                    
-                    # Update context
-                    context = updated_context
-                    context["node_outputs"] = context.get("node_outputs", {})
-                    context["node_outputs"][node.node_id] = node_result
-                    
-                    # Record execution completion
-                    self.history.append({
-                        "node_id": node.node_id,
-                        "status": "completed",
-                        "action": action,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    
-                    # Find next node
-                    self.current_node = node.get_next(action)
-                    
-                    # If no next node, we're done
-                    if not self.current_node:
-                        self.status = FlowStatus.COMPLETED
-                        
-                except Exception as e:
-                    # Record execution failure
-                    self.history.append({
-                        "node_id": node.node_id,
-                        "status": "failed",
-                        "error": str(e),
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    self.status = FlowStatus.FAILED
-                    self.error = str(e)
-                    raise
+                if checkpoint is not None:
+                    await checkpoint(state, context)
+                
+                # If no next node, we're done, even if a pause came during the last one
+                if not state.current_node and state.status in (FlowStatus.RUNNING, FlowStatus.PAUSED):
+                    state.status = FlowStatus.COMPLETED
             
-            self.updated_at = datetime.now().isoformat()
-            return context
+            state.updated_at = datetime.now().isoformat()
+            if state.status == FlowStatus.COMPLETED:
+                state.emit("run_completed", {"timestamp": state.updated_at})
+            return context.to_dict()
             
         except Exception as e:
-            self.updated_at = datetime.now().isoformat()
-            self.status = FlowStatus.FAILED
-            self.error = str(e)
+            state.updated_at = datetime.now().isoformat()
+            state.status = FlowStatus.FAILED
+            state.error = str(e)
+            state.emit("run_failed", {"error": state.error, "timestamp": state.updated_at})
             raise
     
-    def pause(self) -> None:
-        """Pause the flow execution."""
-        if self.status == FlowStatus.RUNNING:
-            self.status = FlowStatus.PAUSED
-            self.updated_at = datetime.now().isoformat()
-            self.history.append({
-                "status": "paused",
-                "timestamp": self.updated_at
-            })
+    async def _exec_node(self, node: BaseNode, context: Dict[str, Any], state: RunState) -> tuple[str, Dict[str, Any]]:
+        """Run a single node's lifecycle and record it in the run history."""
+        # Record execution start
+        state.record("node_started", "started", node_id=node.node_id)
+        
+        try:
+            # Execute node lifecycle
+            node_inputs = node.prep(context)
+            node_result = await node.exec(node_inputs)
+            action, updated_context = node.post(node_result, context)
+            
+            # Update context; copying is O(1) and keeps earlier versions intact
+            context = _as_context(updated_context).copy()
+            node_outputs = _as_context(context.get("node_outputs")).copy()
+            if isinstance(node_result, FlowContext):
+                # Passthrough nodes return the context itself; without its outputs,
+                # or every output would nest all earlier contexts
+                node_result = node_result.copy()
+                node_result.pop("node_outputs", None)
+            node_outputs[node.node_id] = node_result
+            context["node_outputs"] = node_outputs
+            
+            # Record execution completion
+            state.record("node_completed", "completed", node_id=node.node_id, action=action)
+            return action, context
+            
+        except Exception as e:
+            # Record execution failure
+            state.record("node_failed", "failed", node_id=node.node_id, error=str(e))
+            state.status = FlowStatus.FAILED
+            state.error = str(e)
+            raise
     
-    def resume(self) -> None:
-        """Resume a paused flow."""
-        if self.status == FlowStatus.PAUSED:
-            self.status = FlowStatus.RUNNING
-            self.updated_at = datetime.now().isoformat()
-            self.history.append({
-                "status": "resumed",
-                "timestamp": self.updated_at
-            })
+    async def _fan_out(self,
+                       successors: List[BaseNode],
+                       context: Dict[str, Any],
+                       state: RunState,
+                       progress: Optional[List[BranchProgress]] = None) -> tuple[Dict[str, Any], Optional[BaseNode], Optional[List[BranchProgress]]]:
+        """Run each successor branch concurrently and merge the results.
+        
+        `progress` continues a fan-out stopped by a pause: finished branches
+        are not run again. Returns the merged context, the JoinNode to continue
+        from (None if the branches ran to the end of the flow without meeting)
+        and, if a pause stopped any branch before it got there, the progress
+        of every branch.
+        """
+        if progress is not None and len(progress) != len(successors):
+            logger.warning("Fan-out branches changed since the pause, running all of them again")
+            progress = None
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        async def run_limited(position: int, start: BaseNode):
+            branch = progress[position] if progress is not None else None
+            if branch is not None and branch["done"]:
+                return branch["context"], self._resume_node(branch.get("join")), None
+            async with semaphore:
+                if branch is not None:
+                    return await self._run_branch(self._resume_node(branch["node_id"]), branch["context"], state,
+                                                  branch.get("action"), branch.get("branches"))
+                # Each branch gets its own version so branches cannot see each other's writes
+                return await self._run_branch(start, context.copy(), state)
+        
+        tasks = [asyncio.ensure_future(run_limited(position, start)) for position, start in enumerate(successors)]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        if any(branch is not None for _, _, branch in results):
+            return context, None, [
+                branch if branch is not None else {
+                    "done": True,
+                    "join": join.node_id if join is not None else None,
+                    "context": branch_context
+                }
+                for branch_context, join, branch in results
+            ]
+        
+        branch_contexts = [branch_context for branch_context, _, _ in results]
+        joins = []
+        for _, join, _ in results:
+            if join is not None and join not in joins:
+                joins.append(join)
+        
+        if not joins:
+            return merge_contexts(context, branch_contexts), None, None
+        if len(joins) > 1:
+            logger.warning(f"Fan-out branches reached different join nodes, continuing from {joins[0].node_id}")
+        return joins[0].merge(context, branch_contexts), joins[0], None
+    
+    async def _run_branch(self,
+                          node: BaseNode,
+                          context: Dict[str, Any],
+                          state: RunState,
+                          action: Optional[str] = None,
+                          branches: Optional[List[BranchProgress]] = None) -> tuple[Dict[str, Any], Optional[BaseNode], Optional[BranchProgress]]:
+        """Walk a fan-out branch until it reaches a JoinNode or the end of the flow.
+        
+        With `action` set the branch continues after `node` instead of running
+        it, inside the nested fan-out described by `branches`. The last value
+        is the branch's progress if a pause stopped it before the end.
+        """
+        if isinstance(node, JoinNode) and action is None:
+            # The fan-out leads straight to the join
+            return context, node, None
+        while node and state.status == FlowStatus.RUNNING:
+            if action is not None:
+                taken, action = action, None
+            else:
+                taken, context = await self._exec_node(node, context, state)
+            successors = self.next_nodes(node, taken)
+            if len(successors) > 1:
+                # Nested fan-out: its join belongs to this branch, so execute it here
+                merged, join, nested = await self._fan_out(successors, context, state, branches)
+                branches = None
+                if nested is not None:
+                    return context, None, {"done": False, "node_id": node.node_id, "action": taken,
+                                           "branches": nested, "context": context}
+                context, node = merged, join
+                continue
+            node = successors[0] if successors else None
+            if isinstance(node, JoinNode):
+                return context, node, None
+        if node is None:
+            return context, None, None
+        return context, None, {"done": False, "node_id": node.node_id, "context": context}
+    
+    def _resume_node(self, node_id: Optional[str]) -> Optional[BaseNode]:
+        if node_id is None:
+            return None
+        node = self.get_node(node_id)
+        if node is None:
+            raise ValueError(f"Node not found: {node_id}")
+        return node
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert flow to dictionary for serialization."""
         return {
             "node_id": self.node_id,
-            "status": self.status.value,
-            "current_node_id": self.current_node.node_id if self.current_node else None,
-            "history": self.history,
+            "start_node_id": self.start_node.node_id,
+            "node_ids": list(self._index),
             "created_at": self.created_at,
-            "updated_at": self.updated_at,
-            "error": self.error
+            "updated_at": self.updated_at
         }
 
 class FlowBuilder:
-    """Helper class to build flows with a fluent API."""
-    def __init__(self, name: str = None):
+    """Helper class to build flows with a fluent API.
+    
+    Edges are collected by node id and compiled into the flow's adjacency
+    table once, when the flow is built.
+    """
+    def __init__(self, name: str = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
         self.name = name or f"flow_{uuid.uuid4()}"
+        self.max_concurrency = max_concurrency
         self.nodes = {}
+        self.edges: List[tuple[str, str, str]] = []
         self.start_node = None
         self.current_node = None
     
@@ -255,6 +652,10 @@ class FlowBuilder:
         node = AgentNode(agent, node_id=node_id)
         return self.add_node(node_id, node)
     
+    def add_join_node(self, node_id: str, merge_fn: Optional[Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]]] = None) -> 'FlowBuilder':
+        """Add a join node where concurrent branches are merged."""
+        return self.add_node(node_id, JoinNode(node_id=node_id, merge_fn=merge_fn))
+    
     def connect(self, from_node_id: str, action: str, to_node_id: str) -> 'FlowBuilder':
         """Connect two nodes with an edge."""
         from_node = self.nodes.get(from_node_id)
@@ -263,7 +664,7 @@ class FlowBuilder:
         if not from_node or not to_node:
             raise ValueError(f"Node not found: {from_node_id if not from_node else to_node_id}")
         
-        from_node.add_edge(action, to_node)
+        self.edges.append((from_node_id, action, to_node_id))
         return self
     
     def build(self) -> Flow:
@@ -271,11 +672,16 @@ class FlowBuilder:
         if not self.start_node:
             raise ValueError("Cannot build flow with no nodes")
             
-        flow = Flow(self.start_node, node_id=self.name)
+        flow = Flow(self.start_node, node_id=self.name, max_concurrency=self.max_concurrency)
         
         # Add all nodes to the flow
         for node_id, node in self.nodes.items():
             if node != self.start_node:  # Start node is already added in Flow constructor
                 flow.add_node(node)
-                
+        
+        for from_node_id, action, to_node_id in self.edges:
+            flow.connect(from_node_id, action, to_node_id)
+        # Compile the adjacency table now rather than on the first run
+        flow._compile()
+        
         return flow
\ No newline at end of file
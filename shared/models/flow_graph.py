@@ -0,0 +1,68 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+import sys
+
+class FlowGraph:
+    """Edges of a flow in compressed sparse row (CSR) form.
+
+    Nodes are integer indices and actions are interned strings numbered in
+    order of first use. The edges leaving node `i` are the entries
+    `offsets[i]:offsets[i + 1]` of `edge_actions` and `edge_targets`, two flat
+    arrays of machine integers, in the order they were added so that fan-out
+    branches keep their order.
+    """
+    __slots__ = ("node_count", "actions", "action_ids", "offsets", "edge_actions", "edge_targets")
+
+    def __init__(self, node_count: int = 0, edges: Iterable[Tuple[int, str, int]] = ()):
+        self.node_count = node_count
+        self.actions: List[str] = []
+        self.action_ids: Dict[str, int] = {}
+
+        # Bucket edges by source, dropping duplicates but keeping insertion order
+        buckets: Dict[int, Dict[Tuple[int, int], None]] = {}
+        for source, action, target in edges:
+            if not (0 <= source < node_count and 0 <= target < node_count):
+                raise IndexError(f"Edge {source} -> {target} is outside a graph of {node_count} nodes")
+            buckets.setdefault(source, {})[(self._intern(action), target)] = None
+
+        self.offsets = array("I", [0]) * (node_count + 1)
+        self.edge_actions = array("I")
+        self.edge_targets = array("I")
+        for index in range(node_count):
+            for action_id, target in buckets.get(index, ()):
+                self.edge_actions.append(action_id)
+                self.edge_targets.append(target)
+            self.offsets[index + 1] = len(self.edge_targets)
+
+    def _intern(self, action: str) -> int:
+        action_id = self.action_ids.get(action)
+        if action_id is None:
+            action_id = len(self.actions)
+            action = sys.intern(action)
+            self.actions.append(action)
+            self.action_ids[action] = action_id
+        return action_id
+
+    def successors(self, index: int, action: str) -> List[int]:
+        """Targets of the edges leaving node `index` for `action`."""
+        action_id = self.action_ids.get(action)
+        if action_id is None:
+            return []
+        return [
+            self.edge_targets[edge]
+            for edge in range(self.offsets[index], self.offsets[index + 1])
+            if self.edge_actions[edge] == action_id
+        ]
+
+    def edges(self) -> Iterator[Tuple[int, str, int]]:
+        """All edges as (source, action, target), grouped by source."""
+        for index in range(self.node_count):
+            for edge in range(self.offsets[index], self.offsets[index + 1]):
+                yield index, self.actions[self.edge_actions[edge]], self.edge_targets[edge]
+
+    def __len__(self) -> int:
+        return len(self.edge_targets)
+
+    def extend(self, node_count: int, edges: Iterable[Tuple[int, str, int]]) -> 'FlowGraph':
+        """A new graph with `node_count` nodes, these edges and the new ones."""
+        return FlowGraph(node_count, [*self.edges(), *edges])
@@ -0,0 +1,142 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+import os
+import time
+
+# Events kept in memory per run, and events written to storage per batch
+RUN_HISTORY_SIZE = int(os.getenv("RUN_HISTORY_SIZE", "200"))
+RUN_HISTORY_SPILL_BATCH = int(os.getenv("RUN_HISTORY_SPILL_BATCH", "100"))
+
+# Anchor the monotonic clock to the wall clock once, so event timestamps are
+# comparable across runs yet never go backwards within a process
+_WALL_CLOCK_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+def timestamp_ns() -> int:
+    """Current time as monotonic integer nanoseconds since the epoch."""
+    return time.monotonic_ns() + _WALL_CLOCK_OFFSET_NS
+
+def format_timestamp(value: int) -> str:
+    return datetime.fromtimestamp(value / 1e9).isoformat()
+
+def parse_timestamp(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).timestamp() * 1e9)
+        except ValueError:
+            pass
+    return timestamp_ns()
+
+class HistoryEvent:
+    """One entry of a run's history."""
+    __slots__ = ("seq", "timestamp_ns", "status", "node_id", "action", "error")
+
+    def __init__(self,
+                 seq: int,
+                 timestamp_ns: int,
+                 status: str,
+                 node_id: Optional[str] = None,
+                 action: Optional[str] = None,
+                 error: Optional[str] = None):
+        self.seq = seq
+        self.timestamp_ns = timestamp_ns
+        self.status = status
+        self.node_id = node_id
+        self.action = action
+        self.error = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dictionary form used in run records, events and API responses."""
+        entry: Dict[str, Any] = {"seq": self.seq}
+        if self.node_id is not None:
+            entry["node_id"] = self.node_id
+        entry["status"] = self.status
+        if self.action is not None:
+            entry["action"] = self.action
+        if self.error is not None:
+            entry["error"] = self.error
+        entry["timestamp"] = format_timestamp(self.timestamp_ns)
+        return entry
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any], seq: int) -> 'HistoryEvent':
+        """Read an entry written by to_dict, or a legacy one without `seq`."""
+        return cls(
+            seq=entry.get("seq", seq),
+            timestamp_ns=parse_timestamp(entry.get("timestamp_ns", entry.get("timestamp"))),
+            status=entry.get("status", ""),
+            node_id=entry.get("node_id"),
+            action=entry.get("action"),
+            error=entry.get("error")
+        )
+
+class RunHistory:
+    """Bounded history of a single run.
+
+    The most recent `capacity` events are kept in a ring buffer. With `spill`
+    set, older events move to a spill buffer that the owner drains in batches
+    with take_spilled() and writes to storage; without it they are dropped.
+    Every event has a sequence number, so events in storage and in memory can
+    be paged through together.
+    """
+    def __init__(self, capacity: int = RUN_HISTORY_SIZE, spill: bool = False):
+        self.spill = spill
+        self._events: Deque[HistoryEvent] = deque(maxlen=max(1, capacity))
+        self._spilled: List[HistoryEvent] = []
+        self.next_seq = 0
+        self.dropped = 0
+
+    def append(self,
+               status: str,
+               node_id: Optional[str] = None,
+               action: Optional[str] = None,
+               error: Optional[str] = None) -> HistoryEvent:
+        """Record a new event."""
+        event = HistoryEvent(self.next_seq, timestamp_ns(), status, node_id, action, error)
+        self.next_seq += 1
+        self._push(event)
+        return event
+
+    def load(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Continue from the history of an earlier execution of the run."""
+        for entry in entries:
+            event = HistoryEvent.from_dict(entry, self.next_seq)
+            self.next_seq = max(self.next_seq, event.seq + 1)
+            self._push(event)
+
+    def _push(self, event: HistoryEvent) -> None:
+        if len(self._events) == self._events.maxlen:
+            if self.spill:
+                self._spilled.append(self._events[0])
+            else:
+                self.dropped += 1
+        self._events.append(event)
+
+    @property
+    def pending_spill(self) -> int:
+        """Number of evicted events waiting to be written to storage."""
+        return len(self._spilled)
+
+    def take_spilled(self) -> List[HistoryEvent]:
+        """Hand over the evicted events, oldest first."""
+        events = self._spilled
+        self._spilled = []
+        return events
+
+    def restore_spilled(self, events: List[HistoryEvent]) -> None:
+        """Put back events that could not be written so the next drain retries them."""
+        self._spilled = events + self._spilled
+
+    def __len__(self) -> int:
+        return len(self._spilled) + len(self._events)
+
+    def __iter__(self) -> Iterator[HistoryEvent]:
+        """Events held in memory, oldest first."""
+        yield from self._spilled
+        yield from self._events
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Events held in memory as dictionaries; older ones are only in storage."""
+        return [event.to_dict() for event in self]
@@ -4,9 +4,9 @@ from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 import uuid
 
-from shared.models.flow import Flow, Node, AgentNode, FlowBuilder, FlowStatus
+from shared.models.flow import Flow, Node, AgentNode, JoinNode, FlowBuilder, FlowStatus, DEFAULT_MAX_CONCURRENCY
 from shared.models.core import OrchestraAgent, AgentConfig, Tool
-from shared.db.postgres import save_workflow, get_workflow
+from shared.db.postgres import save_workflow, get_workflow, save_workflow_async, get_workflow_async
 from shared.db.redis_cache import get_agent_state, set_agent_state
 from shared.utils.logging import get_logger
 
@@ -31,28 +31,25 @@ def flow_to_dict(flow: Flow) -> Dict[str, Any]:
             node_info["agent_type"] = node.agent.__class__.__name__
         
         nodes_dict[node_id] = node_info
-        
-        # Process edges
-        for action, successor in node.successors.items():
-            edges.append({
-                "from_node": node.node_id,
-                "to_node": successor.node_id,
-                "action": action
-            })
+    
+    # Process edges (one entry per target, so fan-outs round-trip)
+    for from_node_id, action, to_node_id in flow.edges():
+        edges.append({
+            "from_node": from_node_id,
+            "to_node": to_node_id,
+            "action": action
+        })
     
     # Build the complete flow dictionary
     flow_dict = {
         "id": flow.node_id,
         "name": getattr(flow, 'name', flow.node_id),
         "start_node": flow.start_node.node_id,
+        "max_concurrency": flow.max_concurrency,
         "nodes": nodes_dict,
         "edges": edges,
-        "status": flow.status.value,
-        "current_node": flow.current_node.node_id if flow.current_node else None,
-        "history": flow.history,
         "created_at": flow.created_at,
-        "updated_at": flow.updated_at,
-        "error": flow.error
+        "updated_at": flow.updated_at
     }
     
     return flow_dict
@@ -67,11 +64,16 @@ def dict_to_flow(flow_dict: Dict[str, Any], agents_registry: Optional[Dict[str,
     Returns:
         Flow: Reconstructed Flow object
     """
-    builder = FlowBuilder(name=flow_dict.get("name", flow_dict.get("id")))
+    builder = FlowBuilder(
+        name=flow_dict.get("name", flow_dict.get("id")),
+        max_concurrency=flow_dict.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+    )
     
     # First pass: create all nodes
     for node_id, node_info in flow_dict["nodes"].items():
-        if node_info.get("type") == "AgentNode" and agents_registry:
+        if node_info.get("type") == "JoinNode":
+            builder.add_join_node(node_id)
+        elif node_info.get("type") == "AgentNode" and agents_registry:
             agent_id = node_info.get("agent_id")
             if agent_id and agent_id in agents_registry:
                 builder.add_agent_node(node_id, agents_registry[agent_id])
@@ -93,17 +95,9 @@ def dict_to_flow(flow_dict: Dict[str, Any], agents_registry: Optional[Dict[str,
     # Build the flow
     flow = builder.build()
     
-    # Restore flow state
-    flow.status = FlowStatus(flow_dict.get("status", FlowStatus.PENDING.value))
-    flow.history = flow_dict.get("history", [])
+    # Restore definition timestamps; run state lives in RunState, not the flow
     flow.created_at = flow_dict.get("created_at", datetime.now().isoformat())
     flow.updated_at = flow_dict.get("updated_at", datetime.now().isoformat())
-    flow.error = flow_dict.get("error")
-    
-    # Restore current node if possible
-    current_node_id = flow_dict.get("current_node")
-    if current_node_id and current_node_id in flow.nodes:
-        flow.current_node = flow.nodes[current_node_id]
     
     return flow
 
@@ -118,7 +112,22 @@ def load_flow(flow_id: str, agents_registry: Optional[Dict[str, OrchestraAgent]]
     if not flow_json:
         return None
     
-    flow_dict = json.loads(flow_json)
+    # JSONB columns come back already decoded
+    flow_dict = json.loads(flow_json) if isinstance(flow_json, str) else flow_json
+    return dict_to_flow(flow_dict, agents_registry)
+
+async def save_flow_async(flow_id: str, flow: Flow) -> None:
+    """Save a flow to the database without blocking the event loop."""
+    flow_dict = flow_to_dict(flow)
+    await save_workflow_async(flow_id, json.dumps(flow_dict))
+
+async def load_flow_async(flow_id: str, agents_registry: Optional[Dict[str, OrchestraAgent]] = None) -> Optional[Flow]:
+    """Load a flow from the database without blocking the event loop."""
+    flow_json = await get_workflow_async(flow_id)
+    if not flow_json:
+        return None
+    
+    flow_dict = json.loads(flow_json) if isinstance(flow_json, str) else flow_json
     return dict_to_flow(flow_dict, agents_registry)
 
 def flow_to_yaml(flow: Flow) -> str:
@@ -131,6 +140,44 @@ def yaml_to_flow(yaml_str: str, agents_registry: Optional[Dict[str, OrchestraAge
     flow_dict = yaml.safe_load(yaml_str)
     return dict_to_flow(flow_dict, agents_registry)
 
+def _fan_in_edges(workflow_graph) -> Dict[str, set]:
+    """Edges that must go through a join node, as {target: {sources}}.
+    
+    A node is a fan-in point of a fan-out (an edge with several targets) when
+    two or more of its branches reach it. Only the edges that bring a single
+    branch there (or the fan-out edge itself) go through the join; loop
+    back-edges from further downstream, edges from outside the fan-out and
+    nodes where the paths of a conditional meet stay plain edges.
+    """
+    successors: Dict[str, List[str]] = {}
+    for edge in workflow_graph.edges:
+        successors.setdefault(edge.from_node, []).extend(edge.to_node)
+    
+    fan_in: Dict[str, set] = {}
+    for fan_out in workflow_graph.edges:
+        if len(fan_out.to_node) < 2:
+            continue
+        # Number of branches reaching each node, not walking back through the fan-out
+        reached_by: Dict[str, int] = {}
+        for target in dict.fromkeys(fan_out.to_node):
+            seen = {target}
+            pending = [target]
+            while pending:
+                for next_node in successors.get(pending.pop(), ()):
+                    if next_node != fan_out.from_node and next_node not in seen:
+                        seen.add(next_node)
+                        pending.append(next_node)
+            for node_id in seen:
+                reached_by[node_id] = reached_by.get(node_id, 0) + 1
+        
+        for edge in workflow_graph.edges:
+            for to_node in edge.to_node:
+                if reached_by.get(to_node, 0) < 2:
+                    continue
+                if edge is fan_out or reached_by.get(edge.from_node) == 1:
+                    fan_in.setdefault(to_node, set()).add(edge.from_node)
+    return fan_in
+
 def create_flow_from_workflow_graph(workflow_graph, agents_registry: Dict[str, OrchestraAgent]) -> Flow:
     """Convert a WorkflowGraph to a Flow.
     
@@ -143,6 +190,10 @@ def create_flow_from_workflow_graph(workflow_graph, agents_registry: Dict[str, O
     """
     builder = FlowBuilder(name=workflow_graph.name)
     
+    # Where the branches of a fan-out meet, a join node is placed in front of
+    # the node for the edges coming from those branches
+    fan_in = _fan_in_edges(workflow_graph)
+    
     # Add all nodes
     for node_id, node_def in workflow_graph.nodes.items():
         agent_id = node_def.agent_id
@@ -153,13 +204,19 @@ def create_flow_from_workflow_graph(workflow_graph, agents_registry: Dict[str, O
             logger.warning(f"Agent {agent_id} not found in registry, creating regular node")
             builder.add_node(node_id)
     
-    # Connect nodes based on edges
+    for node_id in fan_in:
+        join_id = f"{node_id}__join"
+        builder.add_join_node(join_id)
+        builder.connect(from_node_id=join_id, action="default", to_node_id=node_id)
+    
+    # Connect nodes based on edges; each target of a multi-target edge is a
+    # concurrent branch
     for edge in workflow_graph.edges:
         for to_node in edge.to_node:
             builder.connect(
                 from_node_id=edge.from_node,
                 action=edge.action,
-                to_node_id=to_node
+                to_node_id=f"{to_node}__join" if edge.from_node in fan_in.get(to_node, ()) else to_node
             )
     
-    return builder.build()
\ No newline at end of file
+    return builder.build()
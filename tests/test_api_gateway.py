@@ -0,0 +1,149 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+_GATEWAY_DIR = os.path.join(os.path.dirname(__file__), "..", "api_gateway")
+sys.path.insert(0, _GATEWAY_DIR)
+_spec = importlib.util.spec_from_file_location("api_gateway_service", os.path.join(_GATEWAY_DIR, "main.py"))
+gateway = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gateway)
+
+class Body(httpx.AsyncByteStream):
+    """Unread response body, as a real upstream connection would deliver it"""
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+
+def _response(status_code, body=b"", headers=None):
+    headers = list(headers or []) + [("content-length", str(len(body)))]
+    return httpx.Response(status_code, headers=headers, stream=Body(body))
+
+class Upstream:
+    """Mock upstream services recording the requests the gateway sends"""
+    def __init__(self):
+        self.requests = []
+        self.routes = {}
+
+    def handle(self, request):
+        self.requests.append(request)
+        route = self.routes.get((request.method, request.url.path))
+        if route is None:
+            body = json.dumps({"path": request.url.path, "query": request.url.query.decode()}).encode()
+            return _response(200, body, [("content-type", "application/json")])
+        return route(request)
+
+@pytest.fixture
+def upstream(monkeypatch):
+    upstream = Upstream()
+    transport = httpx.MockTransport(upstream.handle)
+    clients = {
+        name: httpx.AsyncClient(base_url=url, transport=transport)
+        for name, url in gateway.SERVICE_URLS.items()
+    }
+    monkeypatch.setattr(gateway, "upstream_clients", clients)
+    monkeypatch.setattr(gateway, "response_cache", gateway.ResponseCache(gateway.DEFAULT_CACHE_TTLS, max_body_size=1024))
+    return upstream
+
+@pytest.fixture
+def client():
+    return TestClient(gateway.app)
+
+def test_requests_are_streamed_through_with_their_headers(upstream, client):
+    def echo(request):
+        return _response(201, request.content, [("set-cookie", "a=1"), ("set-cookie", "b=2"),
+                                                 ("connection", "close"), ("x-upstream", "yes")])
+    upstream.routes[("POST", "/v1/ai/generate")] = echo
+
+    response = client.post("/v1/ai/generate?mode=fast", content=b'{"prompt": "hi"}',
+                           headers={"x-request-id": "42", "keep-alive": "timeout=5"})
+
+    assert response.status_code == 201
+    assert response.content == b'{"prompt": "hi"}'
+    assert response.headers.get_list("set-cookie") == ["a=1", "b=2"]
+    assert response.headers["x-upstream"] == "yes"
+    sent = upstream.requests[-1]
+    assert sent.url.query == b"mode=fast"
+    assert sent.headers["x-request-id"] == "42"
+    assert "keep-alive" not in sent.headers
+
+def test_upstream_clients_are_pooled_per_service(upstream):
+    client = gateway.get_upstream_client("mcp-service")
+
+    assert gateway.get_upstream_client("mcp-service") is client
+    assert gateway.get_upstream_client("ai-service") is not client
+
+def test_unreachable_upstream_is_a_bad_gateway(upstream, client):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+    upstream.routes[("DELETE", "/v1/mcp/servers/1")] = refuse
+
+    response = client.delete("/v1/mcp/servers/1")
+
+    assert response.status_code == 502
+    assert "mcp-service unavailable" in response.json()["detail"]
+
+def test_get_responses_are_cached_with_an_etag(upstream, client):
+    first = client.get("/v1/integrations/list?page=1")
+    second = client.get("/v1/integrations/list?page=1")
+
+    assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+    assert first.json() == second.json() == {"path": "/v1/integrations/list", "query": "page=1"}
+    assert first.headers["etag"] == second.headers["etag"] == gateway.make_etag(first.content)
+    assert len(upstream.requests) == 1
+
+    revalidated = client.get("/v1/integrations/list?page=1", headers={"if-none-match": first.headers["etag"]})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert client.get("/v1/integrations/list?page=2").headers["x-cache"] == "MISS"
+    assert client.get("/v1/integrations/list?page=1", headers={"authorization": "Bearer other"}).headers["x-cache"] == "MISS"
+    assert client.get("/v1/integrations/list?page=1", headers={"cache-control": "no-cache"}).headers.get("x-cache") is None
+    assert len(upstream.requests) == 4
+
+def test_writes_invalidate_the_service_cache(upstream, client):
+    client.get("/v1/workflows/list")
+    assert client.get("/v1/workflows/list").headers["x-cache"] == "HIT"
+
+    assert client.post("/v1/workflows/create", json={}).status_code == 200
+
+    assert client.get("/v1/workflows/list").headers["x-cache"] == "MISS"
+
+def test_uncacheable_responses_are_not_stored(upstream, client):
+    upstream.routes[("GET", "/v1/mcp/private")] = lambda request: _response(200, b"{}", [("cache-control", "private")])
+    upstream.routes[("GET", "/v1/mcp/large")] = lambda request: _response(200, b"x" * 4096)
+
+    for path in ("/v1/mcp/private", "/v1/mcp/large", "/v1/mcp/private", "/v1/mcp/large"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers.get("x-cache") != "HIT"
+    assert response.content == b"x" * 4096
+    assert len(upstream.requests) == 4
+
+def test_concurrent_misses_share_one_upstream_request():
+    cache = gateway.ResponseCache({"/": 60})
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.02)
+        body = b"payload"
+        return gateway.CachedResponse(status_code=200, headers=[], body=body, etag=gateway.make_etag(body),
+                                      expires_at=time.time() + 60, cacheable=True)
+
+    async def scenario():
+        results = await asyncio.gather(*[cache.fetch("key", loader) for _ in range(5)])
+        return results, await cache.fetch("key", loader)
+
+    results, later = asyncio.run(scenario())
+
+    assert len(loads) == 1
+    assert all(entry.body == b"payload" and not hit for entry, hit in results)
+    assert later[1] is True
+    assert cache.stats() == {"hits": 1, "misses": 5, "entries": 1}
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ai-service"))
+
+from embedding_storage import pack_embeddings, unpack_embeddings
+
+def _vectors(count=20, dim=384):
+    return np.random.default_rng(11).normal(size=(count, dim)).astype(np.float32)
+
+def _unpack(packed, fmt):
+    return unpack_embeddings([blob for blob, _ in packed], [fmt] * len(packed), [scale for _, scale in packed])
+
+def test_float32_round_trip_is_exact():
+    vectors = _vectors()
+    packed = pack_embeddings(vectors, "float32")
+
+    assert all(scale is None and len(blob) == 384 * 4 for blob, scale in packed)
+    np.testing.assert_array_equal(_unpack(packed, "float32"), vectors)
+
+def test_int8_round_trip_is_quarter_size_and_close():
+    vectors = _vectors()
+    vectors[3] = 0.0
+    packed = pack_embeddings(vectors, "int8")
+    restored = _unpack(packed, "int8")
+
+    assert all(len(blob) == 384 for blob, _ in packed)
+    # Symmetric quantization is off by at most half a step per value
+    steps = np.abs(vectors).max(axis=1, keepdims=True) / 127.0
+    assert (np.abs(restored - vectors) <= steps / 2 + 1e-6).all()
+    np.testing.assert_array_equal(restored[3], 0.0)
+    cosine = (restored * vectors).sum(axis=1)[[0, 1]] / (
+        np.linalg.norm(restored[[0, 1]], axis=1) * np.linalg.norm(vectors[[0, 1]], axis=1))
+    assert (cosine > 0.999).all()
+
+def test_mixed_formats_decode_in_row_order():
+    vectors = _vectors(count=6, dim=16)
+    float_rows = pack_embeddings(vectors[::2], "float32")
+    int_rows = pack_embeddings(vectors[1::2], "int8")
+    packed = [row for pair in zip(float_rows, int_rows) for row in pair]
+    formats = ["float32", "int8"] * 3
+
+    restored = unpack_embeddings([blob for blob, _ in packed], formats, [scale for _, scale in packed])
+
+    assert restored.shape == (6, 16) and restored.dtype == np.float32
+    np.testing.assert_array_equal(restored[::2], vectors[::2])
+    np.testing.assert_allclose(restored[1::2], vectors[1::2], atol=0.05)
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        pack_embeddings(_vectors(count=1), "float16")
+    with pytest.raises(ValueError):
+        unpack_embeddings([b"\x00" * 4, b"\x00" * 2], ["float32", "float16"], [None, None])
+    assert unpack_embeddings([], [], []).shape == (0, 0)
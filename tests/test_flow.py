@@ -0,0 +1,225 @@
+import asyncio
+import time
+
+import json
+
+from shared.models.context import MAX_CONTEXT_DEPTH, FlowContext, apply_context_delta, context_delta
+from shared.models.flow import FlowBuilder, FlowStatus, Node, RunState, dump_branches, merge_contexts
+from shared.utils.flow_utils import dict_to_flow
+
+def _linear_flow_dict(length):
+    node_ids = [f"n{i}" for i in range(length)]
+    return {
+        "id": "linear",
+        "name": "linear",
+        "start_node": node_ids[0],
+        "nodes": {node_id: {"id": node_id, "type": "Node"} for node_id in node_ids},
+        "edges": [
+            {"from_node": a, "to_node": b, "action": "default"}
+            for a, b in zip(node_ids, node_ids[1:])
+        ]
+    }
+
+def test_long_passthrough_flow_serializes_in_linear_time():
+    flow = dict_to_flow(_linear_flow_dict(200))
+    
+    started = time.monotonic()
+    result = asyncio.run(flow.exec({"value": 1}))
+    elapsed = time.monotonic() - started
+    
+    assert elapsed < 2.0
+    assert result["value"] == 1
+    assert len(result["node_outputs"]) == 200
+    # Passthrough outputs hold the context without earlier outputs
+    assert result["node_outputs"]["n199"] == {"value": 1}
+
+
+def test_node_edge_added_after_build_is_followed():
+    flow = dict_to_flow(_linear_flow_dict(3))
+    extra = flow.add_node(Node("extra"))
+    flow.graph
+    
+    flow.get_node("n0").add_edge("default", extra)
+    
+    assert [node.node_id for node in flow.next_nodes(flow.get_node("n0"), "default")] == ["n1", "extra"]
+    assert ("n0", "default", "extra") in flow.edges()
+    result = asyncio.run(flow.exec({"value": 1}))
+    assert "extra" in result["node_outputs"]
+
+
+def _recording_node(calls, name, delay=0.0, on_exec=None):
+    async def exec_fn(inputs):
+        calls.append(name)
+        if on_exec is not None:
+            on_exec()
+        await asyncio.sleep(delay)
+        return {name: True}
+    return Node(exec_fn=exec_fn)
+
+def test_pause_inside_fan_out_resumes_only_unfinished_branches():
+    # a -> {b, c -> c2 -> c3} -> j -> z; the pause comes while c runs, after b has joined
+    calls = []
+    state = RunState()
+    builder = FlowBuilder("fan_out")
+    builder.add_node("a", _recording_node(calls, "a"))
+    builder.add_node("b", _recording_node(calls, "b"))
+    builder.add_node("c", _recording_node(calls, "c", delay=0.05, on_exec=lambda: asyncio.get_running_loop().call_later(0.02, state.pause)))
+    builder.add_node("c2", _recording_node(calls, "c2"))
+    builder.add_node("c3", _recording_node(calls, "c3"))
+    builder.add_join_node("j")
+    builder.add_node("z", _recording_node(calls, "z"))
+    for source, target in [("a", "b"), ("a", "c"), ("b", "j"), ("c", "c2"), ("c2", "c3"), ("c3", "j"), ("j", "z")]:
+        builder.connect(source, "default", target)
+    flow = builder.build()
+    
+    checkpoints = []
+    async def checkpoint(run_state, context):
+        checkpoints.append(json.loads(json.dumps({
+            "node_id": run_state.current_node.node_id if run_state.current_node else None,
+            "action": run_state.resume_action,
+            "branches": dump_branches(run_state.branches, context) if run_state.branches else None,
+            "context": context.to_dict()
+        })))
+    
+    asyncio.run(flow.exec({"value": 1}, state, checkpoint=checkpoint))
+    assert state.status == FlowStatus.PAUSED
+    assert calls == ["a", "b", "c"]
+    saved = checkpoints[-1]
+    assert saved["node_id"] == "a"
+    assert [branch["done"] for branch in saved["branches"]] == [True, False]
+    assert saved["branches"][1]["node_id"] == "c2"
+    
+    calls.clear()
+    resumed = RunState()
+    result = asyncio.run(flow.exec(saved["context"], resumed, resume_from=saved["node_id"],
+                                   resume_action=saved["action"], resume_branches=saved["branches"]))
+    assert resumed.status == FlowStatus.COMPLETED
+    assert calls == ["c2", "c3", "z"]
+    assert set(result["node_outputs"]) == {"a", "b", "c", "c2", "c3", "j", "z"}
+    assert result["b"] and result["c3"] and result["value"] == 1
+
+def test_context_delta_holds_only_changes():
+    base = FlowContext({"value": 1, "drop": True, "node_outputs": FlowContext({"a": {"big": "x" * 1000}})})
+    context = base.copy()
+    context["value"] = 2
+    del context["drop"]
+    outputs = context["node_outputs"].copy()
+    outputs["b"] = {"small": 1}
+    context["node_outputs"] = outputs
+    
+    delta = context_delta(context, base)
+    assert delta == {"set": {"value": 2}, "nested": {"node_outputs": {"set": {"b": {"small": 1}}}}, "removed": ["drop"]}
+    
+    restored = base.to_dict()
+    apply_context_delta(restored, json.loads(json.dumps(delta)))
+    assert restored == context.to_dict()
+
+def test_concurrent_runs_of_one_flow_keep_their_own_state():
+    async def double(inputs):
+        await asyncio.sleep(0.01)
+        return {"value": inputs["value"] * 2}
+    builder = FlowBuilder("shared")
+    for node_id in ("a", "b", "c"):
+        builder.add_node(node_id, Node(exec_fn=double))
+    builder.connect("a", "default", "b").connect("b", "default", "c")
+    flow = builder.build()
+    
+    async def scenario():
+        states = [RunState() for _ in range(3)]
+        runs = [asyncio.ensure_future(flow.exec({"value": value}, state)) for value, state in zip((1, 10, 100), states)]
+        await asyncio.sleep(0.015)
+        states[1].pause()
+        return states, await asyncio.gather(*runs)
+    
+    states, results = asyncio.run(scenario())
+    
+    assert [state.status for state in states] == [FlowStatus.COMPLETED, FlowStatus.PAUSED, FlowStatus.COMPLETED]
+    assert [results[0]["value"], results[2]["value"]] == [8, 800]
+    assert states[1].current_node.node_id == "c"
+    assert len({state.run_id for state in states}) == 3
+    assert [event["node_id"] for event in states[0].history.to_list()] == ["a", "a", "b", "b", "c", "c"]
+    # The flow itself holds no run state, so it can be executed again right away
+    assert not any(hasattr(flow, name) for name in ("state", "status", "context", "current_node"))
+    assert asyncio.run(flow.exec({"value": 2}))["value"] == 16
+
+def test_context_copies_are_isolated_and_share_unchanged_values():
+    payload = ["x"] * 1000
+    base = FlowContext({"payload": payload, "value": 1, "gone": True})
+    versions = [base]
+    for i in range(MAX_CONTEXT_DEPTH * 2):
+        version = versions[-1].copy()
+        version["value"] = i
+        versions.append(version)
+    del versions[-1]["gone"]
+    
+    assert base["value"] == 1 and base["gone"]
+    assert versions[5]["value"] == 4
+    assert "gone" not in versions[-1] and "gone" in versions[-2]
+    assert all(version["payload"] is payload for version in versions)
+    assert versions[-1].diff(versions[-2]) == ({"value": MAX_CONTEXT_DEPTH * 2 - 1}, {"gone"})
+    assert versions[-1].diff(base) == ({"value": MAX_CONTEXT_DEPTH * 2 - 1}, {"gone"})
+
+def test_step_contexts_stay_intact_after_later_steps():
+    payload = {"documents": ["doc"] * 100}
+    builder = FlowBuilder("cow")
+    builder.add_node("a", Node(exec_fn=lambda inputs: {"step": "a"}))
+    builder.add_node("b", Node(exec_fn=lambda inputs: {"step": "b"}))
+    builder.connect("a", "default", "b")
+    flow = builder.build()
+    
+    seen = []
+    async def checkpoint(state, context):
+        seen.append(context)
+    result = asyncio.run(flow.exec({"payload": payload}, checkpoint=checkpoint))
+    
+    assert [context["step"] for context in seen] == ["a", "b"]
+    assert set(seen[0]["node_outputs"]) == {"a"}
+    assert seen[0]["payload"] is seen[1]["payload"] is payload
+    assert result["step"] == "b"
+
+def test_merge_applies_only_what_each_branch_changed():
+    base = FlowContext({"keep": 1, "shared": "base", "drop": True, "node_outputs": FlowContext({"a": 1})})
+    left = base.copy()
+    left["shared"] = "left"
+    left_outputs = left["node_outputs"].copy()
+    left_outputs["b"] = 2
+    left["node_outputs"] = left_outputs
+    right = base.copy()
+    right["shared"] = "right"
+    del right["drop"]
+    right_outputs = right["node_outputs"].copy()
+    right_outputs["c"] = 3
+    right["node_outputs"] = right_outputs
+    
+    merged = merge_contexts(base, [left, right]).to_dict()
+    
+    assert merged == {"keep": 1, "shared": "right", "node_outputs": {"a": 1, "b": 2, "c": 3}}
+    assert base.to_dict()["shared"] == "base" and "drop" in base
+
+def test_fan_out_branches_run_concurrently_within_the_limit_and_merge_at_the_join():
+    running = []
+    peak = []
+    def branch(name):
+        async def exec_fn(inputs):
+            running.append(name)
+            peak.append(len(running))
+            await asyncio.sleep(0.02)
+            running.remove(name)
+            return {name: inputs["value"], "last": name}
+        return Node(exec_fn=exec_fn)
+    
+    builder = FlowBuilder("fan_out", max_concurrency=2)
+    builder.add_node("a", Node(exec_fn=lambda inputs: {"value": 1}))
+    builder.add_join_node("j")
+    for name in ("b", "c", "d"):
+        builder.add_node(name, branch(name))
+        builder.connect("a", "default", name).connect(name, "default", "j")
+    flow = builder.build()
+    
+    result = asyncio.run(flow.exec({}))
+    
+    assert max(peak) == 2
+    assert {key: result[key] for key in ("b", "c", "d")} == {"b": 1, "c": 1, "d": 1}
+    # Later branches win conflicting keys; every branch's outputs are kept
+    assert result["last"] == "d"
+    assert set(result["node_outputs"]) == {"a", "b", "c", "d", "j"}
@@ -0,0 +1,56 @@
+import asyncio
+
+from shared.models.core import EdgeDefinition, NodeDefinition, WorkflowGraph
+from shared.models.flow import JoinNode
+from shared.utils.flow_utils import create_flow_from_workflow_graph
+
+def _graph(node_ids, edges):
+    return WorkflowGraph(
+        name="graph",
+        description=None,
+        trigger={},
+        start_node=node_ids[0],
+        nodes={node_id: NodeDefinition(agent_id=node_id, inputs={}, outputs={}) for node_id in node_ids},
+        edges=[EdgeDefinition(from_node=source, to_node=targets, action=action) for source, action, targets in edges]
+    )
+
+def _join_ids(flow):
+    return sorted(node_id for node_id, node in flow.nodes.items() if isinstance(node, JoinNode))
+
+def test_fan_out_gets_a_join_where_its_branches_meet():
+    flow = create_flow_from_workflow_graph(_graph(
+        ["a", "b", "c", "c2", "m", "z"],
+        [("a", "default", ["b", "c"]), ("b", "default", ["m"]), ("c", "default", ["c2"]),
+         ("c2", "default", ["m"]), ("m", "default", ["z"])]
+    ), {})
+    
+    assert _join_ids(flow) == ["m__join"]
+    result = asyncio.run(flow.exec({}))
+    assert set(result["node_outputs"]) == {"a", "b", "c", "c2", "m__join", "m", "z"}
+
+def test_loop_inside_a_branch_stays_a_plain_edge():
+    # b2 loops back to b on "retry"; only branch b reaches b, so it is no fan-in point
+    flow = create_flow_from_workflow_graph(_graph(
+        ["a", "b", "b2", "c", "m"],
+        [("a", "default", ["b", "c"]), ("b", "default", ["b2"]), ("b2", "retry", ["b"]),
+         ("b2", "default", ["m"]), ("c", "default", ["m"]), ("m", "again", ["m"])]
+    ), {})
+    
+    assert _join_ids(flow) == ["m__join"]
+    edges = set(flow.edges())
+    assert ("b2", "retry", "b") in edges
+    assert ("a", "default", "b") in edges
+    # Back-edges from behind the join skip it
+    assert ("m", "again", "m") in edges
+    assert ("b2", "default", "m__join") in edges and ("c", "default", "m__join") in edges
+
+def test_if_else_merge_stays_a_plain_edge():
+    flow = create_flow_from_workflow_graph(_graph(
+        ["check", "yes", "no", "merge", "other", "other2"],
+        [("check", "yes", ["yes"]), ("check", "no", ["no"]), ("yes", "default", ["merge"]),
+         ("no", "default", ["merge"]), ("merge", "default", ["other", "other2"])]
+    ), {})
+    
+    assert _join_ids(flow) == []
+    edges = set(flow.edges())
+    assert ("yes", "default", "merge") in edges and ("no", "default", "merge") in edges
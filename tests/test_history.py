@@ -0,0 +1,58 @@
+from shared.models.history import RunHistory, format_timestamp, parse_timestamp, timestamp_ns
+
+def _seqs(entries):
+    return [entry["seq"] if isinstance(entry, dict) else entry.seq for entry in entries]
+
+def test_ring_buffer_keeps_the_latest_events():
+    history = RunHistory(capacity=3)
+    for i in range(10):
+        history.append("completed", node_id=f"n{i}")
+
+    assert _seqs(history.to_list()) == [7, 8, 9]
+    assert history.dropped == 7
+    assert history.next_seq == 10
+    assert history.pending_spill == 0
+
+def test_evicted_events_spill_in_order_and_can_be_restored():
+    history = RunHistory(capacity=3, spill=True)
+    for i in range(6):
+        history.append("completed", node_id=f"n{i}")
+
+    assert history.pending_spill == 3
+    assert len(history) == 6
+    batch = history.take_spilled()
+    assert _seqs(batch) == [0, 1, 2]
+    assert _seqs(history.to_list()) == [3, 4, 5]
+
+    # A failed write puts the batch back ahead of anything evicted since
+    history.append("completed", node_id="n6")
+    history.restore_spilled(batch)
+    assert _seqs(history.take_spilled()) == [0, 1, 2, 3]
+    assert history.dropped == 0
+
+def test_loaded_history_continues_its_sequence():
+    earlier = RunHistory(capacity=10)
+    for i in range(4):
+        earlier.append("completed", node_id=f"n{i}", action="default")
+    stored = earlier.to_list()
+
+    history = RunHistory(capacity=10)
+    history.load(stored)
+    event = history.append("completed", node_id="n4")
+
+    assert history.to_list()[:4] == stored
+    assert event.seq == 4
+
+    # Entries written before sequence numbers existed are numbered as loaded
+    legacy = RunHistory(capacity=10)
+    legacy.load([{"node_id": "old", "status": "started", "timestamp": "2024-01-01T00:00:00"}])
+    legacy.append("completed", node_id="old")
+    assert _seqs(legacy.to_list()) == [0, 1]
+    assert legacy.to_list()[0]["timestamp"] == "2024-01-01T00:00:00"
+
+def test_timestamps_round_trip_through_their_text_form():
+    now = timestamp_ns()
+
+    assert abs(parse_timestamp(format_timestamp(now)) - now) < 1000
+    assert parse_timestamp(now) == now
+    assert parse_timestamp("not a time") >= now
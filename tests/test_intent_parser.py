@@ -0,0 +1,116 @@
+import importlib.util
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("openai")
+
+_SERVICE_PATH = os.path.join(os.path.dirname(__file__), "..", "backend", "services", "intent-parser", "src", "main.py")
+_spec = importlib.util.spec_from_file_location("intent_parser_service", _SERVICE_PATH)
+service = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(service)
+
+def _regex_analysis(parser, command):
+    """The per-feature regex and substring checks the compiled matcher replaced"""
+    command_lower = command.lower()
+    keywords = [
+        category for category, patterns in parser.patterns.items()
+        if any(re.search(pattern, command_lower) for pattern in patterns)
+    ]
+    data_sources = [
+        source for source, words in service.DATA_SOURCES.items()
+        if any(word in command_lower for word in words)
+    ]
+    output_format = next(
+        (name for name, words in service.OUTPUT_FORMATS.items() if any(word in command_lower for word in words)),
+        "Data Output"
+    )
+    return service.CommandFeatures(
+        keywords=keywords,
+        word_count=len(command.split()),
+        has_complex_logic=any(word in command_lower for word in service.COMPLEX_INDICATORS),
+        has_clear_action=any(word in command_lower for word in service.ACTION_WORDS),
+        has_specific_target=any(word in command_lower for word in service.SPECIFIC_TARGETS),
+        data_sources=data_sources or ["General Data"],
+        output_format=output_format
+    )
+
+def _commands():
+    commands = [
+        "",
+        "Analyze sales data and create a dashboard",
+        "Scrape competitor websites daily, then email a PDF summary",
+        "Monitor the API endpoint and alert me when it fails",
+        "Backup my CSV files to the cloud every week",
+        "REPORTING: weekly presentation slides from the SQL database",
+        "Do something nice",
+        "schedulereportsendbackupsyncwatch",
+        "databases, webhooks, emails and dashboards",
+    ]
+    # Random mixes of every fragment, glued to each other and to noise
+    fragments = sorted({
+        fragment
+        for patterns in service.IntentParser().patterns.values() for fragment in patterns
+    } | set(service.COMPLEX_INDICATORS) | set(service.ACTION_WORDS) | set(service.SPECIFIC_TARGETS) | {
+        word for words in list(service.DATA_SOURCES.values()) + list(service.OUTPUT_FORMATS.values()) for word in words
+    })
+    rng = random.Random(17)
+    noise = ["x", "the", "ing", "s", "ed", " ", "-", "re", "un"]
+    for _ in range(500):
+        parts = rng.choices(fragments + noise, k=rng.randint(1, 12))
+        separators = rng.choices(["", " ", ", "], k=len(parts))
+        command = "".join(part + separator for part, separator in zip(parts, separators))
+        commands.append(command.upper() if rng.random() < 0.2 else command)
+    return commands
+
+def test_compiled_matcher_agrees_with_regex_checks():
+    parser = service.IntentParser()
+
+    for command in _commands():
+        assert parser.analyze(command) == _regex_analysis(parser, command), command
+
+def test_parse_builds_the_intent_from_one_analysis():
+    intent = service.parser.parse("Scrape product prices and email a report")
+
+    assert intent.complexity == "complex"
+    assert intent.outputFormat == "Report"
+    assert intent.requiredData == ["Web Sources", "Email"]
+    assert [step.agent for step in intent.steps] == ["data_agent", "data_agent", "web_agent", "report_agent"]
+    assert intent.confidence == 0.95
+
+def test_batch_items_run_concurrently_and_stream_with_their_index(monkeypatch):
+    monkeypatch.setattr(service, "INTENT_BATCH_CONCURRENCY", 2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+    parse = service.parser.parse
+    def slow_parse(command):
+        with lock:
+            active.append(command)
+            peak.append(len(active))
+        # The first command is slowest, so it finishes last
+        time.sleep(0.1 if command == "analyze sales" else 0.02)
+        with lock:
+            active.remove(command)
+        return parse(command)
+    monkeypatch.setattr(service.parser, "parse", slow_parse)
+
+    response = TestClient(service.app).post("/parse/batch", json={"commands": ["analyze sales", "", "monitor site", "send email"]})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    assert lines[-1]["index"] == 0
+    assert lines[[line["index"] for line in lines].index(1)] == {"index": 1, "error": "Command cannot be empty"}
+    assert max(peak) == 2
+
+    intents = [line["intent"] for line in sorted(lines, key=lambda line: line["index"]) if "intent" in line]
+    response = TestClient(service.app).post("/generate/batch", json={"intents": intents})
+    workflows = {line["index"]: line["workflow"] for line in map(json.loads, response.text.splitlines())}
+    assert [workflows[i]["description"] for i in range(3)] == [intent["objective"] for intent in intents]
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ai-service"))
+
+from knowledge_index import EmbeddingIndex, KnowledgeIndexRegistry
+
+def _brute_force(ids, vectors, query, top_k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    order = sorted(range(len(ids)), key=lambda i: -scores[i])[:top_k]
+    return [ids[i] for i in order], scores[order]
+
+def test_top_k_matches_brute_force():
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(len(vectors))]
+    index = EmbeddingIndex()
+    index.add(ids, vectors)
+
+    for top_k in (1, 5, 50, 500, 1000):
+        query = rng.normal(size=32)
+        results = index.search(query, top_k)
+        expected_ids, expected_scores = _brute_force(ids, vectors, query, top_k)
+        assert [doc_id for doc_id, _ in results] == expected_ids
+        np.testing.assert_allclose([score for _, score in results], expected_scores, atol=1e-5)
+
+def test_replace_and_remove_keep_ids_and_rows_aligned():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(100)]
+    index = EmbeddingIndex()
+    index.add(ids[:60], vectors[:60])
+    index.add(ids[60:], vectors[60:])
+    index.remove(ids[::3] + ["unknown"])
+    replacement = rng.normal(size=(1, 8)).astype(np.float32)
+    index.add(["doc-1"], replacement)
+    vectors[1] = replacement
+
+    kept = [i for i in range(100) if i % 3]
+    assert len(index) == len(kept)
+    query = rng.normal(size=8)
+    expected_ids, _ = _brute_force([ids[i] for i in kept], vectors[kept], query, 10)
+    assert [doc_id for doc_id, _ in index.search(query, 10)] == expected_ids
+    assert index.search(vectors[1], 1)[0][0] == "doc-1"
+
+def test_changes_made_while_an_index_loads_are_kept():
+    loading = threading.Event()
+    release = threading.Event()
+    stored = {"ids": ["a", "b"], "vectors": np.eye(3, dtype=np.float32)[:2]}
+
+    def loader(name):
+        # Read storage, then stall until the ingest below has happened
+        ids, vectors = list(stored["ids"]), stored["vectors"].copy()
+        loading.set()
+        release.wait(5)
+        return ids, vectors
+
+    async def scenario():
+        registry = KnowledgeIndexRegistry()
+        load = asyncio.ensure_future(registry.get("kb", loader))
+        await asyncio.to_thread(loading.wait, 5)
+        registry.add("kb", ["c"], np.eye(3, dtype=np.float32)[2:])
+        registry.remove("kb", ["a"])
+        release.set()
+        index = await load
+        assert await registry.get("kb", loader) is index
+        return index
+
+    index = asyncio.run(scenario())
+
+    assert sorted(index.ids) == ["b", "c"]
+    assert index.search([0, 0, 1], 1)[0][0] == "c"
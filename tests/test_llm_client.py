@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ai-service"))
+
+from llm_client import LLMClient, LLMError
+
+def _completion(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+class FakeServer:
+    """Chat completions endpoint answering with the last user message"""
+    def __init__(self, statuses=(), delay=0.01):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.statuses:
+            return httpx.Response(self.statuses.pop(0), headers={"retry-after": "0"}, text="error")
+        payload = json.loads(request.content)
+        return httpx.Response(200, json=_completion(payload["messages"][-1]["content"]))
+
+def _client(server, **kwargs):
+    client = LLMClient(api_key="test", base_url="http://llm.test/v1", backoff_base=0.001, **kwargs)
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(server.handle))
+    return client
+
+def _messages(text):
+    return [{"role": "user", "content": text}]
+
+def test_identical_in_flight_requests_are_sent_once():
+    server = FakeServer()
+    client = _client(server)
+
+    async def scenario():
+        results = await asyncio.gather(
+            *[client.chat(_messages("same"), model="m") for _ in range(5)],
+            client.chat(_messages("other"), model="m")
+        )
+        await client.close()
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results == ["same"] * 5 + ["other"]
+    assert server.requests == 2
+    assert not client._in_flight and not client._tasks
+
+def test_cancelled_caller_does_not_cancel_the_shared_request():
+    server = FakeServer(delay=0.05)
+    client = _client(server)
+
+    async def scenario():
+        first = asyncio.ensure_future(client.chat(_messages("q"), model="m"))
+        second = asyncio.ensure_future(client.chat(_messages("q"), model="m"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        await client.close()
+        return first, result
+
+    first, result = asyncio.run(scenario())
+
+    assert first.cancelled()
+    assert result == "q"
+    assert server.requests == 1
+
+def test_requests_are_limited_to_max_concurrency():
+    server = FakeServer(delay=0.02)
+    client = _client(server, max_concurrency=2)
+
+    async def scenario():
+        results = await asyncio.gather(*[client.chat(_messages(str(i)), model="m") for i in range(6)])
+        await client.close()
+        return results
+
+    assert asyncio.run(scenario()) == [str(i) for i in range(6)]
+    assert server.peak == 2
+
+def test_retryable_errors_are_retried_and_others_raise():
+    server = FakeServer(statuses=[429, 503])
+    client = _client(server, max_retries=3)
+    assert asyncio.run(client.chat(_messages("ok"), model="m")) == "ok"
+    assert server.requests == 3
+
+    server = FakeServer(statuses=[400])
+    client = _client(server, max_retries=3)
+    with pytest.raises(LLMError, match="400"):
+        asyncio.run(client.chat(_messages("bad"), model="m"))
+    assert server.requests == 1
+
+    server = FakeServer(statuses=[500] * 3)
+    client = _client(server, max_retries=2)
+    with pytest.raises(LLMError, match="500"):
+        asyncio.run(client.chat(_messages("down"), model="m"))
+    assert server.requests == 3
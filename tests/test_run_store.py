@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from workflow_engine import run_store as run_store_module
+from workflow_engine.run_store import RunStore
+
+class FakeRunsTable:
+    """In-memory workflow_runs standing in for the shared.db.postgres helpers"""
+    def __init__(self):
+        self.rows = {}
+        self.batches = []
+        self.reads = 0
+        self.fail = False
+
+    async def save_runs(self, rows):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append([row["run_id"] for row in rows])
+        for row in rows:
+            self.rows[row["run_id"]] = dict(row)
+
+    async def get_run(self, run_id):
+        self.reads += 1
+        row = self.rows.get(run_id)
+        if row is None:
+            return None
+        row = {key: value for key, value in row.items() if key != "flow_id"}
+        row["created_at"] = datetime(2024, 1, 1)
+        return row
+
+def _table(monkeypatch):
+    table = FakeRunsTable()
+    monkeypatch.setattr(run_store_module, "save_runs_async", table.save_runs)
+    monkeypatch.setattr(run_store_module, "get_run_async", table.get_run)
+    return table
+
+def _run(run_id, status="running", step=0):
+    return {"run_id": run_id, "flow_id": "flow", "status": status, "context": {"step": step}, "history": []}
+
+def test_status_changes_flush_at_once_and_progress_is_written_behind(monkeypatch):
+    table = _table(monkeypatch)
+
+    async def scenario():
+        store = RunStore(flush_interval=60, batch_size=100)
+        await store.put(_run("r1"))
+        assert table.batches == [["r1"]]
+
+        # Same status: buffered until the next flush
+        await store.put(_run("r1", step=1))
+        await store.put(_run("r1", step=2))
+        assert table.batches == [["r1"]]
+        assert (await store.get("r1"))["context"] == {"step": 2}
+
+        await store.put(_run("r1", status="completed", step=3))
+        assert table.batches == [["r1"], ["r1"]]
+        assert table.rows["r1"]["status"] == "completed"
+        assert table.rows["r1"]["context"] == '{"step": 3}'
+        await store.close()
+
+    asyncio.run(scenario())
+
+def test_full_buffer_and_timer_flush_in_batches(monkeypatch):
+    table = _table(monkeypatch)
+
+    async def scenario():
+        store = RunStore(flush_interval=0.01, batch_size=3)
+        for run_id in ("a", "b", "c"):
+            await store.put(_run(run_id))
+        table.batches.clear()
+
+        for run_id in ("a", "b", "c"):
+            await store.put(_run(run_id, step=1))
+        assert table.batches == [["a", "b", "c"]]
+
+        await store.put(_run("a", step=2))
+        await asyncio.sleep(0.05)
+        assert table.batches == [["a", "b", "c"], ["a"]]
+        await store.close()
+
+    asyncio.run(scenario())
+
+def test_least_recently_used_runs_are_evicted_and_reloaded(monkeypatch):
+    table = _table(monkeypatch)
+
+    async def scenario():
+        store = RunStore(max_hot_runs=2, flush_interval=60)
+        for run_id in ("a", "b"):
+            await store.put(_run(run_id))
+        await store.get("a")
+        await store.put(_run("c"))
+
+        assert list(store._hot) == ["a", "c"]
+        reloaded = await store.get("b")
+        assert table.reads == 1
+        assert reloaded["flow_id"] == "flow"
+        assert reloaded["created_at"] == "2024-01-01T00:00:00"
+        assert list(store._hot) == ["c", "b"]
+        assert await store.get("missing") is None
+        await store.close()
+
+    asyncio.run(scenario())
+
+def test_failed_flush_keeps_runs_buffered_and_newer_writes_win(monkeypatch):
+    table = _table(monkeypatch)
+
+    async def scenario():
+        store = RunStore(flush_interval=60)
+        table.fail = True
+        await store.put(_run("a"))
+        assert store._pending["a"]["status"] == "running"
+
+        await store.put(_run("a", status="completed"))
+        table.fail = False
+        await store.flush()
+        assert table.rows["a"]["status"] == "completed"
+        assert not store._pending
+        await store.close()
+
+    asyncio.run(scenario())
+
+def test_cursor_round_trips_and_rejects_garbage():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = run_store_module.encode_cursor(created_at, "run-7")
+
+    assert run_store_module.decode_cursor(cursor) == (created_at, "run-7")
+    assert run_store_module.decode_cursor(run_store_module.encode_cursor(created_at.isoformat(), "run-7")) == (created_at, "run-7")
+    for bad in ("not-a-cursor", "", run_store_module.encode_cursor("yesterday", "run-7"), "e30="):
+        with pytest.raises(ValueError):
+            run_store_module.decode_cursor(bad)
+
+def test_listing_pages_with_keyset_cursors(monkeypatch):
+    table = _table(monkeypatch)
+    rows = [
+        {"run_id": f"run-{i}", "workflow_id": "flow", "status": "completed",
+         "created_at": datetime(2024, 1, 1, 0, 0, i), "updated_at": None}
+        for i in range(5)
+    ]
+    queries = []
+
+    async def list_runs(flow_id, limit, status, created_after, created_before, before):
+        queries.append(before)
+        newest_first = sorted(rows, key=lambda row: (row["created_at"], row["run_id"]), reverse=True)
+        return [row for row in newest_first if before is None or (row["created_at"], row["run_id"]) < before][:limit]
+    monkeypatch.setattr(run_store_module, "list_runs_async", list_runs)
+
+    async def scenario():
+        store = RunStore(flush_interval=60)
+        await store.put(_run("buffered"))
+        await store.put(_run("buffered", step=1))
+        pages, cursor = [], None
+        while True:
+            page, cursor = await store.list(flow_id="flow", limit=2, cursor=cursor)
+            pages.append([run["run_id"] for run in page])
+            if cursor is None:
+                return store, pages
+
+    store, pages = asyncio.run(scenario())
+
+    assert pages == [["run-4", "run-3"], ["run-2", "run-1"], ["run-0"]]
+    assert queries[1] == (datetime(2024, 1, 1, 0, 0, 3), "run-3")
+    # Buffered writes are flushed before listing so the page includes them
+    assert table.rows["buffered"]["context"] == '{"step": 1}'
@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "ai-service"))
+
+from template_retrieval import TEMPLATE_DESCRIPTION_LIMIT, pack_templates, summarize_template, template_text
+
+def _template(name, description="Sends a message", nodes=None):
+    return {
+        "name": name,
+        "description": description,
+        "trigger": "webhook",
+        "nodes": nodes if nodes is not None else [{"type": "http", "parameters": {"url": "x" * 500}}, "slack"],
+        "integrations": [],
+        "connections": {"http": ["slack"]}
+    }
+
+def test_summary_keeps_only_generation_hints():
+    summary = summarize_template(_template("notify", description="word " * 200))
+
+    assert summary["nodes"] == ["http", "slack"]
+    assert set(summary) == {"name", "description", "trigger", "nodes"}
+    assert summary["description"].endswith("...")
+    assert len(summary["description"]) <= TEMPLATE_DESCRIPTION_LIMIT + 3
+
+def test_pack_keeps_relevance_order_within_budget():
+    templates = [_template("best"), _template("huge", description="y" * 5000, nodes=["n"] * 400), _template("next")]
+    size = len(json.dumps(summarize_template(templates[0]), separators=(",", ":")))
+
+    packed = pack_templates(templates, budget=2 * size + 1)
+
+    # The oversized template is skipped without crowding out smaller, less relevant ones
+    assert [json.loads(line)["name"] for line in packed.splitlines()] == ["best", "next"]
+    assert [json.loads(line)["name"] for line in pack_templates(templates, budget=size).splitlines()] == ["best"]
+    assert pack_templates([]) == "None"
+    assert pack_templates(templates, budget=10) == "None"
+
+def test_template_text_tolerates_missing_fields():
+    assert template_text("Notify", "Post to Slack") == "Notify: Post to Slack"
+    assert template_text(None, None) == ": "
@@ -0,0 +1,331 @@
+import asyncio
+import importlib.util
+import json
+import os
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+_SERVICE_PATH = os.path.join(os.path.dirname(__file__), "..", "backend", "services", "workflow-engine", "src", "main.py")
+_spec = importlib.util.spec_from_file_location("workflow_engine_service", _SERVICE_PATH)
+service = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(service)
+
+def _workflow(steps):
+    now = datetime.utcnow()
+    workflow = service.Workflow(
+        id=str(uuid.uuid4()),
+        name="workflow",
+        description="",
+        steps=[
+            service.WorkflowStep(
+                id=step_id,
+                name=step_id,
+                description="",
+                agent_type=agent_type,
+                tools=[],
+                dependencies=dependencies
+            )
+            for step_id, dependencies, agent_type in steps
+        ],
+        created_at=now,
+        updated_at=now
+    )
+    service.workflows[workflow.id] = workflow
+    return workflow
+
+def _fake_agent(events, delay=0.01, fail=()):
+    """Stand in for the agent HTTP call, recording when each step starts and ends"""
+    async def execute_step(execution, step):
+        events.append(("start", step.id))
+        step.status = service.StepStatus.RUNNING
+        await asyncio.sleep(delay)
+        events.append(("end", step.id))
+        step.status = service.StepStatus.FAILED if step.id in fail else service.StepStatus.COMPLETED
+        return step.id not in fail
+    return execute_step
+
+async def _run(workflow, engine):
+    execution_id = await engine.execute_workflow(workflow.id)
+    await engine.running_executions[execution_id]
+    return service.executions[execution_id]
+
+def _max_in_flight(events):
+    in_flight = peak = 0
+    for kind, _ in events:
+        in_flight += 1 if kind == "start" else -1
+        peak = max(peak, in_flight)
+    return peak
+
+def test_independent_steps_run_concurrently_and_join_waits_for_both():
+    # a -> {b, c} -> d
+    workflow = _workflow([
+        ("a", [], "data_agent"),
+        ("b", ["a"], "data_agent"),
+        ("c", ["a"], "web_agent"),
+        ("d", ["b", "c"], "report_agent")
+    ])
+    events = []
+    engine = service.WorkflowEngine()
+    engine._execute_step = _fake_agent(events)
+
+    execution = asyncio.run(_run(workflow, engine))
+
+    assert execution.status == service.WorkflowStatus.COMPLETED
+    assert execution.progress == 100.0
+    assert events[0] == ("start", "a") and events[1] == ("end", "a")
+    assert {events[2], events[3]} == {("start", "b"), ("start", "c")}
+    assert events.index(("start", "d")) > max(events.index(("end", "b")), events.index(("end", "c")))
+
+def test_scheduler_respects_step_and_agent_limits(monkeypatch):
+    workflow = _workflow([(f"s{i}", [], "data_agent" if i < 4 else "web_agent") for i in range(8)])
+    monkeypatch.setattr(service, "MAX_CONCURRENT_STEPS", 3)
+    monkeypatch.setitem(service.AGENT_CONCURRENCY_LIMITS, "data_agent", 1)
+    events = []
+    engine = service.WorkflowEngine()
+    # Record data_agent overlap behind the engine's semaphore
+    data_events = []
+    fake = _fake_agent(events)
+    async def execute_step(execution, step):
+        if step.agent_type == "data_agent":
+            data_events.append(("start", step.id))
+        result = await fake(execution, step)
+        if step.agent_type == "data_agent":
+            data_events.append(("end", step.id))
+        return result
+    engine._execute_step = execute_step
+
+    execution = asyncio.run(_run(workflow, engine))
+
+    assert execution.status == service.WorkflowStatus.COMPLETED
+    assert _max_in_flight(events) == 3
+    assert _max_in_flight(data_events) == 1
+
+def test_failed_step_stops_the_execution_and_skips_dependents():
+    workflow = _workflow([
+        ("a", [], "data_agent"),
+        ("b", ["a"], "data_agent"),
+        ("c", ["b"], "data_agent")
+    ])
+    events = []
+    engine = service.WorkflowEngine()
+    engine._execute_step = _fake_agent(events, fail={"b"})
+
+    execution = asyncio.run(_run(workflow, engine))
+
+    assert execution.status == service.WorkflowStatus.FAILED
+    assert ("start", "c") not in events
+    assert not engine.running_executions
+
+def test_execution_plan_counts_dependencies_and_indexes_dependents():
+    workflow = _workflow([
+        ("a", [], "data_agent"),
+        ("b", ["a"], "data_agent"),
+        ("c", ["a", "b"], "data_agent")
+    ])
+    engine = service.WorkflowEngine()
+
+    plan = engine.get_execution_plan(workflow)
+
+    assert plan.in_degree == {"a": 0, "b": 1, "c": 2}
+    assert plan.dependents == {"a": ["b", "c"], "b": ["c"]}
+    assert engine.get_execution_plan(workflow) is plan
+    workflow.updated_at = datetime.utcnow().replace(year=workflow.updated_at.year + 1)
+    assert engine.get_execution_plan(workflow) is not plan
+
+def test_ready_steps_start_in_workflow_order_as_dependencies_finish(monkeypatch):
+    # Serial scheduling makes the ready-set order observable
+    monkeypatch.setattr(service, "MAX_CONCURRENT_STEPS", 1)
+    workflow = _workflow([
+        ("d", ["a", "b"], "data_agent"),
+        ("a", [], "data_agent"),
+        ("b", [], "data_agent"),
+        ("c", ["a"], "data_agent")
+    ])
+    events = []
+    engine = service.WorkflowEngine()
+    engine._execute_step = _fake_agent(events, delay=0)
+
+    execution = asyncio.run(_run(workflow, engine))
+
+    assert execution.status == service.WorkflowStatus.COMPLETED
+    assert [step_id for kind, step_id in events if kind == "start"] == ["a", "b", "c", "d"]
+
+def test_completed_steps_count_as_satisfied_dependencies():
+    workflow = _workflow([
+        ("a", [], "data_agent"),
+        ("b", ["a"], "data_agent")
+    ])
+    workflow.steps[0].status = service.StepStatus.COMPLETED
+    events = []
+    engine = service.WorkflowEngine()
+    engine._execute_step = _fake_agent(events, delay=0)
+
+    execution = asyncio.run(_run(workflow, engine))
+
+    assert execution.status == service.WorkflowStatus.COMPLETED
+    assert events == [("start", "b"), ("end", "b")]
+
+def test_unsatisfiable_dependencies_fail_instead_of_hanging():
+    workflow = _workflow([
+        ("a", [], "data_agent"),
+        ("b", ["missing"], "data_agent"),
+        ("c", ["d"], "data_agent"),
+        ("d", ["c"], "data_agent")
+    ])
+    events = []
+    engine = service.WorkflowEngine()
+    engine._execute_step = _fake_agent(events, delay=0)
+
+    execution = asyncio.run(asyncio.wait_for(_run(workflow, engine), timeout=2))
+
+    assert execution.status == service.WorkflowStatus.FAILED
+    assert "stuck" in execution.error_message
+    assert events == [("start", "a"), ("end", "a")]
+
+def test_step_dispatches_share_one_pooled_session(monkeypatch):
+    from aiohttp import web
+
+    peers = set()
+    async def execute(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        body = await request.json()
+        return web.json_response({"output": {"step": body["step_id"]}, "context_updates": {body["step_id"]: True}})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/execute", execute)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setitem(service.AGENT_ENDPOINTS, "data_agent", f"http://127.0.0.1:{port}")
+
+        engine = service.WorkflowEngine()
+        try:
+            workflow = _workflow([("a", [], "data_agent"), ("b", ["a"], "data_agent"), ("c", ["b"], "data_agent")])
+            session = engine.get_session()
+            execution = await _run(workflow, engine)
+            assert engine.get_session() is session
+            return execution
+        finally:
+            await engine.close()
+            await runner.cleanup()
+
+    execution = asyncio.run(scenario())
+
+    assert execution.status == service.WorkflowStatus.COMPLETED
+    assert execution.context == {"a": True, "b": True, "c": True}
+    # Sequential steps reuse the same keep-alive connection
+    assert len(peers) == 1
+
+def _indexed_executions(monkeypatch, count):
+    monkeypatch.setattr(service, "executions", {})
+    monkeypatch.setattr(service, "execution_index", service.ExecutionIndex())
+    started = datetime(2024, 1, 1)
+    statuses = [service.WorkflowStatus.COMPLETED, service.WorkflowStatus.FAILED, service.WorkflowStatus.COMPLETED]
+    for i in range(count):
+        for workflow_id in ("wf", "other"):
+            execution = service.WorkflowExecution(
+                id=f"{workflow_id}-{i:02d}",
+                workflow_id=workflow_id,
+                status=service.WorkflowStatus.RUNNING,
+                # Pairs of executions share a start time; the id breaks the tie
+                started_at=started.replace(minute=i // 2)
+            )
+            service.executions[execution.id] = execution
+            service.execution_index.add(execution)
+            service.execution_index.set_status(execution, statuses[i % 3])
+
+def _all_pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/workflows/wf/executions", params=query)
+        assert response.status_code == 200
+        body = response.json()
+        pages.append([execution["id"] for execution in body["executions"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+def test_execution_pages_follow_keyset_cursors(monkeypatch):
+    _indexed_executions(monkeypatch, 7)
+    client = TestClient(service.app)
+
+    pages = _all_pages(client, limit=3)
+    assert pages == [["wf-06", "wf-05", "wf-04"], ["wf-03", "wf-02", "wf-01"], ["wf-00"]]
+
+    # The failed group is smaller than the range; the completed group is not
+    assert sum(_all_pages(client, limit=1, status="failed"), []) == ["wf-04", "wf-01"]
+    assert sum(_all_pages(client, limit=2, status="completed"), []) == ["wf-06", "wf-05", "wf-03", "wf-02", "wf-00"]
+    assert sum(_all_pages(client, limit=2, started_after="2024-01-01T00:01:00",
+                          started_before="2024-01-01T00:03:00+00:00"), []) == ["wf-05", "wf-04", "wf-03", "wf-02"]
+    assert service.execution_index.status_counts() == {"completed": 10, "failed": 4}
+
+def test_invalid_execution_cursor_is_a_bad_request(monkeypatch):
+    _indexed_executions(monkeypatch, 1)
+    client = TestClient(service.app)
+
+    for cursor in ("garbage", "W10=", service.encode_cursor((datetime(2024, 1, 1), "x"))[:-4]):
+        response = client.get("/workflows/wf/executions", params={"cursor": cursor})
+        assert response.status_code == 400
+
+def test_execution_log_spills_to_disk_and_pages_back(monkeypatch, tmp_path):
+    monkeypatch.setattr(service, "EXECUTION_LOG_DIR", str(tmp_path))
+
+    async def scenario():
+        log = service.ExecutionLog("exec-1", capacity=5, spill_batch_size=3)
+        for i in range(20):
+            log.append(f"step-{i}", "step_completed", f"message {i}")
+        # Entries handed to the writer stay readable until they reach the file
+        assert [entry["seq"] for entry in log.recent()][-5:] == [15, 16, 17, 18, 19]
+        await asyncio.gather(*list(log._writers))
+
+        pages, before = [], None
+        while True:
+            page = await log.read(before, limit=4)
+            if not page:
+                return log, pages
+            pages.append([entry["seq"] for entry in page])
+            before = page[0]["seq"]
+
+    log, pages = asyncio.run(scenario())
+
+    assert pages == [[16, 17, 18, 19], [12, 13, 14, 15], [8, 9, 10, 11], [4, 5, 6, 7], [0, 1, 2, 3]]
+    lines = (tmp_path / "exec-1.jsonl").read_text().splitlines()
+    assert [json.loads(line)["seq"] for line in lines] == list(range(15))
+    assert [entry["seq"] for entry in log.recent()] == list(range(15, 20))
+
+def test_old_execution_logs_are_pruned(monkeypatch, tmp_path):
+    monkeypatch.setattr(service, "EXECUTION_LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(service, "execution_logs", {})
+
+    async def scenario():
+        log = service.ExecutionLog("exec-2", capacity=2, spill_batch_size=2)
+        service.execution_logs["exec-2"] = log
+        for i in range(6):
+            log.append("step", "step_completed", f"message {i}")
+        await asyncio.gather(*list(log._writers))
+        return log
+
+    log = asyncio.run(scenario())
+    (tmp_path / "keep.txt").write_text("not a log")
+    path = tmp_path / "exec-2.jsonl"
+    modified = path.stat().st_mtime
+
+    assert service.prune_execution_logs(now=modified + service.EXECUTION_LOG_RETENTION - 1) == 0
+    assert service.prune_execution_logs(now=modified + service.EXECUTION_LOG_RETENTION + 1) == 1
+    assert not path.exists() and (tmp_path / "keep.txt").exists()
+    assert [entry["seq"] for entry in asyncio.run(log.read(limit=10))] == [4, 5]
+
+    # Spilling after a prune starts a new file with a fresh index
+    async def more():
+        for i in range(2):
+            log.append("step", "step_completed", f"later {i}")
+        await asyncio.gather(*list(log._writers))
+        return await log.read(limit=10)
+
+    assert [entry["seq"] for entry in asyncio.run(more())] == [4, 5, 6, 7]
@@ -1,19 +1,27 @@
 from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
 from pydantic import BaseModel, Field
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 import asyncio
 import httpx
+import os
 import uuid
 import json
 from datetime import datetime
 
 # Import shared modules
 from shared.models.core import WorkflowGraph, ContextObject, OrchestraAgent, AgentConfig, Tool
-from shared.models.flow import Flow, Node, AgentNode, FlowBuilder, FlowStatus
-from shared.utils.flow_utils import flow_to_dict, dict_to_flow, create_flow_from_workflow_graph
-from shared.db.postgres import save_workflow, get_workflow
-from shared.db.redis_cache import get_agent_state, set_agent_state
+from shared.models.flow import Flow, Node, AgentNode, FlowBuilder, FlowStatus, RunState, dump_branches
+from shared.models.context import FlowContext, context_delta
+from shared.models.history import HistoryEvent, RUN_HISTORY_SPILL_BATCH
+from shared.utils.flow_utils import flow_to_dict, dict_to_flow, create_flow_from_workflow_graph, save_flow_async
+from shared.db.postgres import save_workflow, get_workflow, save_run_events_async, list_run_events_async
+from shared.db.redis_cache import (
+    get_agent_state, set_agent_state,
+    save_checkpoint_async, append_checkpoint_async, get_checkpoint_async, delete_checkpoint_async
+)
 from shared.utils.logging import get_logger
+from workflow_engine.run_store import run_store
+from workflow_engine.run_events import run_events
 
 logger = get_logger(__name__)
 
@@ -34,9 +42,22 @@ class FlowRunStatus(BaseModel):
     updated_at: str
     error: Optional[str] = None
 
-# In-memory store for flows and runs (replace with DB in production)
+# In-memory store for flows (replace with DB in production); runs live in run_store
 flows = {}
-runs = {}
+
+# Flows whose definition has been written to the workflows table
+persisted_flows = set()
+
+# Run state of executions in progress in this process, keyed by run_id
+active_runs: Dict[str, RunState] = {}
+
+# Steps checkpointed as context deltas before the checkpoint is rewritten in full
+CHECKPOINT_SNAPSHOT_INTERVAL = int(os.getenv("CHECKPOINT_SNAPSHOT_INTERVAL", "50"))
+
+# Context of each active run's last checkpoint (a copy, so nodes that write to
+# their context in place still show up in the next delta) and the deltas
+# written since its snapshot
+checkpoint_bases: Dict[str, Tuple[FlowContext, int]] = {}
 
 # Agent registry (replace with DB in production)
 agent_registry = {}
@@ -90,6 +111,11 @@ async def run_flow(flow_id: str, initial_context: Dict[str, Any]) -> str:
     if not flow:
         raise ValueError(f"Flow {flow_id} not found")
     
+    # Runs reference their flow in the database, so store the definition once
+    if flow_id not in persisted_flows:
+        await save_flow_async(flow_id, flow)
+        persisted_flows.add(flow_id)
+    
     # Create a new run ID
     run_id = f"run_{uuid.uuid4()}"
     
@@ -97,7 +123,7 @@ async def run_flow(flow_id: str, initial_context: Dict[str, Any]) -> str:
     run_status = FlowRunStatus(
         run_id=run_id,
         flow_id=flow_id,
-        status=flow.status.value,
+        status=FlowStatus.PENDING.value,
         current_node_id=flow.start_node.node_id if flow.start_node else None,
         context=initial_context,
         created_at=datetime.now().isoformat(),
@@ -105,75 +131,217 @@ async def run_flow(flow_id: str, initial_context: Dict[str, Any]) -> str:
     )
     
     # Store initial run status
-    runs[run_id] = run_status.dict()
+    await run_store.put(run_status.dict())
     
     return run_id
 
+# Function to write history events evicted from a run's ring buffer
+async def spill_run_history(state: RunState, force: bool = False):
+    """Write evicted history events to storage once a batch is full, or right away with force."""
+    if not state.history.pending_spill or (not force and state.history.pending_spill < RUN_HISTORY_SPILL_BATCH):
+        return
+    events = state.history.take_spilled()
+    try:
+        await save_run_events_async(state.run_id, [{
+            "seq": event.seq,
+            "timestamp_ns": event.timestamp_ns,
+            "status": event.status,
+            "node_id": event.node_id,
+            "action": event.action,
+            "error": event.error
+        } for event in events])
+    except Exception as e:
+        # Events stay in memory and in the run record until a later write succeeds
+        logger.warning(f"Failed to spill history of run {state.run_id}: {str(e)}")
+        state.history.restore_spilled(events)
+
+# Function to write a run's progress to its run record
+async def record_run_progress(state: RunState):
+    """Update the run record with the run's status, cursor and recent history.
+    
+    The context is written when the execution stops; until then readers see
+    the run's progress, and the checkpoint holds the context to resume with.
+    """
+    run_status = await run_store.get(state.run_id)
+    if run_status:
+        run_status["status"] = state.status.value
+        run_status["current_node_id"] = state.current_node.node_id if state.current_node else None
+        run_status["history"] = state.history.to_list()
+        run_status["updated_at"] = datetime.now().isoformat()
+        await run_store.put(run_status)
+
+# Function to checkpoint a run after each step
+async def checkpoint_run(state: RunState, context: FlowContext):
+    """Save the node a run continues from and its context at that point, and
+    record the step in the run record.
+    
+    Steps append only what they changed in the context to the checkpoint; it
+    is rewritten in full on a run's first step, every
+    CHECKPOINT_SNAPSHOT_INTERVAL steps and when a pause leaves fan-out
+    branches to continue.
+    """
+    await spill_run_history(state)
+    await record_run_progress(state)
+    cursor = {
+        "node_id": state.current_node.node_id if state.current_node else None,
+        "action": state.resume_action,
+        "branches": dump_branches(state.branches, context) if state.branches else None,
+        "updated_at": datetime.now().isoformat()
+    }
+    base = checkpoint_bases.get(state.run_id)
+    try:
+        if base is None or state.branches or base[1] >= CHECKPOINT_SNAPSHOT_INTERVAL:
+            await save_checkpoint_async(state.run_id, {**cursor, "context": context.to_dict()})
+            checkpoint_bases[state.run_id] = (context.copy(), 0)
+        else:
+            await append_checkpoint_async(state.run_id, {**cursor, "context": context_delta(context, base[0])})
+            checkpoint_bases[state.run_id] = (context.copy(), base[1] + 1)
+    except Exception as e:
+        # A missing checkpoint only costs re-running nodes on resume; the next
+        # one is written in full since this step's changes may be lost
+        logger.warning(f"Failed to checkpoint run {state.run_id}: {str(e)}")
+        checkpoint_bases.pop(state.run_id, None)
+
+# Function to publish run progress to event stream subscribers
+def publish_run_event(state: RunState, event_type: str, details: Dict[str, Any]):
+    """Publish a Flow.exec progress event for the run's subscribers."""
+    run_events.publish(state.run_id, {
+        "type": event_type,
+        "run_id": state.run_id,
+        **details
+    })
+
 # Function to execute a flow in the background
-async def execute_flow_background(flow_id: str, run_id: str, initial_context: Dict[str, Any]):
-    """Execute a flow in the background."""
+async def execute_flow_background(flow_id: str,
+                                  run_id: str,
+                                  initial_context: Dict[str, Any],
+                                  resume_from: Optional[str] = None,
+                                  history: Optional[List[Dict[str, Any]]] = None,
+                                  resume_action: Optional[str] = None,
+                                  resume_branches: Optional[List[Dict[str, Any]]] = None):
+    """Execute a flow in the background, optionally resuming at a checkpointed node."""
+    state = RunState(run_id=run_id, on_event=publish_run_event, spill_history=True)
+    state.history.load(history or [])
+    if resume_from is not None:
+        state.record("run_resumed", "resumed", node_id=resume_from, action=resume_action)
+    active_runs[run_id] = state
     try:
         flow = flows.get(flow_id)
         if not flow:
             raise ValueError(f"Flow {flow_id} not found")
         
-        # Execute flow
-        result = await flow.exec(initial_context)
+        run_status = await run_store.get(run_id)
+        if run_status:
+            run_status["status"] = FlowStatus.RUNNING.value
+            run_status["current_node_id"] = resume_from or flow.start_node.node_id
+            run_status["updated_at"] = datetime.now().isoformat()
+            await run_store.put(run_status)
+        
+        # Execute flow; the flow itself is shared, all run progress goes to state
+        result = await flow.exec(initial_context, state, resume_from=resume_from,
+                                 checkpoint=checkpoint_run, resume_action=resume_action,
+                                 resume_branches=resume_branches)
         
-        # Update run status
-        run_status = runs.get(run_id)
+        # Update run status; the record keeps only history not yet in storage
+        await spill_run_history(state, force=True)
+        run_status = await run_store.get(run_id)
         if run_status:
-            run_status["status"] = flow.status.value
-            run_status["current_node_id"] = flow.current_node.node_id if flow.current_node else None
-            run_status["history"] = flow.history
+            run_status["status"] = state.status.value
+            run_status["current_node_id"] = state.current_node.node_id if state.current_node else None
+            run_status["history"] = state.history.to_list()
             run_status["context"] = result
             run_status["updated_at"] = datetime.now().isoformat()
-            run_status["error"] = flow.error
-            runs[run_id] = run_status
+            run_status["error"] = state.error
+            await run_store.put(run_status)
+        
+        # Paused runs keep their checkpoint to resume from
+        if state.status != FlowStatus.PAUSED:
+            try:
+                await delete_checkpoint_async(run_id)
+            except Exception as e:
+                logger.warning(f"Failed to delete checkpoint for run {run_id}: {str(e)}")
     
     except Exception as e:
         logger.error(f"Flow execution error: {str(e)}")
         # Update run status with error
-        run_status = runs.get(run_id)
+        await spill_run_history(state, force=True)
+        run_status = await run_store.get(run_id)
         if run_status:
             run_status["status"] = FlowStatus.FAILED.value
+            run_status["history"] = state.history.to_list()
             run_status["error"] = str(e)
             run_status["updated_at"] = datetime.now().isoformat()
-            runs[run_id] = run_status
+            await run_store.put(run_status)
+    
+    finally:
+        if active_runs.get(run_id) is state:
+            del active_runs[run_id]
+            checkpoint_bases.pop(run_id, None)
 
 # Function to get run status
-def get_run_status(run_id: str) -> Optional[Dict[str, Any]]:
+async def get_run_status(run_id: str) -> Optional[Dict[str, Any]]:
     """Get the status of a flow run."""
-    return runs.get(run_id)
+    return await run_store.get(run_id)
+
+# Function to page through a run's history
+async def get_run_history(run_id: str, before: Optional[int] = None, limit: int = 100) -> Optional[Dict[str, Any]]:
+    """Get up to `limit` history events before sequence number `before`, oldest first.
+    
+    Recent events come from memory; older ones are loaded from storage only
+    when a page reaches back to them.
+    """
+    state = active_runs.get(run_id)
+    run_status = await run_store.get(run_id)
+    if not run_status:
+        return None
+    recent = state.history.to_list() if state else run_status.get("history", [])
+    
+    if before is not None:
+        recent = [entry for entry in recent if entry.get("seq", 0) < before]
+    events = recent[-limit:]
+    if len(events) < limit:
+        oldest = events[0]["seq"] if events and "seq" in events[0] else before
+        stored = await list_run_events_async(run_id, oldest, limit - len(events))
+        events = [HistoryEvent.from_dict(row, row["seq"]).to_dict() for row in stored] + events
+    
+    first_seq = events[0].get("seq", 0) if events else 0
+    return {
+        "run_id": run_id,
+        "events": events,
+        "next_before": first_seq if first_seq > 0 else None
+    }
 
 # Function to pause a flow run
 async def pause_flow_run(flow_id: str, run_id: str) -> bool:
     """Pause a flow run."""
-    run_status = runs.get(run_id)
+    run_status = await run_store.get(run_id)
     if not run_status:
         return False
     
     if run_status["flow_id"] != flow_id:
         return False
     
-    flow = flows.get(flow_id)
-    if not flow:
+    # Only runs executing in this process can be paused
+    state = active_runs.get(run_id)
+    if not state:
         return False
     
-    # Pause flow
-    flow.pause()
+    # Pause run; the executing flow stops before its next node
+    state.pause()
+    if state.status != FlowStatus.PAUSED:
+        return False
     
     # Update run status
-    run_status["status"] = flow.status.value
+    run_status["status"] = state.status.value
     run_status["updated_at"] = datetime.now().isoformat()
-    runs[run_id] = run_status
+    await run_store.put(run_status)
     
     return True
 
 # Function to resume a flow run
 async def resume_flow_run(flow_id: str, run_id: str) -> bool:
     """Resume a paused flow run."""
-    run_status = runs.get(run_id)
+    run_status = await run_store.get(run_id)
     if not run_status:
         return False
     
@@ -184,20 +352,54 @@ async def resume_flow_run(flow_id: str, run_id: str) -> bool:
     if not flow:
         return False
     
-    # Resume flow
-    flow.resume()
+    if run_status["status"] != FlowStatus.PAUSED.value:
+        return False
+    
+    # The paused execution is still finishing its current nodes; resuming now
+    # would run them twice and let the old execution overwrite the new one
+    if run_id in active_runs:
+        return False
+    
+    # Continue from the last checkpoint; the run record holds the same cursor
+    # and context as of the pause if the checkpoint is unavailable
+    checkpoint = None
+    try:
+        checkpoint = await get_checkpoint_async(run_id)
+    except Exception as e:
+        logger.warning(f"Failed to load checkpoint for run {run_id}: {str(e)}")
+    if checkpoint:
+        resume_from = checkpoint["node_id"]
+        resume_action = checkpoint.get("action")
+        resume_branches = checkpoint.get("branches")
+        context = checkpoint["context"]
+    else:
+        # Without the checkpoint a fan-out interrupted by the pause re-runs its source node
+        resume_from = run_status.get("current_node_id")
+        resume_action = None
+        resume_branches = None
+        context = run_status["context"]
+    
+    # Runs that finish while paused are marked completed by their execution,
+    # so a paused run without a cursor is inconsistent rather than done
+    if not resume_from:
+        logger.warning(f"Paused run {run_id} has no node to resume from")
+        return False
     
     # Update run status
-    run_status["status"] = flow.status.value
+    run_status["status"] = FlowStatus.RUNNING.value
     run_status["updated_at"] = datetime.now().isoformat()
-    runs[run_id] = run_status
+    await run_store.put(run_status)
     
-    # Resume execution in background
+    # Resume execution in background at the paused node
     asyncio.create_task(
         execute_flow_background(
             flow_id=flow_id,
             run_id=run_id,
-            initial_context=run_status["context"]
+            initial_context=context,
+            resume_from=resume_from,
+            history=run_status.get("history", []),
+            resume_action=resume_action,
+            resume_branches=resume_branches
         )
     )
     
@@ -209,26 +411,33 @@ def list_flows() -> List[Dict[str, Any]]:
     return [{
         "flow_id": flow_id,
         "name": getattr(flow, 'name', flow_id),
-        "status": flow.status.value,
         "created_at": flow.created_at
     } for flow_id, flow in flows.items()]
 
-# Function to list all runs
-def list_runs(flow_id: Optional[str] = None) -> List[Dict[str, Any]]:
-    """List all flow runs, optionally filtered by flow_id."""
-    if flow_id:
-        return [{
-            "run_id": run_id,
+# Function to list runs
+async def list_runs(flow_id: Optional[str] = None,
+                    status: Optional[str] = None,
+                    created_after: Optional[datetime] = None,
+                    created_before: Optional[datetime] = None,
+                    cursor: Optional[str] = None,
+                    limit: int = 100) -> Dict[str, Any]:
+    """List one page of flow runs, newest first, with optional filters."""
+    runs, next_cursor = await run_store.list(
+        flow_id, limit, status=status, created_after=created_after,
+        created_before=created_before, cursor=cursor
+    )
+    return {
+        "runs": [{
+            "run_id": run["run_id"],
             "flow_id": run["flow_id"],
             "status": run["status"],
             "created_at": run["created_at"],
             "updated_at": run["updated_at"]
-        } for run_id, run in runs.items() if run["flow_id"] == flow_id]
-    
-    return [{
-        "run_id": run_id,
-        "flow_id": run["flow_id"],
-        "status": run["status"],
-        "created_at": run["created_at"],
-        "updated_at": run["updated_at"]
-    } for run_id, run in runs.items()]
\ No newline at end of file
+        } for run in runs],
+        "next_cursor": next_cursor
+    }
+
+async def get_run_stats(flow_id: Optional[str] = None) -> Dict[str, Any]:
+    """Run counts per status, optionally for one flow."""
+    status_counts = await run_store.status_counts(flow_id)
+    return {"total_runs": sum(status_counts.values()), "run_status_counts": status_counts}
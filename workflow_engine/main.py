@@ -1,5 +1,6 @@
 # Add these imports to the existing imports
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, Query, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field
 from typing import Any, Dict, List, Optional, Union
@@ -11,7 +12,7 @@ from datetime import datetime
 import yaml
 
 # Import shared modules
-from shared.models.core import WorkflowGraph, ContextObject, OrchestraAgent
+from shared.models.core import WorkflowGraph, ContextObject, OrchestraAgent, NodeDefinition
 from shared.db.postgres import save_workflow, get_workflow
 from shared.db.redis_cache import get_agent_state, set_agent_state
 from shared.utils.logging import get_logger
@@ -81,9 +82,19 @@ class WorkflowRunStatus(BaseModel):
 # Import flow executor
 from workflow_engine.flow_executor import (
     run_flow, execute_flow_background, get_run_status,
-    pause_flow_run, resume_flow_run, list_flows, list_runs,
+    pause_flow_run, resume_flow_run, list_flows, list_runs, get_run_stats, get_run_history,
     convert_workflow_to_flow, register_flow, FlowRunStatus
 )
+from workflow_engine.run_store import run_store
+from workflow_engine.run_events import run_events, format_sse, TERMINAL_EVENTS, RESYNC_EVENT
+from shared.db.postgres import close_pool
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write out buffered run updates before the pool goes away
+    await run_store.close()
+    await run_events.close()
+    close_pool()
 
 # Update the run_workflow function
 @app.post("/v1/workflows/{workflow_id}/run")
@@ -142,19 +153,110 @@ async def get_flows(api_key: str = Depends(get_api_key)):
     """List all registered flows"""
     return list_flows()
 
+@app.get("/v1/flows/stats")
+async def get_flow_run_stats(flow_id: Optional[str] = None, api_key: str = Depends(get_api_key)):
+    """Run counts per status, across all flows or for one flow"""
+    return await get_run_stats(flow_id)
+
 @app.get("/v1/flows/{flow_id}/runs")
-async def get_flow_runs(flow_id: str, api_key: str = Depends(get_api_key)):
-    """List all runs for a specific flow"""
-    return list_runs(flow_id)
+async def get_flow_runs(flow_id: str,
+                        run_status: Optional[str] = Query(None, alias="status"),
+                        created_after: Optional[datetime] = None,
+                        created_before: Optional[datetime] = None,
+                        cursor: Optional[str] = None,
+                        limit: int = Query(50, ge=1, le=500),
+                        api_key: str = Depends(get_api_key)):
+    """List runs for a specific flow, newest first, one page at a time
+    
+    Pass the returned next_cursor as `cursor` to get the following page.
+    """
+    try:
+        return await list_runs(flow_id, status=run_status, created_after=created_after,
+                               created_before=created_before, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/v1/flows/runs/{run_id}")
 async def get_flow_run_status(run_id: str, api_key: str = Depends(get_api_key)):
     """Get the status of a specific flow run"""
-    status = get_run_status(run_id)
+    status = await get_run_status(run_id)
     if not status:
         raise HTTPException(status_code=404, detail="Run not found")
     return status
 
+@app.get("/v1/flows/runs/{run_id}/history")
+async def get_flow_run_history(run_id: str,
+                               before: Optional[int] = Query(None, ge=0),
+                               limit: int = Query(100, ge=1, le=1000),
+                               api_key: str = Depends(get_api_key)):
+    """Page through a run's history, newest page first
+    
+    Pass the returned next_before as `before` to get the preceding events.
+    """
+    history = await get_run_history(run_id, before=before, limit=limit)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return history
+
+# Seconds between keep-alive comments on idle event streams
+RUN_EVENTS_HEARTBEAT = 15.0
+
+@app.get("/v1/flows/runs/{run_id}/events")
+async def stream_flow_run_events(run_id: str, api_key: str = Depends(get_api_key)):
+    """Stream a run's progress as server-sent events.
+    
+    The stream starts with a compact snapshot of the run (no history or
+    context), followed by run and node events as Flow.exec emits them, and
+    ends once the run completes or fails. When events may have been missed,
+    for example while Redis was unavailable, a `resync` event carries a new
+    snapshot; clients should re-read the run's history then.
+    """
+    if not await get_run_status(run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    async def snapshot() -> Dict[str, Any]:
+        run = await get_run_status(run_id)
+        return {
+            "run_id": run_id,
+            "flow_id": run["flow_id"],
+            "status": run["status"],
+            "current_node_id": run.get("current_node_id"),
+            "updated_at": run["updated_at"],
+            "error": run.get("error")
+        }
+    
+    finished = (FlowStatus.COMPLETED.value, FlowStatus.FAILED.value)
+    
+    async def events():
+        # Subscribe before reading the snapshot so no event falls in between
+        async with run_events.subscribe(run_id) as queue:
+            run = await snapshot()
+            yield format_sse("snapshot", run)
+            if run["status"] in finished:
+                return
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=RUN_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["type"] == RESYNC_EVENT:
+                    run = await snapshot()
+                    yield format_sse(RESYNC_EVENT, run)
+                    if run["status"] in finished:
+                        return
+                    continue
+                yield format_sse(event["type"], event)
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/v1/flows/{flow_id}/pause/{run_id}")
 async def pause_flow(flow_id: str, run_id: str, api_key: str = Depends(get_api_key)):
     """Pause a running flow"""
@@ -168,6 +270,6 @@ async def resume_flow(flow_id: str, run_id: str, api_key: str = Depends(get_api_
     """Resume a paused flow"""
     success = await resume_flow_run(flow_id, run_id)
     if not success:
-        raise HTTPException(status_code=404, detail="Run not found or not in paused state")
+        raise HTTPException(status_code=404, detail="Run not found, not paused or still stopping")
     return {"status": "running", "run_id": run_id}
                             # Evaluate condition (simplified -
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from shared.db.redis_cache import async_redis_client
+from shared.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Publish run events through Redis so subscribers on any replica receive them
+RUN_EVENTS_REDIS = os.getenv("RUN_EVENTS_REDIS", "true").lower() == "true"
+RUN_EVENTS_QUEUE_SIZE = int(os.getenv("RUN_EVENTS_QUEUE_SIZE", "1000"))
+RUN_EVENTS_OUTBOX_SIZE = int(os.getenv("RUN_EVENTS_OUTBOX_SIZE", "10000"))
+# Seconds to deliver locally after a Redis failure before trying Redis again
+RUN_EVENTS_RETRY_INTERVAL = float(os.getenv("RUN_EVENTS_RETRY_INTERVAL", "5"))
+
+# Events after which a run's stream has nothing more to report
+TERMINAL_EVENTS = {"run_completed", "run_failed"}
+
+# Tells a subscriber it may have missed events and should re-read the run
+RESYNC_EVENT = "resync"
+
+def _channel(run_id: str) -> str:
+    return f"run:{run_id}:events"
+
+def format_sse(event_type: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class RunEventBus:
+    """Fan-out of run events to subscribers.
+
+    With a Redis client, events are published on a per-run channel and every
+    subscriber, on any replica, reads them from Redis. Publishing goes through
+    a bounded outbox drained by a background task. When Redis fails, the
+    queued events and those published for the next RUN_EVENTS_RETRY_INTERVAL
+    seconds are delivered directly to the subscribers in this process, and
+    once Redis is back a `resync` event goes to each affected run's channel,
+    since subscribers on other replicas missed those events. Subscribers
+    whose Redis subscription fails keep retrying it and get a `resync` event
+    when it is back.
+    """
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._outbox: Optional[asyncio.Queue] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._retry_at = float("-inf")
+        # Runs with events delivered only in this process since Redis failed
+        self._missed: Set[str] = set()
+
+    def publish(self, run_id: str, event: Dict[str, Any]) -> None:
+        """Publish an event without blocking the caller; events keep their order."""
+        if self.redis_client is None:
+            self._deliver(run_id, event)
+            return
+        if time.monotonic() < self._retry_at:
+            self._deliver_locally(run_id, event)
+            return
+        if self._outbox is None:
+            self._outbox = asyncio.Queue(maxsize=RUN_EVENTS_OUTBOX_SIZE)
+        if self._publisher is None or self._publisher.done():
+            self._publisher = asyncio.create_task(self._publish_loop())
+        try:
+            self._outbox.put_nowait((run_id, event))
+        except asyncio.QueueFull:
+            self._deliver_locally(run_id, event)
+
+    async def _publish_loop(self) -> None:
+        while True:
+            run_id, event = await self._outbox.get()
+            if time.monotonic() < self._retry_at:
+                self._deliver_locally(run_id, event)
+                continue
+            try:
+                for missed_run_id in list(self._missed):
+                    await self.redis_client.publish(_channel(missed_run_id), json.dumps({"type": RESYNC_EVENT, "run_id": missed_run_id}))
+                    self._missed.discard(missed_run_id)
+                await self.redis_client.publish(_channel(run_id), json.dumps(event, default=str))
+            except Exception as e:
+                logger.warning(f"Failed to publish run events to Redis, delivering locally for {RUN_EVENTS_RETRY_INTERVAL}s: {str(e)}")
+                self._retry_at = time.monotonic() + RUN_EVENTS_RETRY_INTERVAL
+                self._deliver_locally(run_id, event)
+                while not self._outbox.empty():
+                    self._deliver_locally(*self._outbox.get_nowait())
+
+    def _deliver_locally(self, run_id: str, event: Dict[str, Any]) -> None:
+        self._missed.add(run_id)
+        self._deliver(run_id, event)
+
+    def _deliver(self, run_id: str, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(run_id, ()):
+            self._enqueue(queue, run_id, event)
+
+    @staticmethod
+    def _enqueue(queue: asyncio.Queue, run_id: str, event: Dict[str, Any]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping run event for a slow subscriber of run {run_id}")
+
+    @asynccontextmanager
+    async def subscribe(self, run_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Receive a run's events on a queue for the duration of the context."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=RUN_EVENTS_QUEUE_SIZE)
+        self._subscribers.setdefault(run_id, set()).add(queue)
+
+        reader = None
+        if self.redis_client is not None:
+            # Subscribe before returning so no event published afterwards is missed
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub()
+                await pubsub.subscribe(_channel(run_id))
+            except Exception as e:
+                logger.warning(f"Failed to subscribe to run events in Redis, retrying: {str(e)}")
+                await self._close_pubsub(pubsub)
+                pubsub = None
+            reader = asyncio.create_task(self._follow(run_id, queue, pubsub))
+
+        try:
+            yield queue
+        finally:
+            if reader is not None:
+                reader.cancel()
+            subscribers = self._subscribers.get(run_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[run_id]
+
+    async def _follow(self, run_id: str, queue: asyncio.Queue, pubsub) -> None:
+        """Read a run's channel, resubscribing after failures with a resync event."""
+        while True:
+            try:
+                if pubsub is None:
+                    await asyncio.sleep(RUN_EVENTS_RETRY_INTERVAL)
+                    pubsub = self.redis_client.pubsub()
+                    await pubsub.subscribe(_channel(run_id))
+                    self._enqueue(queue, run_id, {"type": RESYNC_EVENT, "run_id": run_id})
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._enqueue(queue, run_id, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Run event subscription for run {run_id} failed, retrying: {str(e)}")
+            finally:
+                await self._close_pubsub(pubsub)
+                pubsub = None
+
+    @staticmethod
+    async def _close_pubsub(pubsub) -> None:
+        if pubsub is None:
+            return
+        try:
+            # reset() unsubscribes and releases the connection
+            await pubsub.reset()
+        except Exception as e:
+            logger.warning(f"Failed to close run event subscription: {str(e)}")
+
+    async def close(self) -> None:
+        """Stop the publisher task."""
+        if self._publisher is not None:
+            self._publisher.cancel()
+            self._publisher = None
+
+run_events = RunEventBus(async_redis_client if RUN_EVENTS_REDIS else None)
@@ -0,0 +1,165 @@
+import asyncio
+import base64
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.db.postgres import save_runs_async, get_run_async, list_runs_async, count_runs_by_status_async
+from shared.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+RUN_CACHE_SIZE = int(os.getenv("RUN_CACHE_SIZE", "1000"))
+RUN_FLUSH_INTERVAL = float(os.getenv("RUN_FLUSH_INTERVAL", "1.0"))
+RUN_FLUSH_BATCH_SIZE = int(os.getenv("RUN_FLUSH_BATCH_SIZE", "100"))
+
+def _row_to_run(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a workflow_runs row to the run status dict used by the executor."""
+    run = dict(row)
+    run["flow_id"] = run.pop("workflow_id")
+    for key in ("created_at", "updated_at"):
+        if isinstance(run.get(key), datetime):
+            run[key] = run[key].isoformat()
+    return run
+
+def encode_cursor(created_at: Any, run_id: str) -> str:
+    """Opaque page cursor pointing just past the given run."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([created_at, run_id]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        created_at, run_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(run_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class RunStore:
+    """Run repository backed by the workflow_runs table.
+
+    The most recently used runs are kept in a bounded LRU. Writes go to a
+    write-behind buffer that is flushed in batches on a timer, when it fills up,
+    and immediately whenever a run changes status.
+    """
+    def __init__(self,
+                 max_hot_runs: int = RUN_CACHE_SIZE,
+                 flush_interval: float = RUN_FLUSH_INTERVAL,
+                 batch_size: int = RUN_FLUSH_BATCH_SIZE):
+        self.max_hot_runs = max_hot_runs
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._hot: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._written_status: Dict[str, str] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Get a run from memory, falling back to the database."""
+        run = self._hot.get(run_id)
+        if run is not None:
+            self._hot.move_to_end(run_id)
+            return run
+
+        run = self._pending.get(run_id)
+        if run is None:
+            row = await get_run_async(run_id)
+            if row is None:
+                return None
+            run = _row_to_run(row)
+            self._written_status[run_id] = run["status"]
+
+        self._cache(run_id, run)
+        return run
+
+    async def put(self, run: Dict[str, Any]) -> None:
+        """Store a run; the write is flushed right away if its status changed."""
+        run_id = run["run_id"]
+        status_changed = self._written_status.get(run_id) != run["status"]
+
+        self._cache(run_id, run)
+        self._pending[run_id] = run
+        self._ensure_flusher()
+
+        if status_changed or len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def list(self,
+                   flow_id: Optional[str] = None,
+                   limit: int = 100,
+                   status: Optional[str] = None,
+                   created_after: Optional[datetime] = None,
+                   created_before: Optional[datetime] = None,
+                   cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List one page of runs, newest first, and the cursor of the next page (None on the last)."""
+        before = decode_cursor(cursor) if cursor else None
+        await self.flush()
+        # One extra row tells whether another page follows
+        rows = await list_runs_async(flow_id, limit + 1, status, created_after, created_before, before)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["run_id"])
+        return [_row_to_run(row) for row in rows], next_cursor
+
+    async def status_counts(self, flow_id: Optional[str] = None) -> Dict[str, int]:
+        """Number of runs per status, optionally for one flow."""
+        await self.flush()
+        return await count_runs_by_status_async(flow_id)
+
+    async def flush(self) -> None:
+        """Write all buffered runs to the database in one batch."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending = {}
+
+            # Encode on the event loop so running flows cannot mutate a run mid-write
+            rows = [{
+                **run,
+                "workflow_id": run["flow_id"],
+                "context": json.dumps(run.get("context", {}), default=str),
+                "history": json.dumps(run.get("history", []), default=str)
+            } for run in batch.values()]
+
+            try:
+                await save_runs_async(rows)
+                for row in rows:
+                    if row["run_id"] in self._hot:
+                        self._written_status[row["run_id"]] = row["status"]
+            except Exception as e:
+                logger.error(f"Failed to flush {len(batch)} runs: {str(e)}")
+                # Keep unsaved runs buffered for the next flush; newer writes win
+                for run_id, run in batch.items():
+                    self._pending.setdefault(run_id, run)
+
+    async def close(self) -> None:
+        """Stop the background flusher and write out anything still buffered."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    def _cache(self, run_id: str, run: Dict[str, Any]) -> None:
+        self._hot[run_id] = run
+        self._hot.move_to_end(run_id)
+        while len(self._hot) > self.max_hot_runs:
+            # Evicted runs that are still buffered stay readable from the buffer
+            evicted_id, _ = self._hot.popitem(last=False)
+            self._written_status.pop(evicted_id, None)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+run_store = RunStore()